@@ -0,0 +1,98 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 16:00
+# FileName: 历史数据的列式解析
+
+from typing import Dict, List
+
+import numpy as np
+
+# 视为空值的文本
+blank_values = ('', '-', '--')
+
+
+def convert(column: np.ndarray, dtype, decimal: int) -> np.ndarray:
+    """
+    文本列转为指定类型
+    :param column: 文本列
+    :param dtype: str：保持文本；float：浮点（空值为nan）；int：按 decimal 放大后的整数（空值为0）
+    :param decimal: 小数位数
+    :return:
+    """
+    if dtype is str:
+        return column
+    values = np.where(np.isin(column, blank_values), 'nan', column).astype(np.float64)
+    if dtype is int:
+        return np.rint(np.nan_to_num(values) * 10 ** decimal).astype(np.int64)
+    return values
+
+
+def from_lines(lines: List[str], fields: List[str], dtypes: dict = None, *, decimal: int = 0,
+               sep: str = ',') -> Dict[str, np.ndarray]:
+    """
+    将分隔符拼接的行（如股票 klines）一次性解析为列，不逐行构造字典
+    :param lines: ['2023-11-01,10.00,10.10,...', ...]
+    :param fields: 每行各位置对应的字段
+    :param dtypes: {字段: str / float / int}，未指定的字段保持文本
+    :param decimal: int 类型的放大位数
+    :param sep: 分隔符
+    :return: {字段: 列}
+    """
+    dtypes = dtypes or {}
+    width = len(fields)
+    cells = np.array(sep.join(lines).split(sep) if lines else [], dtype=str)
+    if cells.size != len(lines) * width:
+        raise ValueError(f'数据列数与字段数（{width}）不匹配')
+
+    table = cells.reshape(len(lines), width)
+    return {field: convert(table[:, index], dtypes.get(field, str), decimal) for index, field in enumerate(fields)}
+
+
+def from_records(records: List[dict], fields: List[str], dtypes: dict = None, *,
+                 decimal: int = 0) -> Dict[str, np.ndarray]:
+    """
+    将记录列表（如基金 LSJZList）按字段解析为列
+    :param records: [{字段: 值}]
+    :param fields: 需要的字段
+    :param dtypes: {字段: str / float / int}，未指定的字段保持文本
+    :param decimal: int 类型的放大位数
+    :return: {字段: 列}
+    """
+    dtypes = dtypes or {}
+    return {
+        field: convert(np.array([record.get(field) or '' for record in records], dtype=str),
+                       dtypes.get(field, str), decimal)
+        for field in fields
+    }
+
+
+def get_decimal(column: np.ndarray) -> int:
+    """文本数值列的小数位数（取最大值）"""
+    if not column.size:
+        return 0
+    return int(np.char.str_len(np.char.partition(column, '.')[:, 2]).max())
+
+
+def format_column(column: np.ndarray, fmt: str) -> list:
+    """
+    数值列格式化为文本
+    :param column:
+    :param fmt: 如 '%.2f'
+    :return: 文本列表，nan为None
+    """
+    text = np.char.mod(fmt, column).astype(object)
+    text[np.isnan(column)] = None
+    return text.tolist()
+
+
+def to_records(data: Dict[str, np.ndarray], fmts: dict) -> List[dict]:
+    """
+    列转为记录列表（用于输出）
+    :param data: {字段: 列}
+    :param fmts: {字段: 格式}，按其顺序输出；格式为None时原样输出
+    :return:
+    """
+    fields = list(fmts.keys())
+    values = [data[field].tolist() if fmts[field] is None else format_column(data[field], fmts[field])
+              for field in fields]
+    return [dict(zip(fields, row)) for row in zip(*values)]
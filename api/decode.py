@@ -0,0 +1,54 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 16:30
+# FileName: 上游响应的解码（JSON / JSONP）
+
+import json
+from typing import Union
+
+try:
+    import orjson  # 可选依赖，安装后用于加速解码
+except ImportError:
+    orjson = None
+
+# 解码失败的异常（orjson.JSONDecodeError 同为其子类）
+DecodeError = ValueError
+
+
+def loads(content: Union[bytes, memoryview, str]):
+    """JSON解码，优先使用 orjson"""
+    if orjson is not None:
+        return orjson.loads(content)
+    if isinstance(content, memoryview):
+        content = content.tobytes()
+    return json.loads(content)
+
+
+def strip_jsonp(content: bytes) -> memoryview:
+    """
+    去除 JSONP/JS 包装（如 jsonpgz({...}); 、var r = [...];），按字节切片，不复制、不转为文本
+    :param content:
+    :return: 首个 { 或 [ 到最后一个 } 或 ] 之间的内容
+    """
+    starts = [index for index in (content.find(b'{'), content.find(b'[')) if index >= 0]
+    end = max(content.rfind(b'}'), content.rfind(b']'))
+    if not starts or end < min(starts):
+        raise DecodeError('未找到JSON内容')
+    return memoryview(content)[min(starts):end + 1]
+
+
+def parse(resp, *path, jsonp: bool = False):
+    """
+    解码响应体，并只返回用到的子树
+    :param resp: requests 或 httpx 的响应
+    :param path: 子树的键路径，如 parse(resp, 'data', 'diff')。中间节点为空时返回空值
+    :param jsonp: 是否为JSONP/JS包装的响应
+    :return:
+    """
+    content = resp.content
+    data = loads(strip_jsonp(content) if jsonp else content)
+    for key in path:
+        if not data:
+            return data
+        data = data[key]
+    return data
@@ -3,17 +3,36 @@
 # CreateTime: 2023/7/27 15:30
 # FileName: 东方财富api
 
-import json
 import logging
-from json import JSONDecodeError
 import time
 from typing import List, Union
 
-import requests
-import pandas as pd
+from api import columns, decode, fetch, quote_id
+from utils import utils, pools, singleflight
+import config
 
-from api import fetch
-from utils import utils
+
+# 各上游host，用于启动时预热连接
+warm_urls = [
+    'https://push2.eastmoney.com/',
+    'https://push2his.eastmoney.com/',
+    'https://searchadapter.eastmoney.com/',
+    'http://fundgz.1234567.com.cn/',
+    'https://fundmobapi.eastmoney.com/',
+    'http://api.fund.eastmoney.com/',
+]
+
+# 合并并发的相同查询（同一类型、代码、参数）
+flight = singleflight.Group()
+
+
+def _params_key(kwargs: dict) -> str:
+    return repr(sorted(kwargs.items()))
+
+
+def has_fields(data: dict, fields: [] = None) -> bool:
+    """数据是否包含所需的字段（字段为空时视为需要全部字段，仅判断数据非空）"""
+    return bool(data) and all(field in data for field in fields or [])
 
 
 class EastMoney:
@@ -46,7 +65,41 @@ class EastMoney:
         :param kwargs:
         :return:
         """
-        return self.adapter.fetch_current(code, **kwargs)
+        key = (self.mode, 'current', str(code), _params_key(kwargs))
+        return flight.do(key, lambda: self.adapter.fetch_current(code, **kwargs))
+
+    def fetch_current_batch(self, codes: List[str], **kwargs) -> (dict, bool):
+        """
+        批量获取多个代码的当前数据，字段与 fetch_current 一致
+        :param codes:
+        :param kwargs:
+        :return: {code: data}
+        """
+        codes = list(dict.fromkeys(str(code).strip() for code in codes if code))
+        if not codes:
+            return {}, True
+
+        status = {'ok': True}
+        params = _params_key(kwargs)
+
+        def load(keys) -> dict:
+            data, ok = self._fetch_current_batch([key[2] for key in keys], **kwargs)
+            status['ok'] = ok
+            return {key: data.get(key[2]) for key in keys}
+
+        # 与其他批量查询中正在进行的代码合并，只请求剩余的代码
+        result = flight.do_many([(self.mode, 'batch', code, params) for code in codes], load)
+        return {key[2]: data for key, data in result.items() if data}, status['ok']
+
+    def _fetch_current_batch(self, codes: List[str], **kwargs) -> (dict, bool):
+        if hasattr(self.adapter, 'fetch_current_batch'):
+            return self.adapter.fetch_current_batch(codes, **kwargs)
+
+        # 适配器不支持批量时，逐个查询
+        result = pools.execute_thread(lambda code: self.adapter.fetch_current(code, **kwargs),
+                                      [[(code,)] for code in codes])
+        return {code: data for code, (data, ok) in zip(codes, result) if ok and data}, \
+            all(ok for _, ok in result)
 
     def fetch_history(self, code, **kwargs):
         """
@@ -55,7 +108,8 @@ class EastMoney:
         :param kwargs:
         :return:
         """
-        return self.adapter.fetch_history(code, **kwargs)
+        key = (self.mode, 'history', str(code), _params_key(kwargs))
+        return flight.do(key, lambda: self.adapter.fetch_history(code, **kwargs))
 
 
 class Stock:
@@ -79,6 +133,24 @@ class Stock:
         'f86': 'timestamp',  # 时间戳（分钟）
     }
 
+    # 批量行情（ulist）字段 → detail_fields 字段
+    batch_fields = {
+        'f2': 'f43',  # 最新
+        'f15': 'f44',  # 最高
+        'f16': 'f45',  # 最低
+        'f17': 'f46',  # 今开
+        'f5': 'f47',  # 总手
+        'f6': 'f48',  # 金额
+        'f10': 'f50',  # 量比
+        'f350': 'f51',  # 涨停
+        'f351': 'f52',  # 跌停
+        'f12': 'f57',  # 代码
+        'f14': 'f58',  # 名称
+        'f1': 'f59',  # 小数点位数
+        'f18': 'f60',  # 基准（昨收）
+        'f124': 'f86',  # 时间戳
+    }
+
     history_fields = {
         'f51': 'date',  # 日期
         'f52': 'start',  # 开盘
@@ -92,6 +164,10 @@ class Stock:
         'f60': 'f60',  # 涨跌额
         'f61': 'f61',  # 换手率
     }
+    # 列式解析时各历史字段的类型，未列出的为数值
+    history_dtypes = {
+        'f51': str,
+    }
 
     def __init__(self):
         self.headers = {
@@ -99,60 +175,143 @@ class Stock:
             'Content-Type': 'application/json; charset=utf-8',
         }
 
-    def fetch_all(self, fields: [] = None, page=1, result: [] = None) -> (Union[List, None], bool):
+    # 股票列表的字段重命名
+    list_fields = {
+        'f12': 'code',  # 代码
+        'f14': 'name',  # 名称
+        # 'f13': 'stock_type',  # 类型
+    }
+    list_fs = ['m:0', 'm:1', 't:2', 't:3', 't:6', 't:7', 't:23', 't:80', 't:81', 'f:4', 'f:8', 's:3', 's:2048',
+               'b:BK0804', 'b:BK0707', 'b:BK0498']
+    list_page_size = 1000
+
+    def fetch_all(self, fields: [] = None) -> (Union[List, None], bool):
         """
         股票列表
         :return:
         """
-        default_fields = {
-            'f12': 'code',  # 代码
-            'f14': 'name',  # 名称
-            # 'f13': 'stock_type',  # 类型
-        }
-        all_fs = ['m:0', 'm:1', 't:2', 't:3', 't:6', 't:7', 't:23', 't:80', 't:81', 'f:4', 'f:8', 's:3', 's:2048',
-                  'b:BK0804', 'b:BK0707', 'b:BK0498']
+        pages = {}
+        for page, rows, ok in self.iter_all_pages(fields=fields):
+            if not ok:
+                return None, False
+            pages[page] = rows
 
-        result = result or []
+        return [row for page in sorted(pages) for row in pages[page]], True
 
+    def iter_all(self, fields: [] = None):
+        """
+        股票列表（生成器），各页到达即产出
+        :return: 逐行产出；任意一页失败时抛出 ConnectionError，不静默返回缺页的部分结果
+        """
+        for page, rows, ok in self.iter_all_pages(fields=fields):
+            if not ok:
+                raise ConnectionError(f'股票查询，第{page}页失败')
+            yield from rows
+
+    def iter_all_pages(self, fields: [] = None):
+        """
+        股票列表（按页）：先请求第一页获取总数，其余页并发请求，按完成顺序产出
+        :return: 生成器，产出 (页码, 行, 是否成功)
+        """
+        rows, total, ok = self._fetch_list_page(1, fields)
+        yield 1, rows, ok
+        if not ok:
+            return
+
+        pages = range(2, (total + self.list_page_size - 1) // self.list_page_size + 1)
+        args_list = [[(page, fields)] for page in pages]
+        for index, (page_rows, _, page_ok) in pools.iter_thread(self._fetch_list_page, args_list,
+                                                                 maxsize=int(config.PageConcurrency)):
+            yield pages[index], page_rows, page_ok
+
+    def _fetch_list_page(self, page: int, fields: [] = None) -> (List, int, bool):
         url = 'https://18.push2.eastmoney.com/api/qt/clist/get'
-        page_size = 1000
         params = {
-            'fields': ','.join(fields or default_fields.keys()),
-            'pz': page_size,
+            'fields': ','.join(fields or self.list_fields.keys()),
+            'pz': self.list_page_size,
             'pn': page,
-            'fs': ','.join(all_fs)
+            'fs': ','.join(self.list_fs),
+            # 按代码排序，保证并发分页时各页稳定
+            'fid': 'f12',
+            'po': 0,
         }
         logging.info(f'股票查询，开始第{page}页')
-        resp = requests.get(url, params=params, headers=self.headers)
-        if resp.status_code != 200:
-            return None, False
-
-        data = resp.json()['data']
+        resp = fetch.get(url, params=params, headers=self.headers)
+        if not fetch.is_ok(resp):
+            return [], 0, False
 
-        result.extend(list(data['diff'].values()))
-        if data['total'] > page * page_size:
-            return self.fetch_all(fields=fields, page=page + 1, result=result)
+        data = decode.parse(resp, 'data')
+        if not data:
+            return [], 0, True
 
-        df = pd.DataFrame(result)
-        for field in default_fields:
-            if field in df.columns:
-                df[default_fields[field]] = df[field]
-                df.drop(field, axis=1, inplace=True)
+        diff = data['diff']
+        items = diff.values() if isinstance(diff, dict) else diff
+        rows = [{self.list_fields.get(field, field): value for field, value in item.items()} for item in items]
+        return rows, data['total'], True
 
-        return json.loads(df.to_json(orient='records'))
-
-    def get_quote_id(self, code):
+    def refresh_quote_index(self, *, force=False) -> bool:
+        """
+        使用股票列表全量刷新本地secid索引
+        :param force: 为False时，索引未过期则跳过
+        :return:
+        """
+        index = quote_id.get_index()
+        if not force and len(index) and \
+                time.time() - index.update_time < float(config.QuoteIdRefreshDays) * 24 * 3600:
+            return True
+
+        result, ok = self.fetch_all(fields=['f12', 'f13', 'f14'])
+        if not ok:
+            return False
+
+        mapping = {}
+        for item in result:
+            code, market = item.get('code'), item.get('f13')
+            if not code or market is None:
+                continue
+            secid = f'{market}.{code}'
+            # 沪深同代码（如指数与个股）时，优先保留与代码规则一致的
+            if code in mapping and mapping[code] == quote_id.infer(code):
+                continue
+            mapping[code] = secid
+        index.update(mapping)
+        return True
+
+    def get_quote_id(self, code) -> str:
+        return self.fetch_quote_id(code)[0]
+
+    def fetch_quote_id(self, code) -> (str, bool):
+        """
+        代码的secid：先查本地索引，未命中时请求suggest接口
+        :param code:
+        :return: (secid, 是否成功)；代码不存在时为 ('', True)，请求失败时为 ('', False)
+        """
+        index = quote_id.get_index()
+        secid = index.lookup(code)
+        if secid:
+            return secid, True
+
+        resp = fetch.get(*self._suggest_request(code), headers=self.headers)
+        secid, ok = self._parse_suggest(resp)
+        index.set(str(code).strip(), secid)
+        return secid, ok
+
+    @classmethod
+    def _suggest_request(cls, code) -> (str, dict):
         url = 'https://searchadapter.eastmoney.com/api/suggest/get'
         params = {
             'type': 14,
             'input': code,
         }
-        resp = requests.get(url, params=params, headers=self.headers)
-        if resp.status_code != 200:
-            return ''
+        return url, params
+
+    @classmethod
+    def _parse_suggest(cls, resp) -> (str, bool):
+        if not fetch.is_ok(resp):
+            return '', False
 
-        data = resp.json()['QuotationCodeTable']['Data']
-        return data[0]['QuoteID'] if data else ''
+        data = decode.parse(resp, 'QuotationCodeTable', 'Data')
+        return (data[0]['QuoteID'] if data else ''), True
 
     def fetch_current(self, code, *, fields: [] = None) -> (Union[dict, None], bool):
         """
@@ -161,34 +320,121 @@ class Stock:
         :param fields: 字段
         :return:
         """
-        fields = fields or list(self.detail_fields.keys())
+        resp = fetch.get(*self._current_request(self.get_quote_id(code), fields), headers=self.headers)
+        return self._parse_current(resp)
+
+    @classmethod
+    def _current_request(cls, secid, fields: [] = None) -> (str, dict):
+        fields = fields or list(cls.detail_fields.keys())
 
         url = f'https://push2.eastmoney.com/api/qt/stock/get'
         params = {
-            'secid': self.get_quote_id(code),
+            'secid': secid,
             'fields': ','.join(fields)
         }
-        resp = requests.get(url, params=params, headers=self.headers)
-        if resp.status_code != 200:
+        return url, params
+
+    @classmethod
+    def _parse_current(cls, resp) -> (Union[dict, None], bool):
+        if not fetch.is_ok(resp):
             return None, False
-        data = resp.json()['data']
+        data = decode.parse(resp, 'data')
 
         return data, True
 
-    def fetch_history(self, code, *, fields: [] = None, limit: int = 1, reload=True) -> (Union[dict, None], bool):
+    def fetch_current_batch(self, codes: List[str], *, fields: [] = None) -> (dict, bool):
+        """
+        批量获取股票的最新详情，按 StockBatchSize 分批请求
+        :param codes: 股票代码
+        :param fields: 字段（detail_fields 中的字段）
+        :return: {code: data}，data与 fetch_current 的字段一致（不含 ulist 不支持的字段）
+        """
+        lookups = [self.fetch_quote_id(code) for code in codes]
+        secids = [secid for secid, _ in lookups if secid]
+        # secid查询失败时，无数据的代码无法区分是否存在，整体视为失败
+        resolved = all(ok for _, ok in lookups)
+        chunks = self._chunks(secids)
+        if not chunks:
+            return {}, resolved
+
+        relate = self._batch_relate(fields)
+        rows = pools.execute_thread(
+            lambda chunk: self._parse_batch(fetch.get(*self._batch_request(chunk, relate), headers=self.headers)),
+            [[(chunk,)] for chunk in chunks])
+        result, ok = self._merge_batch(rows, relate)
+        return result, ok and resolved
+
+    @classmethod
+    def _chunks(cls, secids: List[str]) -> List[List[str]]:
+        batch_size = int(config.StockBatchSize)
+        return [secids[index: index + batch_size] for index in range(0, len(secids), batch_size)]
+
+    @classmethod
+    def _batch_relate(cls, fields: [] = None) -> dict:
+        """批量请求的字段 → detail_fields 字段"""
+        fields = set(fields or cls.detail_fields.keys())
+        fields.add('f57')  # 按代码归集结果
+        return {batch_field: field for batch_field, field in cls.batch_fields.items() if field in fields}
+
+    @classmethod
+    def _batch_request(cls, secids: List[str], relate: dict) -> (str, dict):
+        url = 'https://push2.eastmoney.com/api/qt/ulist.np/get'
+        params = {
+            'secids': ','.join(secids),
+            'fields': ','.join(relate.keys()),
+        }
+        return url, params
+
+    @classmethod
+    def _stream_request(cls, secids: List[str], relate: dict) -> (str, dict):
+        """批量行情的推送（SSE），参数与 _batch_request 一致"""
+        url = 'https://push2.eastmoney.com/api/qt/ulist/sse'
+        params = {
+            'secids': ','.join(secids),
+            'fields': ','.join(relate.keys()),
+        }
+        return url, params
+
+    @classmethod
+    def _parse_batch(cls, resp) -> (list, bool):
+        if not fetch.is_ok(resp):
+            return [], False
+        data = decode.parse(resp, 'data')
+        if not data:
+            return [], True
+        diff = data['diff']
+        return list(diff.values()) if isinstance(diff, dict) else diff, True
+
+    @classmethod
+    def _merge_batch(cls, rows: List, relate: dict) -> (dict, bool):
+        result = {}
+        for items, _ in rows:
+            for item in items:
+                data = {field: item[batch_field] for batch_field, field in relate.items() if batch_field in item}
+                result[str(data['f57'])] = data
+
+        return result, all(ok for _, ok in rows)
+
+    def fetch_history(self, code, *, fields: [] = None, limit: int = 1, reload=True,
+                      columnar=False) -> (Union[dict, None], bool):
         """
         获取指定股票的历史数据
         :param code: 股票代码
         :param fields: 字段
         :param limit: 数据量
         :param reload: 预先重载数据（增加数据与字段的对应）
+        :param columnar: 将 klines 解析为列 {字段: 数组}（日期为文本，其余为浮点），优先于 reload
         :return:
         """
         fields = fields or list(self.history_fields.keys())
+        resp = fetch.get(*self._history_request(self.get_quote_id(code), fields, limit), headers=self.headers)
+        return self._parse_history(resp, fields, reload, columnar)
 
+    @classmethod
+    def _history_request(cls, secid, fields: [], limit: int) -> (str, dict):
         url = f'https://push2his.eastmoney.com/api/qt/stock/kline/get'
         params = {
-            'secid': self.get_quote_id(code),
+            'secid': secid,
 
             # f1: code代码, f2: market, f3: name名称, f4: decimal精度, f5: dktotal数据量
             'fields1': ','.join(['f1', 'f3', 'f4']),
@@ -200,12 +446,18 @@ class Stock:
             'fqt': 0,
 
         }
-        resp = requests.get(url, params=params, headers=self.headers)
-        if resp.status_code != 200:
+        return url, params
+
+    @classmethod
+    def _parse_history(cls, resp, fields: [], reload, columnar=False) -> (Union[dict, None], bool):
+        if not fetch.is_ok(resp):
             return None, False
-        data = resp.json()['data']
+        data = decode.parse(resp, 'data')
 
-        if reload and data:
+        if columnar and data:
+            data['klines'] = columns.from_lines(data['klines'], fields,
+                                                {field: cls.history_dtypes.get(field, float) for field in fields})
+        elif reload and data:
             lines = []
             for line in data['klines']:
                 line = line.split(',')
@@ -227,6 +479,17 @@ class Fund:
         'gztime': 'timestamp',  # 当前数据时间（时间戳（分钟））
     }
 
+    # 批量估值（FundMNFInfo）字段 → detail_fields 字段
+    batch_fields = {
+        'GSZ': 'gsz',  # 估值
+        'NAV': 'dwjz',  # 单位净值
+        'GSZZL': 'gszzl',  # 估值涨跌幅
+        'FCODE': 'fundcode',  # 代码
+        'SHORTNAME': 'name',  # 名称
+        'GZTIME': 'gztime',  # 估值时间
+        'PDATE': 'jzrq',  # 净值日期
+    }
+
     history_fields = {
         'FSRQ': 'data',  # 净值日期
         'DWJZ': 'worth',  # 单位净值
@@ -235,6 +498,12 @@ class Fund:
         'SGZT': 'SGZT',  # 申购状态
         'SHZT': 'SHZT'  # 赎回状态
     }
+    # 列式解析时各历史字段的类型，未列出的为文本
+    history_dtypes = {
+        'DWJZ': float,
+        'LJJZ': float,
+        'JZZZL': float,
+    }
 
     def __init__(self):
         self.headers = {
@@ -248,13 +517,10 @@ class Fund:
         :return:
         """
         url = 'http://fund.eastmoney.com/js/fundcode_search.js'
-        resp = requests.get(url, headers=self.headers)
-        if resp.status_code != 200:
+        resp = fetch.get(url, headers=self.headers)
+        if not fetch.is_ok(resp):
             return None, False
-        data = resp.text
-        data = data.lstrip('var r = ').rstrip(';')
-        data = json.loads(data)
-        return data, True
+        return decode.parse(resp, jsonp=True), True
 
     def fetch_current(self, code) -> (Union[dict, None], bool):
         """
@@ -262,31 +528,140 @@ class Fund:
         :param code: 基金代码
         :return:
         """
-        url = f'http://fundgz.1234567.com.cn/js/{code}.js'
-        resp = requests.get(url, headers=self.headers)
-        if resp.status_code != 200:
+        resp = fetch.get(self._current_request(code), headers=self.headers)
+        return self._parse_current(resp)
+
+    @classmethod
+    def _current_request(cls, code) -> str:
+        return f'http://fundgz.1234567.com.cn/js/{code}.js'
+
+    @classmethod
+    def _parse_current(cls, resp) -> (Union[dict, None], bool):
+        if not fetch.is_ok(resp):
             return None, False
-        data = resp.text
-        data = data.lstrip('jsonpgz(').rstrip(');')
         try:
-            data = json.loads(data)
-        except JSONDecodeError:
+            data = decode.parse(resp, jsonp=True)
+        except decode.DecodeError:
             return {}, False
         return data, True
 
-    def fetch_history(self, code, *, start_date=None, end_date=None,
-                      page: int = None, page_size: int = 20) -> (Union[list, None], bool):
+    def fetch_current_batch(self, codes: List[str], *, fields: [] = None) -> (dict, bool):
+        """
+        批量获取基金的估值，按 FundBatchSize 分批请求
+        :param codes: 基金代码
+        :param fields: 接口不支持字段选择，忽略
+        :return: {code: data}，data与 fetch_current 的字段一致
+        """
+        chunks = self._chunks(codes)
+        if not chunks:
+            return {}, True
+
+        rows = pools.execute_thread(
+            lambda chunk: self._parse_batch(fetch.get(*self._batch_request(chunk), headers=self.headers)),
+            [[(chunk,)] for chunk in chunks])
+        return self._merge_batch(rows)
+
+    @classmethod
+    def _chunks(cls, codes: List[str]) -> List[List[str]]:
+        batch_size = int(config.FundBatchSize)
+        return [codes[index: index + batch_size] for index in range(0, len(codes), batch_size)]
+
+    def _batch_request(self, codes: List[str]) -> (str, dict):
+        url = 'https://fundmobapi.eastmoney.com/FundMNewApi/FundMNFInfo'
+        params = {
+            'pageIndex': 1,
+            'pageSize': len(codes),
+            'plat': 'Android',
+            'appType': 'ttjj',
+            'product': 'EFund',
+            'Version': 1,
+            'deviceid': utils.gen_hash(self.headers['user-agent'])[:32],
+            'Fcodes': ','.join(codes),
+        }
+        return url, params
+
+    @classmethod
+    def _parse_batch(cls, resp) -> (list, bool):
+        if not fetch.is_ok(resp):
+            return [], False
+        data = decode.parse(resp)
+        if data.get('ErrCode', 0) != 0:
+            return [], False
+        return data.get('Datas') or [], True
+
+    @classmethod
+    def _merge_batch(cls, rows: List) -> (dict, bool):
+        result = {}
+        for items, _ in rows:
+            for item in items:
+                # 无估值的基金（如QDII）以 -- 占位，与单个查询时一致，视为无数据
+                if item.get('GSZ') in (None, '', '--') or item.get('GZTIME') in (None, '', '--'):
+                    continue
+                data = {field: item.get(batch_field) for batch_field, field in cls.batch_fields.items()}
+                result[str(data['fundcode'])] = data
+
+        return result, all(ok for _, ok in rows)
+
+    def fetch_history(self, code, *, start_date=None, end_date=None, page_size: int = None,
+                      concurrency: int = None, columnar=False, fields: [] = None) -> (Union[list, dict, None], bool):
         """
         获取指定基金的历史数据
         :param code: 基金代码
         :param start_date: %Y-%m-%d
         :param end_date: %Y-%m-%d
-        :param page:
-        :param page_size:
+        :param page_size: 每页数量，默认 FundHistoryPageSize
+        :param concurrency: 并发请求的页数，默认 PageConcurrency
+        :param columnar: 解析为列，见 _history_columns
+        :param fields: 列式解析时只解析的字段（history_fields 中的字段）。接口不支持字段选择
         :return:
         """
-        page = page or 1
+        pages = {}
+        for page, rows, ok in self.iter_history(code, start_date=start_date, end_date=end_date,
+                                                page_size=page_size, concurrency=concurrency):
+            if not ok:
+                # 任意一页失败时整体失败：缺页会使序列中间缺失，日期错位
+                return None, False
+            pages[page] = rows
+
+        result = [row for page in sorted(pages) for row in pages[page]]
+        return (self._history_columns(result, fields) if columnar else result), True
+
+    def iter_history(self, code, *, start_date=None, end_date=None, page_size: int = None, concurrency: int = None):
+        """
+        获取指定基金的历史数据（按页）：先请求第一页获取总数，其余页并发请求，按完成顺序产出
+        :return: 生成器，产出 (页码, 行, 是否成功)
+        """
+        page_size = int(page_size or config.FundHistoryPageSize)
+
+        rows, total, ok = self._fetch_history_page(code, start_date, end_date, 1, page_size)
+        yield 1, rows, ok
+        if not ok:
+            return
+
+        pages = self._history_pages(total, len(rows), page_size)
+        args_list = [[(code, start_date, end_date, page, page_size)] for page in pages]
+        for index, (page_rows, _, page_ok) in pools.iter_thread(self._fetch_history_page, args_list,
+                                                                 maxsize=int(concurrency or config.PageConcurrency)):
+            yield pages[index], page_rows, page_ok
+
+    def _fetch_history_page(self, code, start_date, end_date, page: int, page_size: int) -> (List, int, bool):
+        response = fetch.get(*self._history_request(code, start_date, end_date, page, page_size),
+                             headers=self._history_headers())
+        json_data, ok = self._parse_history(response)
+        if not ok:
+            return [], 0, False
+        return json_data['Data']['LSJZList'], json_data['TotalCount'], True
+
+    @classmethod
+    def _history_pages(cls, total: int, first_size: int, page_size: int) -> range:
+        """
+        第一页之后的页码。接口对每页数量有上限，以第一页实际返回的数量作为有效的每页数量
+        """
+        effective_size = first_size if 0 < first_size < min(total, page_size) else page_size
+        return range(2, (total + effective_size - 1) // effective_size + 1)
 
+    @classmethod
+    def _history_request(cls, code, start_date, end_date, page: int, page_size: int) -> (str, dict):
         url = 'http://api.fund.eastmoney.com/f10/lsjz'
         params = {
             'fundCode': code,
@@ -296,24 +671,38 @@ class Fund:
             'endDate': end_date or utils.now_time(fmt='%Y-%m-%d'),
             '_': int(time.time() * 1000),
         }
-        headers = self.headers
-        headers.update({'Referer': 'http://fundf10.eastmoney.com/'})
-        response = requests.get(url, params=params, headers=headers)
-        if response.status_code != 200:
+        return url, params
+
+    @classmethod
+    def _history_columns(cls, rows: List[dict], fields: [] = None) -> dict:
+        """
+        LSJZList 解析为列
+        :param rows:
+        :param fields: 需要的字段，默认全部
+        :return: {'decimal': 净值的小数位数, 'LSJZList': {字段: 数组}}
+        """
+        fields = list(dict.fromkeys(['DWJZ', *(fields or cls.history_fields.keys())]))  # 由 DWJZ 确定精度
+        data = columns.from_records(rows, fields)
+        decimal = columns.get_decimal(data['DWJZ'])
+        return {
+            'decimal': decimal,
+            'LSJZList': {field: columns.convert(column, cls.history_dtypes.get(field, str), decimal)
+                         for field, column in data.items()},
+        }
+
+    def _history_headers(self) -> dict:
+        return {**self.headers, 'Referer': 'http://fundf10.eastmoney.com/'}
+
+    @classmethod
+    def _parse_history(cls, response) -> (Union[dict, None], bool):
+        """解析历史数据的单页响应"""
+        if not fetch.is_ok(response):
             return None, False
-        json_data = response.json()
+        json_data = decode.parse(response)
 
         if json_data['ErrCode'] != 0:
             return None, False
-        result = json_data['Data']['LSJZList']
-
-        if json_data['TotalCount'] > page * page_size:
-            next_result, next_ok = self.fetch_history(code, start_date=start_date, end_date=end_date,
-                                                      page=page + 1, page_size=page_size)
-            if next_ok:
-                result.extend(next_result)
-
-        return result, True
+        return json_data, True
 
 
 if __name__ == '__main__':
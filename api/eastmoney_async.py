@@ -0,0 +1,141 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 11:30
+# FileName: 东方财富api（协程版）
+
+import asyncio
+from typing import List, Union
+
+from api import fetch, quote_id
+from api.eastmoney import Stock, Fund
+import config
+
+
+class AsyncEastMoney:
+
+    def __init__(self, mode: str):
+        """
+
+        :param mode: fund or stock。基金或股票
+        """
+        assert mode.lower() in ('stock', 'fund'), 'mode not match!'
+        self.mode = mode.lower()
+
+        self.adapter = {
+            'stock': AsyncStock,
+            'fund': AsyncFund,
+        }[self.mode]()
+
+    async def action(self, func: str, *args, **kwargs):
+        return await getattr(self.adapter, func)(*args, **kwargs)
+
+    async def fetch_current(self, code, **kwargs):
+        return await self.adapter.fetch_current(code, **kwargs)
+
+    async def fetch_history(self, code, **kwargs):
+        return await self.adapter.fetch_history(code, **kwargs)
+
+    async def fetch_current_batch(self, codes: List[str], **kwargs) -> (dict, bool):
+        """
+        批量获取多个代码的当前数据
+        :param codes:
+        :param kwargs:
+        :return: {code: data}
+        """
+        codes = list(dict.fromkeys(str(code).strip() for code in codes if code))
+        if not codes:
+            return {}, True
+        return await self.adapter.fetch_current_batch(codes, **kwargs)
+
+
+class AsyncStock(Stock):
+    """股票"""
+
+    async def get_quote_id(self, code) -> str:
+        return (await self.fetch_quote_id(code))[0]
+
+    async def fetch_quote_id(self, code) -> (str, bool):
+        index = quote_id.get_index()
+        secid = index.lookup(code)
+        if secid:
+            return secid, True
+
+        resp = await fetch.async_get(*self._suggest_request(code), headers=self.headers)
+        secid, ok = self._parse_suggest(resp)
+        if secid:
+            # 写入索引文件，不阻塞事件循环
+            await asyncio.get_running_loop().run_in_executor(None, index.set, str(code).strip(), secid)
+        return secid, ok
+
+    async def fetch_current(self, code, *, fields: [] = None) -> (Union[dict, None], bool):
+        secid = await self.get_quote_id(code)
+        resp = await fetch.async_get(*self._current_request(secid, fields), headers=self.headers)
+        return self._parse_current(resp)
+
+    async def fetch_current_batch(self, codes: List[str], *, fields: [] = None) -> (dict, bool):
+        lookups = await asyncio.gather(*[self.fetch_quote_id(code) for code in codes])
+        secids = [secid for secid, _ in lookups if secid]
+        # secid查询失败时，无数据的代码无法区分是否存在，整体视为失败
+        resolved = all(ok for _, ok in lookups)
+        chunks = self._chunks(secids)
+        if not chunks:
+            return {}, resolved
+
+        relate = self._batch_relate(fields)
+
+        async def one(chunk):
+            return self._parse_batch(await fetch.async_get(*self._batch_request(chunk, relate), headers=self.headers))
+
+        rows = await asyncio.gather(*[one(chunk) for chunk in chunks])
+        result, ok = self._merge_batch(rows, relate)
+        return result, ok and resolved
+
+    async def fetch_history(self, code, *, fields: [] = None, limit: int = 1,
+                            reload=True, columnar=False) -> (Union[dict, None], bool):
+        fields = fields or list(self.history_fields.keys())
+        secid = await self.get_quote_id(code)
+        resp = await fetch.async_get(*self._history_request(secid, fields, limit), headers=self.headers)
+        return self._parse_history(resp, fields, reload, columnar)
+
+
+class AsyncFund(Fund):
+    """基金"""
+
+    async def fetch_current(self, code) -> (Union[dict, None], bool):
+        resp = await fetch.async_get(self._current_request(code), headers=self.headers)
+        return self._parse_current(resp)
+
+    async def fetch_current_batch(self, codes: List[str], *, fields: [] = None) -> (dict, bool):
+        chunks = self._chunks(codes)
+        if not chunks:
+            return {}, True
+
+        async def one(chunk):
+            return self._parse_batch(await fetch.async_get(*self._batch_request(chunk), headers=self.headers))
+
+        rows = await asyncio.gather(*[one(chunk) for chunk in chunks])
+        return self._merge_batch(rows)
+
+    async def fetch_history(self, code, *, start_date=None, end_date=None,
+                            page_size: int = None, columnar=False,
+                            fields: [] = None) -> (Union[list, dict, None], bool):
+        """首页获取总数后，其余页并发获取"""
+        page_size = int(page_size or config.FundHistoryPageSize)
+
+        async def one(page):
+            response = await fetch.async_get(*self._history_request(code, start_date, end_date, page, page_size),
+                                             headers=self._history_headers())
+            return self._parse_history(response)
+
+        json_data, ok = await one(1)
+        if not ok:
+            return None, False
+        result = json_data['Data']['LSJZList']
+
+        pages = self._history_pages(json_data['TotalCount'], len(result), page_size)
+        for page_data, page_ok in await asyncio.gather(*[one(page) for page in pages]):
+            if not page_ok:
+                return None, False
+            result.extend(page_data['Data']['LSJZList'])
+
+        return (self._history_columns(result, fields) if columnar else result), True
@@ -3,7 +3,22 @@
 # CreateTime: 2023/7/27 15:31
 # FileName:
 
+import asyncio
+import concurrent.futures
+import importlib.util
+import logging
 import random
+import threading
+import time
+from typing import List, Union
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from api import guard, replay
+import config
 
 agent_list = [
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:62.0) Gecko/20100101 Firefox/62.0',
@@ -17,3 +32,235 @@ agent_list = [
 
 def get_user_agent():
     return random.choice(agent_list)
+
+
+class Transport:
+    """
+    进程内共享的HTTP传输层：单个会话，按host挂载有界连接池（keep-alive）
+    """
+    __lock = threading.Lock()
+    instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if hasattr(cls, 'instance') and cls.instance:
+            return cls.instance
+
+        with cls.__lock:
+            if not hasattr(cls, 'instance') or cls.instance is None:
+                cls.instance = super(Transport, cls).__new__(cls)
+                cls.instance.__init()
+            return cls.instance
+
+    def __init(self):
+        self.session = requests.Session()
+        self.__hosts = set()
+
+    @classmethod
+    def get_pool_size(cls, host: str) -> int:
+        """host的连接池大小，优先使用 HttpHostPoolSize 中的配置"""
+        host_pool_size = config.HttpHostPoolSize if isinstance(config.HttpHostPoolSize, dict) else {}
+        return int(host_pool_size.get(host, config.HttpPoolSize))
+
+    def _mount(self, url: str):
+        """为url所在的host挂载独立的连接池"""
+        parts = urlsplit(url)
+        prefix = f'{parts.scheme}://{parts.netloc}'
+        if prefix in self.__hosts:
+            return
+
+        with Transport.__lock:
+            if prefix in self.__hosts:
+                return
+            pool_size = self.get_pool_size(parts.hostname)
+            # pool_block: 连接数达到上限时等待空闲连接，而不是新建后丢弃
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+            self.session.mount(prefix, adapter)
+            self.__hosts.add(prefix)
+
+    def get(self, url, params: dict = None, *, headers: dict = None, timeout=None,
+            **kwargs) -> Union[requests.Response, None]:
+        """
+        经过限流、重试、熔断的请求
+        :return: 响应；请求异常或熔断中时为None
+        """
+        mode = replay.get_mode()
+        target = replay.rewrite(url) if mode == 'replay' else url
+        self._mount(target)
+
+        attempts = guard.Attempts(url)
+        while True:
+            wait = attempts.acquire()
+            if wait is None:
+                return None
+            try:
+                time.sleep(wait)
+                resp, error = self.session.get(target, params=params, headers=headers,
+                                               timeout=timeout or float(config.HttpTimeout), **kwargs), None
+            except requests.RequestException as e:
+                resp, error = None, e
+            except BaseException:
+                attempts.abort()
+                raise
+
+            finished, delay = attempts.done(resp, error)
+            if finished:
+                return self._finish(mode, url, params, resp)
+            time.sleep(delay)
+
+    @classmethod
+    def _finish(cls, mode: str, url, params: dict, resp):
+        """请求结束：录制模式下录制成功的响应"""
+        if cls._recordable(mode, resp):
+            replay.record(url, params, resp)
+        return resp
+
+    @classmethod
+    def _recordable(cls, mode: str, resp) -> bool:
+        """响应是否需要录制"""
+        return mode == 'record' and resp is not None and resp.status_code == 200
+
+    def head(self, url, *, headers: dict = None, timeout=None, **kwargs) -> requests.Response:
+        url = replay.rewrite(url) if replay.get_mode() == 'replay' else url
+        self._mount(url)
+        return self.session.head(url, headers=headers, timeout=timeout or float(config.HttpTimeout), **kwargs)
+
+    def warm_up(self, urls: List[str], *, size: int = None):
+        """
+        预热：提前为每个host建立若干连接，避免首个定时任务承担握手耗时
+        :param urls: 各host下任意可访问的地址
+        :param size: 每个host预建的连接数
+        :return:
+        """
+        size = int(size or config.HttpWarmSize)
+        if not urls or size <= 0:
+            return
+
+        def one(url):
+            try:
+                self.head(url, headers={'user-agent': get_user_agent()})
+            except requests.RequestException as e:
+                logging.warning(f'连接预热失败：{url}, {e}')
+
+        tasks = [url for url in urls for _ in range(min(size, self.get_pool_size(urlsplit(url).hostname)))]
+        if not tasks:
+            return
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+            list(executor.map(one, tasks))
+        logging.info(f'连接预热完成：{len(urls)}个host，共{len(tasks)}个连接')
+
+
+class AsyncTransport:
+    """
+    协程版的共享传输层：httpx异步客户端（安装了h2时启用HTTP/2多路复用），并发数由信号量限制
+    """
+    instance = None
+
+    def __new__(cls, *args, **kwargs):
+        # 仅在事件循环内使用，无需加锁
+        if cls.instance is None:
+            cls.instance = super(AsyncTransport, cls).__new__(cls)
+            cls.instance.client = None
+            cls.instance.semaphore = None
+            cls.instance.loop = None
+        return cls.instance
+
+    async def _ensure(self):
+        """客户端与信号量绑定当前事件循环，循环变化时关闭原客户端并重建"""
+        loop = asyncio.get_running_loop()
+        if self.client is not None and self.loop is loop:
+            return
+
+        # 先替换再关闭，关闭期间的其他请求使用新客户端
+        old_client, old_loop = self.client, self.loop
+        concurrency = int(config.AsyncConcurrency)
+        http2 = importlib.util.find_spec('h2') is not None
+        self.client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=int(config.HttpPoolSize)),
+            timeout=float(config.HttpTimeout),
+        )
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.loop = loop
+        logging.info(f'异步HTTP客户端已创建：http2={http2}，并发{concurrency}')
+        if old_client is not None:
+            await self._close_client(old_client, old_loop)
+
+    @classmethod
+    async def _close_client(cls, client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop):
+        """关闭原事件循环上的客户端：原循环仍在运行时交由其关闭，否则在当前循环中关闭"""
+        try:
+            if loop is not None and loop.is_running() and not loop.is_closed():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(client.aclose(), loop))
+            else:
+                await client.aclose()
+        except Exception as e:
+            logging.warning(f'异步HTTP客户端关闭失败：{e!r}')
+
+    async def get(self, url, params: dict = None, *, headers: dict = None,
+                  **kwargs) -> Union[httpx.Response, None]:
+        """
+        经过限流、重试、熔断的请求，与 Transport.get 一致
+        :return: 响应；请求异常或熔断中时为None
+        """
+        await self._ensure()
+        mode = replay.get_mode()
+        target = replay.rewrite(url) if mode == 'replay' else url
+
+        attempts = guard.Attempts(url)
+        while True:
+            wait = attempts.acquire()
+            if wait is None:
+                return None
+            try:
+                await asyncio.sleep(wait)
+                async with self.semaphore:
+                    resp, error = await self.client.get(target, params=params, headers=headers, **kwargs), None
+            except httpx.HTTPError as e:
+                resp, error = None, e
+            except BaseException:
+                # 包括被取消（CancelledError）
+                attempts.abort()
+                raise
+
+            finished, delay = attempts.done(resp, error)
+            if finished:
+                if Transport._recordable(mode, resp):
+                    # 录制写文件，不阻塞事件循环
+                    await asyncio.get_running_loop().run_in_executor(None, replay.record, url, params, resp)
+                return resp
+            await asyncio.sleep(delay)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+        self.client = None
+        self.loop = None
+
+
+def is_ok(resp) -> bool:
+    """响应是否成功（请求异常、熔断时响应为None）"""
+    return resp is not None and resp.status_code == 200
+
+
+def get_transport() -> Transport:
+    return Transport()
+
+
+def get(url, params: dict = None, *, headers: dict = None, **kwargs) -> requests.Response:
+    return get_transport().get(url, params=params, headers=headers, **kwargs)
+
+
+def warm_up(urls: List[str], *, size: int = None):
+    return get_transport().warm_up(urls, size=size)
+
+
+def get_async_transport() -> AsyncTransport:
+    return AsyncTransport()
+
+
+async def async_get(url, params: dict = None, *, headers: dict = None, **kwargs) -> httpx.Response:
+    return await get_async_transport().get(url, params=params, headers=headers, **kwargs)
+
+
+async def async_close():
+    return await get_async_transport().close()
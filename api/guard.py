@@ -0,0 +1,267 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 14:00
+# FileName: 上游保护：限流、重试预算、熔断
+
+import logging
+import random
+import re
+import threading
+import time
+from typing import Union
+from urllib.parse import urlsplit
+
+import config
+
+
+class TokenBucket:
+    """令牌桶限流"""
+
+    def __init__(self, rate: float, burst: int):
+        """
+
+        :param rate: 每秒补充的令牌数
+        :param burst: 桶容量
+        """
+        self.rate = rate
+        self.burst = burst
+        self.__lock = threading.Lock()
+        self.__tokens = burst
+        self.__last = time.monotonic()
+        self.requests = 0
+        self.waited = 0  # 累计等待（秒）
+        self.max_wait = 0
+
+    def reserve(self) -> float:
+        """
+        预定一个令牌
+        :return: 需要等待的时间（秒），由调用方自行等待（线程或协程）
+        """
+        if self.rate <= 0:
+            return 0
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(self.burst, self.__tokens + (now - self.__last) * self.rate)
+            self.__last = now
+            self.__tokens -= 1
+            wait = -self.__tokens / self.rate if self.__tokens < 0 else 0
+
+            self.requests += 1
+            self.waited += wait
+            self.max_wait = max(self.max_wait, wait)
+        return wait
+
+    def stats(self) -> dict:
+        return {
+            'requests': self.requests,
+            'wait_total': round(self.waited, 3),
+            'wait_max': round(self.max_wait, 3),
+        }
+
+
+class RetryBudget:
+    """
+    全局重试预算：每个请求存入 ratio 个令牌（上限为 capacity），每次重试消耗1个，避免上游异常时重试放大流量
+    """
+
+    def __init__(self, ratio: float, capacity: int):
+        self.ratio = ratio
+        self.capacity = capacity
+        self.__lock = threading.Lock()
+        self.__tokens = float(capacity)
+        self.retries = 0
+        self.denied = 0
+
+    def deposit(self):
+        with self.__lock:
+            self.__tokens = min(self.__tokens + self.ratio, self.capacity)
+
+    def withdraw(self) -> bool:
+        with self.__lock:
+            if self.__tokens < 1:
+                self.denied += 1
+                return False
+            self.__tokens -= 1
+            self.retries += 1
+            return True
+
+    def stats(self) -> dict:
+        return {'tokens': round(self.__tokens, 2), 'retries': self.retries, 'denied': self.denied}
+
+
+class CircuitBreaker:
+    """
+    熔断器：连续失败达到阈值后打开，冷却期内快速失败；冷却后半开，放行一个探测请求。
+    探测请求未记录结果（被取消或抛出其他异常）时由 release 释放；未释放的探测超过冷却时间后重新放行
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failures: int, cooldown: float):
+        self.name = name
+        self.threshold = failures
+        self.cooldown = cooldown
+        self.__lock = threading.Lock()
+        self.state = CircuitBreaker.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.opened_times = 0
+        self.rejected = 0
+        self.__probing = False
+        self.__probe_at = 0
+
+    def allow(self) -> bool:
+        with self.__lock:
+            if self.state == CircuitBreaker.CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == CircuitBreaker.OPEN and now - self.opened_at >= self.cooldown:
+                self.state = CircuitBreaker.HALF_OPEN
+                self.__probing = False
+                logging.info(f'熔断半开：{self.name}')
+            if self.state == CircuitBreaker.HALF_OPEN and \
+                    (not self.__probing or now - self.__probe_at >= self.cooldown):
+                self.__probing = True
+                self.__probe_at = now
+                return True
+            self.rejected += 1
+            return False
+
+    def release(self):
+        """放行的请求未得到结果（被取消或抛出其他异常），释放探测，不改变状态"""
+        with self.__lock:
+            self.__probing = False
+
+    def success(self):
+        with self.__lock:
+            if self.state != CircuitBreaker.CLOSED:
+                logging.info(f'熔断恢复：{self.name}')
+            self.state = CircuitBreaker.CLOSED
+            self.failures = 0
+            self.__probing = False
+
+    def failure(self):
+        with self.__lock:
+            self.failures += 1
+            if self.state == CircuitBreaker.HALF_OPEN or \
+                    (self.state == CircuitBreaker.CLOSED and self.failures >= self.threshold):
+                self.state = CircuitBreaker.OPEN
+                self.opened_at = time.monotonic()
+                self.opened_times += 1
+                self.__probing = False
+                logging.warning(f'熔断打开：{self.name}，连续失败{self.failures}次')
+
+    def stats(self) -> dict:
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'opened_times': self.opened_times,
+            'rejected': self.rejected,
+        }
+
+
+# 需要重试的响应状态码
+retry_status = (429, 500, 502, 503, 504)
+
+_lock = threading.Lock()
+_limiters = {}
+_breakers = {}
+_budget = None
+
+
+def get_endpoint(url: str) -> str:
+    """接口标识：host + path（路径中的数字视为参数，如基金代码）"""
+    parts = urlsplit(url)
+    return f'{parts.hostname}{re.sub(r"[0-9]+", "*", parts.path)}'
+
+
+def get_limiter(url: str) -> TokenBucket:
+    endpoint = get_endpoint(url)
+    if endpoint not in _limiters:
+        with _lock:
+            if endpoint not in _limiters:
+                _limiters[endpoint] = TokenBucket(float(config.UpstreamRate), int(config.UpstreamBurst))
+    return _limiters[endpoint]
+
+
+def get_breaker(url: str) -> CircuitBreaker:
+    host = urlsplit(url).hostname
+    if host not in _breakers:
+        with _lock:
+            if host not in _breakers:
+                _breakers[host] = CircuitBreaker(host, int(config.BreakerFailures), float(config.BreakerCooldown))
+    return _breakers[host]
+
+
+def get_budget() -> RetryBudget:
+    global _budget
+    if _budget is None:
+        with _lock:
+            if _budget is None:
+                _budget = RetryBudget(float(config.UpstreamRetryRatio), int(config.UpstreamRetryBudget))
+    return _budget
+
+
+def backoff(attempt: int) -> float:
+    """带抖动的指数退避（full jitter）"""
+    return random.uniform(0, min(float(config.UpstreamRetryMax), float(config.UpstreamRetryBase) * 2 ** attempt))
+
+
+class Attempts:
+    """
+    一次上游请求的保护流程（熔断、限流、重试预算与退避），同步与协程的传输层共用，由调用方执行请求与等待：
+
+        attempts = Attempts(url)
+        循环：
+            wait = attempts.acquire()，为None时返回None（熔断中）
+            等待 wait 秒后请求；请求被取消或抛出其他异常时调用 attempts.abort()
+            finished, delay = attempts.done(resp, error)，结束时返回 resp，否则等待 delay 秒后重试
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.breaker, self.limiter, self.budget = get_breaker(url), get_limiter(url), get_budget()
+        self.budget.deposit()
+        self.attempt = 0
+
+    def acquire(self) -> Union[float, None]:
+        """
+        放行一次尝试
+        :return: 限流需等待的时间（秒）；熔断中为None，不再请求
+        """
+        if not self.breaker.allow():
+            logging.warning(f'熔断中，跳过请求：{self.url}')
+            return None
+        return self.limiter.reserve()
+
+    def done(self, resp, error: Exception = None) -> (bool, float):
+        """
+        记录一次尝试的结果
+        :param resp: 响应，请求异常时为None
+        :param error: 请求异常
+        :return: (是否结束, 重试前的等待时间)
+        """
+        if error is None and resp.status_code not in retry_status:
+            self.breaker.success()
+            return True, 0
+
+        self.breaker.failure()
+        if self.attempt >= int(config.UpstreamRetries) or not self.budget.withdraw():
+            logging.warning(f'请求失败：{self.url}, {error or resp.status_code}')
+            return True, 0
+        delay = backoff(self.attempt)
+        self.attempt += 1
+        return False, delay
+
+    def abort(self):
+        """请求被取消或抛出其他异常"""
+        self.breaker.release()
+
+
+def stats() -> dict:
+    return {
+        'breakers': {host: breaker.stats() for host, breaker in list(_breakers.items())},
+        'limiters': {endpoint: limiter.stats() for endpoint, limiter in list(_limiters.items())},
+        'retry_budget': get_budget().stats(),
+    }
@@ -0,0 +1,150 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 10:30
+# FileName: 股票代码与行情ID（secid）的本地索引
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Union
+
+# 代码前缀推断市场：1 为沪市，0 为深市（北交所也使用0）。按前缀从长到短匹配
+market_rules = {
+    '6': '1',  # 沪市主板、科创板
+    '5': '1',  # 沪市基金、ETF
+    '90': '1',  # 沪市B股
+    '11': '1',  # 沪市可转债
+    '0': '0',  # 深市主板
+    '3': '0',  # 创业板
+    '12': '0',  # 深市可转债
+    '15': '0',  # 深市ETF
+    '16': '0',  # 深市LOF
+    '20': '0',  # 深市B股
+    '4': '0',  # 北交所
+    '8': '0',  # 北交所
+    '92': '0',  # 北交所
+}
+
+root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+folder_path = os.path.join(root_path, 'data')
+
+
+def infer(code: str) -> Union[str, None]:
+    """根据代码规则推断secid，无法推断时返回None"""
+    code = str(code).strip()
+    if len(code) != 6 or not code.isdigit():
+        return None
+    for length in (2, 1):
+        market = market_rules.get(code[:length])
+        if market is not None:
+            return f'{market}.{code}'
+    return None
+
+
+class QuoteIdIndex:
+    """
+    code → secid 的持久化索引。
+    查询顺序：索引 → 代码规则推断 → （调用方）suggest接口，命中统计按冷/热查询区分
+    """
+    file_name = 'quote_id.json'
+    log_every = 200  # 每查询多少次输出一次命中率
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__path = os.path.join(folder_path, QuoteIdIndex.file_name)
+        self.__data, self.update_time = self._read()
+        self.__seen = set()  # 本进程中已查询过的code，用于区分冷/热查询
+        self.__stats = {
+            'cold': {'index': 0, 'rule': 0, 'miss': 0},
+            'warm': {'index': 0, 'rule': 0, 'miss': 0},
+        }
+
+    def __len__(self):
+        return len(self.__data)
+
+    def _read(self) -> (dict, float):
+        if not os.path.exists(self.__path):
+            return {}, 0
+        try:
+            with open(self.__path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data.get('data', {}), data.get('update_time', 0)
+        except (OSError, ValueError) as e:
+            logging.warning(f'secid索引读取失败：{e}')
+            return {}, 0
+
+    def _save(self):
+        if not os.path.exists(folder_path):
+            os.makedirs(folder_path)
+        tmp_path = f'{self.__path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'update_time': self.update_time, 'data': self.__data}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.__path)
+
+    def lookup(self, code: str) -> Union[str, None]:
+        """本地查询secid，未命中返回None（由调用方回源并 set）"""
+        code = str(code).strip()
+        with self.__lock:
+            temperature = 'warm' if code in self.__seen else 'cold'
+            self.__seen.add(code)
+
+            quote_id = self.__data.get(code)
+            source = 'index'
+            if not quote_id:
+                quote_id = infer(code)
+                source = 'rule' if quote_id else 'miss'
+            self.__stats[temperature][source] += 1
+            total = sum(sum(item.values()) for item in self.__stats.values())
+
+        if source == 'miss':
+            logging.debug(f'secid索引未命中：{code}')
+        if total % QuoteIdIndex.log_every == 0:
+            logging.info(f'secid索引命中率：{self.stats()}')
+        return quote_id
+
+    def set(self, code: str, quote_id: str):
+        if not quote_id:
+            return
+        with self.__lock:
+            if self.__data.get(code) == quote_id:
+                return
+            self.__data[code] = quote_id
+            self._save()
+
+    def update(self, mapping: dict):
+        """批量写入（全量刷新）"""
+        with self.__lock:
+            self.__data.update(mapping)
+            self.update_time = time.time()
+            self._save()
+        logging.info(f'secid索引已刷新：{len(mapping)}条')
+
+    def stats(self) -> dict:
+        result = {}
+        for temperature, item in self.__stats.items():
+            total = sum(item.values())
+            result[temperature] = {
+                **item,
+                'total': total,
+                'hit_rate': round((item['index'] + item['rule']) / total, 4) if total else None,
+            }
+        return result
+
+
+index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> QuoteIdIndex:
+    global index
+    if index is None:
+        with _index_lock:
+            if index is None:
+                index = QuoteIdIndex()
+    return index
+
+
+def stats() -> dict:
+    return get_index().stats()
@@ -0,0 +1,223 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 17:00
+# FileName: 上游响应的录制与回放（本地替身服务）
+
+"""
+UpstreamMode = record：正常请求上游，并将成功的响应录制到 FixtureDir
+UpstreamMode = replay：请求改发到本地替身服务，由其回放录制的响应，可注入延迟、抖动与错误
+
+替身服务默认在进程内启动；也可单独启动（项目根目录）：python -m api.replay --port 8900
+并配置 ReplayServer = 'http://127.0.0.1:8900'
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import config
+
+# 每次请求都会变化的参数，不参与匹配（时间戳、设备号、按当日计算的日期范围）
+ignore_params = ('_', 'deviceid', 'startDate', 'endDate')
+
+_lock = threading.Lock()
+_server = None
+
+
+def get_mode() -> str:
+    return str(config.UpstreamMode or '').lower()
+
+
+def fixture_key(url: str, params: dict = None) -> str:
+    """录制与回放的匹配键：host + path + 排序后的参数"""
+    parts = urlsplit(url)
+    items = parse_qsl(parts.query, keep_blank_values=True)
+    items += [(key, str(value)) for key, value in (params or {}).items() if value is not None]
+    items = sorted((key, value) for key, value in items if key not in ignore_params)
+    return f'{parts.hostname}{parts.path}?{urlencode(items)}'
+
+
+def fixture_path(key: str) -> str:
+    host = key.split('/', 1)[0]
+    return os.path.join(str(config.FixtureDir), host, f'{hashlib.sha1(key.encode()).hexdigest()[:16]}.json')
+
+
+def record(url: str, params: dict, resp):
+    """
+    录制响应（requests 或 httpx 的响应）
+    :param url:
+    :param params:
+    :param resp:
+    :return:
+    """
+    key = fixture_key(url, params)
+    fixture = {
+        'key': key,
+        'status': resp.status_code,
+        'content_type': resp.headers.get('content-type', ''),
+        'time': int(time.time()),
+    }
+    try:
+        fixture['body'] = resp.content.decode('utf-8')
+    except UnicodeDecodeError:
+        fixture['body_base64'] = base64.b64encode(resp.content).decode()
+
+    path = fixture_path(key)
+    with _lock:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(fixture, f, ensure_ascii=False)
+
+
+class FixtureStore:
+    """录制的响应，按匹配键懒加载"""
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__fixtures = {}
+
+    def get(self, key: str) -> (int, str, bytes):
+        """
+        :param key:
+        :return: (状态码, Content-Type, 响应体)；未录制时为None
+        """
+        if key not in self.__fixtures:
+            path = fixture_path(key)
+            fixture = None
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    fixture = json.load(f)
+            with self.__lock:
+                self.__fixtures[key] = fixture
+
+        fixture = self.__fixtures[key]
+        if fixture is None:
+            return None
+        body = fixture['body'].encode('utf-8') if 'body' in fixture else base64.b64decode(fixture['body_base64'])
+        return fixture['status'], fixture['content_type'], body
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """请求路径为 /{原host}{原path}?{原参数}"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        delay, error = server.inject()
+        time.sleep(delay)
+
+        found = None if error else server.store.get(fixture_key(f'http:/{self.path}'))
+        if found is None:
+            status, content_type, body = (server.error_status if error else 404), 'text/plain', b''
+            server.count('errors' if error else 'misses')
+        else:
+            status, content_type, body = found
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    本地替身服务：回放录制的响应，按固定种子注入延迟、抖动与错误，便于复现
+    """
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), *, latency: float = 0, jitter: float = 0,
+                 error_rate: float = 0, error_status: int = 503, seed: int = 0):
+        """
+
+        :param address:
+        :param latency: 每个请求的固定延迟（秒）
+        :param jitter: 额外的随机延迟上限（秒）
+        :param error_rate: 返回错误状态码的概率
+        :param error_status: 注入的错误状态码
+        :param seed: 随机种子
+        """
+        super().__init__(address, StandInHandler)
+        self.store = FixtureStore()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.__lock = threading.Lock()
+        self.__random = random.Random(seed)
+        self.stats = {'requests': 0, 'errors': 0, 'misses': 0}
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def inject(self) -> (float, bool):
+        """:return: (延迟, 是否返回错误)"""
+        with self.__lock:
+            self.stats['requests'] += 1
+            delay = self.latency + self.__random.uniform(0, self.jitter)
+            return delay, self.__random.random() < self.error_rate
+
+    def count(self, name: str):
+        with self.__lock:
+            self.stats[name] += 1
+
+
+def create_server(address=('127.0.0.1', 0)) -> StandInServer:
+    """按配置创建替身服务"""
+    return StandInServer(address,
+                         latency=float(config.ReplayLatency),
+                         jitter=float(config.ReplayJitter),
+                         error_rate=float(config.ReplayErrorRate),
+                         error_status=int(config.ReplayErrorStatus),
+                         seed=int(config.ReplaySeed))
+
+
+def get_server() -> StandInServer:
+    """进程内的替身服务（首次使用时启动）"""
+    global _server
+    if _server is None:
+        with _lock:
+            if _server is None:
+                server = create_server()
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+                logging.info(f'上游替身服务已启动：{server.url}')
+                _server = server
+    return _server
+
+
+def rewrite(url: str) -> str:
+    """回放时实际请求的地址"""
+    base = str(config.ReplayServer or '') or get_server().url
+    parts = urlsplit(url)
+    query = f'?{parts.query}' if parts.query else ''
+    return f'{base.rstrip("/")}/{parts.netloc}{parts.path}{query}'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='上游替身服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    args = parser.parse_args()
+
+    stand_in = create_server((args.host, args.port))
+    print(f'serving {config.FixtureDir} on {stand_in.url}')
+    stand_in.serve_forever()
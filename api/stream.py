@@ -0,0 +1,236 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 18:00
+# FileName: 股票行情推送订阅（SSE）
+
+"""
+订阅 push2 的 ulist SSE 推送，在内存中保存每个订阅代码的最新行情（字段与 Stock.detail_fields 一致）。
+订阅的代码由 get_codes 提供（股票的各类关注项），变化时自动重新订阅；断开时退避重连。
+
+推送格式：每个事件为 `data: {"rc":0,"data":{"total":n,"diff":{...}}}`。
+首个事件为全量快照，之后为增量（只含变化的字段），diff 的键为代码在订阅列表中的位置。
+"""
+
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List
+
+import httpx
+
+from api import decode, guard
+from api.eastmoney import Stock
+import config
+
+
+class QuoteStream:
+    """
+    股票行情推送订阅，运行于事件循环中
+    """
+
+    def __init__(self, *, url: str = None, get_codes: Callable[[], List[str]] = None):
+        """
+
+        :param url: 推送地址，默认为 Stock 的 SSE 接口（用于替身服务）
+        :param get_codes: 需要订阅的代码，在线程池中调用；默认不订阅
+        """
+        self.url = url
+        self.get_codes = get_codes or list
+        self.adapter = Stock()
+        self.relate = self.adapter._batch_relate()
+        self.listeners: List[Callable] = []
+
+        self.__task = None
+        self.__loop = None
+        self.__changed = None
+        self.__codes = []
+        self.__positions = {}  # 订阅位置 → 代码
+        self.__quotes: Dict[str, dict] = {}
+        self.connected = False
+        self.events = 0
+        self.reconnects = 0
+        self.last_event_at = 0
+
+    @property
+    def codes(self) -> List[str]:
+        return list(self.__codes)
+
+    @property
+    def running(self) -> bool:
+        return self.__task is not None and not self.__task.done()
+
+    def start(self):
+        if not self.running:
+            self.__loop = asyncio.get_running_loop()
+            self.__changed = asyncio.Event()
+            self.__task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.__task is not None:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+        self.__task = None
+        self.connected = False
+
+    def resubscribe(self):
+        """立即检查订阅的代码并在变化时重新订阅，可在任意线程调用"""
+        if self.running:
+            self.__loop.call_soon_threadsafe(self.__changed.set)
+
+    def get_quotes(self, codes: List[str], fields: [] = None) -> dict:
+        """
+        推送中的最新行情，连接断开时为空
+        :param codes:
+        :param fields: 所需字段，最新行情不包含这些字段时视为缺失
+        :return: {code: data}
+        """
+        if not self.connected:
+            return {}
+        result = {}
+        for code in codes:
+            data = self.__quotes.get(str(code))
+            if data and all(field in data for field in fields or []):
+                result[str(code)] = dict(data)
+        return result
+
+    async def run(self):
+        attempt = 0
+        while True:
+            codes = await asyncio.get_running_loop().run_in_executor(None, self.get_codes)
+            if not codes:
+                self.__codes, self.connected = [], False
+                await self.__wait_changed(float(config.StreamSyncInterval))
+                continue
+
+            try:
+                await self.subscribe(codes)
+                attempt = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.connected = False
+                self.reconnects += 1
+                delay = guard.backoff(attempt)
+                logging.warning(f'行情推送断开：{e!r}，{delay:.1f}秒后重连')
+                attempt = min(attempt + 1, 10)
+                await asyncio.sleep(delay)
+
+    async def subscribe(self, codes: List[str]):
+        """订阅 codes，订阅的代码变化时返回（由外层重新订阅）"""
+        loop = asyncio.get_running_loop()
+        secids = await loop.run_in_executor(None, lambda: [self.adapter.get_quote_id(code) for code in codes])
+        secids = [secid for secid in secids if secid]
+        if not secids:
+            raise ValueError(f'无可订阅的代码：{codes}')
+
+        self.__changed.clear()
+        reader = asyncio.create_task(self.__read(codes, secids))
+        try:
+            while True:
+                changed = asyncio.create_task(self.__changed.wait())
+                done, _ = await asyncio.wait({reader, changed}, timeout=float(config.StreamSyncInterval),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                changed.cancel()
+                if reader in done:
+                    reader.result()  # 抛出连接异常
+                    raise ConnectionError('推送连接已关闭')
+
+                self.__changed.clear()
+                new_codes = await loop.run_in_executor(None, self.get_codes)
+                if set(new_codes) != set(codes):
+                    logging.info(f'订阅的代码变化，重新订阅行情：{len(codes)} → {len(new_codes)}')
+                    return
+        finally:
+            reader.cancel()
+
+    async def __read(self, codes: List[str], secids: List[str]):
+        url, params = self.adapter._stream_request(secids, self.relate)
+        timeout = httpx.Timeout(float(config.HttpTimeout), read=float(config.StreamIdleTimeout))
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            async with client.stream('GET', self.url or url, params=params, headers=self.adapter.headers) as resp:
+                resp.raise_for_status()
+                self.__codes = list(codes)
+                self.__positions = {}
+                self.__quotes = {code: data for code, data in self.__quotes.items() if code in codes}
+                logging.info(f'行情推送已订阅：{len(codes)}个代码')
+
+                async for line in resp.aiter_lines():
+                    if line.startswith('data:'):
+                        self.on_event(line[5:].strip())
+
+    def on_event(self, payload: str):
+        """处理一个推送事件：合并到最新行情，并通知监听者"""
+        try:
+            data = decode.loads(payload).get('data')
+        except decode.DecodeError:
+            logging.warning(f'行情推送解析失败：{payload[:100]}')
+            return
+        if not data or not data.get('diff'):
+            return
+
+        diff = data['diff']
+        items = diff.items() if isinstance(diff, dict) else enumerate(diff)
+        updated = []
+        for position, item in items:
+            position = str(position)
+            if 'f12' in item:
+                self.__positions[position] = str(item['f12'])
+            code = self.__positions.get(position)
+            if code is None:
+                continue
+            quote = self.__quotes.setdefault(code, {})
+            quote.update({field: item[batch_field] for batch_field, field in self.relate.items()
+                          if batch_field in item})
+            updated.append(code)
+
+        self.connected = True
+        self.events += 1
+        self.last_event_at = time.time()
+        for listener in self.listeners:
+            try:
+                listener(updated)
+            except Exception as e:
+                logging.exception(f'行情推送监听处理失败：{e}')
+
+    async def __wait_changed(self, timeout: float):
+        try:
+            await asyncio.wait_for(self.__changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.__changed.clear()
+
+    def stats(self) -> dict:
+        return {
+            'running': self.running,
+            'connected': self.connected,
+            'codes': len(self.__codes),
+            'events': self.events,
+            'reconnects': self.reconnects,
+            'last_event_at': int(self.last_event_at),
+        }
+
+
+stream = None
+
+
+def get_stream() -> QuoteStream:
+    global stream
+    if stream is None:
+        stream = QuoteStream()
+    return stream
+
+
+def resubscribe():
+    """订阅的代码变化时通知推送重新订阅"""
+    if stream is not None:
+        stream.resubscribe()
+
+
+def get_quotes(codes: List[str], fields: [] = None) -> dict:
+    """推送中的最新行情；未启用推送时为空"""
+    if stream is None or not stream.running:
+        return {}
+    return stream.get_quotes(codes, fields)
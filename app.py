@@ -3,6 +3,7 @@
 # CreateTime: 2023/7/28 15:27
 # FileName: 基于FastAPI的app
 
+import asyncio
 import logging
 from enum import Enum
 from typing import Union, List
@@ -12,11 +13,13 @@ from fastapi import FastAPI, Query, WebSocket, WebSocketDisconnect
 from fastapi.responses import PlainTextResponse, JSONResponse
 from pydantic import BaseModel
 
+from api import eastmoney, fetch, guard, quote_id, stream
 from module.process import worth, process
-from module import focus
+from module import cache, focus, task, bad_code
 import scheduler
 from sockets import Client
 from utils import log_util
+import config
 
 log_util.init_logging('', datefmt='%Y-%m-%d %H:%M:%S', stream_level='INFO')
 app = FastAPI()
@@ -25,13 +28,22 @@ app = FastAPI()
 # 程序启动
 @app.on_event("startup")
 async def startup_event():
+    # 后台预热上游连接，不阻塞启动
+    loop = asyncio.get_running_loop()
+    loop.run_in_executor(None, fetch.warm_up, eastmoney.warm_urls)
+    # 后台刷新股票secid索引（未过期时跳过）
+    loop.run_in_executor(None, eastmoney.Stock().refresh_quote_index)
     await scheduler.start_scheduler()
+    if config.StreamEnabled:
+        await task.start_stream()
 
 
 # 程序终止
 @app.on_event("shutdown")
 async def shutdown_event():
     await scheduler.stop_scheduler()
+    await task.stop_stream()
+    await fetch.async_close()
 
 
 # 全局异常捕获
@@ -63,6 +75,7 @@ def search(
         'code': 200,
         'data': processor.get_data(),
         'fields': processor.get_fields(),
+        'skipped': processor.skipped,
     }
 
 
@@ -79,6 +92,7 @@ def search_history(
         'code': 200,
         'data': processor.get_data(),
         'fields': processor.get_fields(),
+        'skipped': processor.skipped,
     }
 
 
@@ -331,6 +345,38 @@ def focus_history_monitor_del(
     }
 
 
+# 上游状态：熔断、限流、重试预算、secid索引命中率、请求合并、行情推送
+@app.get("/admin/upstream")
+def admin_upstream():
+    return {
+        'code': 200,
+        'data': {
+            **guard.stats(),
+            'quote_id': quote_id.stats(),
+            'singleflight': eastmoney.flight.stats(),
+            'stream': stream.get_stream().stats(),
+        },
+    }
+
+
+# 缓存状态：各命名空间的条数、内存、命中率、失效与淘汰，及占用内存最大的key
+@app.get("/admin/cache")
+def admin_cache(top: int = Query(default=10, ge=0, le=100)):
+    return {
+        'code': 200,
+        'data': cache.stats(top),
+    }
+
+
+# 失效代码：请求失败或不存在而在退避中跳过的代码，及失败次数、原因与剩余的退避时间
+@app.get("/admin/bad_code")
+def admin_bad_code():
+    return {
+        'code': 200,
+        'data': bad_code.report(),
+    }
+
+
 @app.websocket("/ws")
 async def ws(websocket: WebSocket):
     await websocket.accept()
@@ -0,0 +1,120 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 18:30
+# FileName: 缓存失效的基准测试
+
+"""
+1. 对比带失效时间的 set 吞吐与线程数：原方式（每个key一个休眠线程）与单个清理线程（最小堆）。
+   原方式的线程数与key数相同，只以较少的key测试。
+2. 对比多线程混合读写的吞吐：所有操作共用一把锁（原方式）与无锁读取。
+
+用法（项目根目录）：python -m benchmark.bench_cache
+"""
+
+import concurrent.futures
+import random
+import threading
+import time
+
+from module import cache
+
+KEYS = 100000
+LEGACY_KEYS = 5000
+EXPIRE = 600
+THREADS = 32
+OPERATIONS = 20000  # 每个线程的操作数
+WRITE_RATIO = 0.1
+
+
+class LegacyCache:
+    """原实现：每个带失效时间的key启动一个休眠线程"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}
+
+    def set(self, key, value, *, expire=None):
+        with self.lock:
+            self.data[key] = {'value': value, 'expire': time.time() + expire if expire else float('inf')}
+            if expire:
+                threading.Thread(target=self.expire, args=(key, expire), daemon=True).start()
+
+    def expire(self, key, expire):
+        time.sleep(expire)
+        with self.lock:
+            self.data.pop(key, None)
+
+
+class LockedCache:
+    """原方式：读写共用一把锁"""
+
+    def __init__(self, instance):
+        self.lock = threading.Lock()
+        self.instance = instance
+
+    def set(self, key, value, *, expire=None):
+        with self.lock:
+            self.instance.set(key, value, expire=expire)
+
+    def get(self, key):
+        with self.lock:
+            return self.instance.get(key)
+
+
+def contend(name, instance):
+    keys = [f'worth.stock.{index:06d}' for index in range(1000)]
+    for key in keys:
+        instance.set(key, key, expire=EXPIRE)
+
+    def work(seed):
+        rand = random.Random(seed)
+        for _ in range(OPERATIONS):
+            key = rand.choice(keys)
+            if rand.random() < WRITE_RATIO:
+                instance.set(key, key, expire=EXPIRE)
+            else:
+                instance.get(key)
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=THREADS) as executor:
+        list(executor.map(work, range(THREADS)))
+    cost = time.perf_counter() - start
+    print(f'{name:<10}{THREADS:>10}{THREADS * OPERATIONS / cost:>14,.0f}/s')
+
+
+def measure(name, instance, count):
+    threads = threading.active_count()
+    start = time.perf_counter()
+    for index in range(count):
+        instance.set(f'history.stock.{index}.31', index, expire=EXPIRE)
+    cost = time.perf_counter() - start
+    print(f'{name:<10}{count:>10}{count / cost:>14,.0f}/s{threading.active_count() - threads:>12}')
+
+
+def main():
+    print(f'{"cache":<10}{"keys":>10}{"set":>16}{"threads":>12}')
+    measure('legacy', LegacyCache(), LEGACY_KEYS)
+
+    instance = cache.get_cache()
+    measure('sweeper', instance, KEYS)
+    # 覆盖已有的key：旧的失效时间被替代
+    measure('overwrite', instance, KEYS)
+
+    # 失效的清理
+    instance.clear()
+    for index in range(KEYS):
+        instance.set(f'client.{index}', index, expire=1)
+    start = time.perf_counter()
+    while instance.data:
+        time.sleep(0.01)
+    print(f'swept {KEYS} keys (expire 1s) in {time.perf_counter() - start:.2f}s')
+
+    print(f'\n{"cache":<10}{"threads":>10}{"get/set":>16}')
+    instance.clear()
+    contend('locked', LockedCache(instance))
+    instance.clear()
+    contend('lock-free', instance)
+
+
+if __name__ == '__main__':
+    main()
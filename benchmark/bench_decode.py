@@ -0,0 +1,98 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 16:30
+# FileName: 响应解码的基准测试
+
+"""
+对比各类上游响应的解码耗时：原方式（resp.json() / 文本strip + json.loads）与 decode.parse（标准库、orjson）。
+响应体为按上游格式构造的模拟数据。
+
+用法（项目根目录）：python -m benchmark.bench_decode
+"""
+
+import json
+import random
+import timeit
+
+import requests
+
+from api import decode
+
+REPEAT = 5
+
+
+def make_response(body: str) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = 200
+    resp.encoding = 'utf-8'
+    resp._content = body.encode('utf-8')
+    return resp
+
+
+def payloads() -> dict:
+    random.seed(0)
+    fund = {'fundcode': '161226', 'name': '国投白银LOF', 'jzrq': '2026-10-15', 'dwjz': '1.2345',
+            'gsz': '1.2401', 'gszzl': '0.45', 'gztime': '2026-10-16 15:00'}
+    funds = [[f'{index:06d}', f'JJ{index}', f'测试基金{index}', '混合型', f'CESHIJIJIN{index}']
+             for index in range(26000)]
+    diff = [{'f1': 2, 'f2': random.randint(100, 9999), 'f5': random.randint(1, 10 ** 6), 'f6': random.random() * 1e8,
+             'f12': f'{index:06d}', 'f14': f'股票{index}', 'f15': 1000, 'f16': 990, 'f17': 995, 'f18': 992,
+             'f124': 1792116000} for index in range(100)]
+    klines = [f'2026-01-{index % 28 + 1:02d},10.00,10.10,10.20,9.90,{random.randint(1, 10 ** 6)},1.2e8,1.00,0.50,'
+              f'0.05,0.30' for index in range(250)]
+    lsjz = [{'FSRQ': f'2026-10-{index % 28 + 1:02d}', 'DWJZ': '1.2345', 'LJJZ': '2.3456', 'JZZZL': '0.12',
+             'SGZT': '开放申购', 'SHZT': '开放赎回', 'FHFCZ': '', 'FHFCBZ': '', 'DTYPE': None, 'FHSP': ''}
+            for index in range(100)]
+    return {
+        # 名称: (响应, 原方式, 新方式)
+        'fundgz': (
+            make_response(f'jsonpgz({json.dumps(fund, ensure_ascii=False)});'),
+            lambda resp: json.loads(resp.text.lstrip('jsonpgz(').rstrip(');')),
+            lambda resp: decode.parse(resp, jsonp=True),
+        ),
+        'fundcode_search': (
+            make_response(f'var r = {json.dumps(funds, ensure_ascii=False)};'),
+            lambda resp: json.loads(resp.text.lstrip('var r = ').rstrip(';')),
+            lambda resp: decode.parse(resp, jsonp=True),
+        ),
+        'ulist(100)': (
+            make_response(json.dumps({'rc': 0, 'data': {'total': 100, 'diff': diff}}, ensure_ascii=False)),
+            lambda resp: resp.json()['data'],
+            lambda resp: decode.parse(resp, 'data'),
+        ),
+        'kline(250)': (
+            make_response(json.dumps({'rc': 0, 'data': {'code': '600000', 'decimal': 2, 'klines': klines}})),
+            lambda resp: resp.json()['data'],
+            lambda resp: decode.parse(resp, 'data'),
+        ),
+        'lsjz(100)': (
+            make_response(json.dumps({'ErrCode': 0, 'TotalCount': 100, 'Data': {'LSJZList': lsjz}},
+                                     ensure_ascii=False)),
+            lambda resp: resp.json(),
+            lambda resp: decode.parse(resp),
+        ),
+    }
+
+
+def measure(func, resp) -> float:
+    number = max(1, int(2e6 // len(resp.content)))
+    return min(timeit.repeat(lambda: func(resp), number=number, repeat=REPEAT)) / number * 1000
+
+
+def main():
+    print(f'{"payload":<16}{"size":>10}{"before":>12}{"stdlib":>12}{"orjson":>12}')
+    orjson = decode.orjson
+    for name, (resp, before, after) in payloads().items():
+        assert before(resp) == after(resp), name
+
+        decode.orjson = None
+        stdlib_cost = measure(after, resp)
+        decode.orjson = orjson
+        orjson_cost = measure(after, resp) if orjson else float('nan')
+
+        print(f'{name:<16}{len(resp.content):>10}{measure(before, resp):>10.3f}ms'
+              f'{stdlib_cost:>10.3f}ms{orjson_cost:>10.3f}ms')
+
+
+if __name__ == '__main__':
+    main()
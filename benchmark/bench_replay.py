@@ -0,0 +1,68 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 17:00
+# FileName: 离线回放的吞吐测试
+
+"""
+用录制的上游响应离线测试 Worth、History、Monitor、HistoryMonitor 的耗时与上游吞吐。
+关注项取自 data/ 下的关注配置；每轮前清空缓存，使每轮都实际请求（替身）上游。
+
+用法（项目根目录）：
+1. 录制：以 UpstreamMode=record 正常运行服务或定时任务，响应写入 FixtureDir
+2. 回放：ReplayLatency=0.05 ReplayJitter=0.1 ReplayErrorRate=0.02 python -m benchmark.bench_replay
+"""
+
+import statistics
+import time
+
+from api import replay
+from module import cache
+from module.process import monitor, worth
+import config
+
+TICKS = 5
+
+
+def processors() -> dict:
+    result = {}
+    for money_type in ('stock', 'fund'):
+        result.update({
+            f'Worth.{money_type}': lambda mode=money_type: worth.Worth(mode).get_data(),
+            f'History.{money_type}': lambda mode=money_type: worth.History(mode).get_data(),
+            f'Monitor.{money_type}': lambda mode=money_type: monitor.Monitor(mode).get_message(to_cache=False),
+            f'HistoryMonitor.{money_type}': lambda mode=money_type:
+            monitor.HistoryMonitor(mode).get_message(to_cache=False),
+        })
+    return result
+
+
+def main():
+    config.UpstreamMode = 'replay'
+    config.UpstreamRate = 0  # 只测服务本身，不限流
+    server = replay.get_server()
+    print(f'fixtures {config.FixtureDir}, latency {server.latency * 1000:.0f} ms, '
+          f'jitter {server.jitter * 1000:.0f} ms, error rate {server.error_rate:.1%}, seed {config.ReplaySeed}')
+
+    for name, func in processors().items():
+        costs = []
+        before = dict(server.stats)
+        for _ in range(TICKS):
+            cache.clear()
+            start = time.perf_counter()
+            try:
+                func()
+            except AssertionError as e:  # 无关注项
+                print(f'{name:<22} skipped: {e}')
+                break
+            costs.append(time.perf_counter() - start)
+        if not costs:
+            continue
+
+        stats = {key: value - before[key] for key, value in server.stats.items()}
+        print(f'{name:<22} mean: {statistics.mean(costs) * 1000:8.1f} ms    max: {max(costs) * 1000:8.1f} ms    '
+              f'upstream: {stats["requests"] / sum(costs):7.1f} req/s    '
+              f'errors: {stats["errors"]:4d}    misses: {stats["misses"]:4d}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 10:00
+# FileName: 连接池的基准测试
+
+"""
+对比 裸requests.get 与 共享连接池 在单次定时任务（200个代码）中的耗时。
+本地起一个HTTP服务模拟上游，新建连接时额外等待以模拟 TCP+TLS 握手。
+
+用法（项目根目录）：python -m benchmark.bench_transport
+"""
+
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from api import fetch
+from utils import pools
+import config
+
+CODES = 200
+TICKS = 5
+HANDSHAKE = 0.03  # 新建连接的耗时（秒）
+LATENCY = 0.005  # 每个请求的服务耗时（秒）
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # 支持 keep-alive
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        time.sleep(HANDSHAKE)
+        super().setup()
+
+    def do_GET(self):
+        time.sleep(LATENCY)
+        body = json.dumps({'rc': 0, 'data': {'f43': 1000, 'f57': '600000', 'f58': 'stand-in'}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def run_tick(get, url):
+    def one(code):
+        return get(url, params={'secid': f'1.{code}'}, timeout=10).status_code
+
+    args_list = [[(f'{index:06d}',)] for index in range(CODES)]
+    start = time.perf_counter()
+    pools.execute_thread(one, args_list)
+    return time.perf_counter() - start
+
+
+def report(title, costs):
+    print(f'{title:<12} mean: {statistics.mean(costs) * 1000:8.1f} ms    '
+          f'p50: {statistics.median(costs) * 1000:8.1f} ms    max: {max(costs) * 1000:8.1f} ms')
+
+
+def main():
+    config.UpstreamRate = 0  # 只比较连接开销，不限流
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/api/qt/stock/get'
+
+    print(f'{CODES} codes/tick, {TICKS} ticks, handshake {HANDSHAKE * 1000:.0f} ms, '
+          f'latency {LATENCY * 1000:.0f} ms, pool {config.HttpPoolSize}')
+
+    report('before', [run_tick(requests.get, url) for _ in range(TICKS)])
+
+    fetch.warm_up([url])
+    report('after', [run_tick(fetch.get, url) for _ in range(TICKS)])
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
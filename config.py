@@ -11,6 +11,126 @@ import yaml
 # 估值查询使用缓存
 WorthUseCache = True
 
+# 估值缓存：交易中的最短缓存时间（秒）。交易中缓存至数据的预计下次更新，休市时缓存至下次开盘
+WorthMinExpire = 10
+
+# 估值缓存：基金收盘后净值尚未更新时，重新获取的间隔（秒）
+FundNavInterval = 1800
+
+# 估值缓存：过期后仍可返回的最长时间（秒），期间返回缓存并在后台刷新。0 为过期即重新请求
+WorthMaxStale = 30
+
+# 估值缓存：距过期不足该时间（秒）时，提前在后台刷新
+WorthRefreshAhead = 10
+
+# 上游请求：超时时间（秒）
+HttpTimeout = 10
+
+# 上游请求：每个host的连接池大小
+HttpPoolSize = 10
+
+# 上游请求：指定host的连接池大小，覆盖 HttpPoolSize。如 {'push2.eastmoney.com': 20}
+HttpHostPoolSize = {}
+
+# 上游请求：启动时每个host预热的连接数，0 为不预热
+HttpWarmSize = 2
+
+# 上游限流：每个接口每秒的请求数，0 为不限流
+UpstreamRate = 20
+
+# 上游限流：每个接口允许的突发请求数
+UpstreamBurst = 20
+
+# 上游重试：单个请求的最大重试次数
+UpstreamRetries = 2
+
+# 上游重试：退避的基准时间与上限（秒），实际等待为 [0, min(上限, 基准 * 2^n)] 的随机值
+UpstreamRetryBase = 0.2
+UpstreamRetryMax = 2
+
+# 上游重试预算：每个请求增加的重试额度，及额度上限。持续异常时，重试量约为请求量的 UpstreamRetryRatio
+UpstreamRetryRatio = 0.1
+UpstreamRetryBudget = 10
+
+# 上游熔断：连续失败次数达到阈值后熔断，冷却时间（秒）后放行探测请求
+BreakerFailures = 5
+BreakerCooldown = 30
+
+# 上游异步请求：最大并发数
+AsyncConcurrency = 50
+
+# 分页查询：并发请求的页数
+PageConcurrency = 8
+
+# 交易日历：补充的休市日期（%Y-%m-%d），用于内置节假日未覆盖的年份
+TradeHolidays = []
+
+# 基金历史净值每页数量（超过接口上限时，以接口实际返回的数量为准）
+FundHistoryPageSize = 100
+
+# 股票secid索引的全量刷新间隔（天）
+QuoteIdRefreshDays = 7
+
+# 股票批量行情每次请求的最大代码数
+StockBatchSize = 100
+
+# 基金批量估值每次请求的最大代码数
+FundBatchSize = 50
+
+# 全局缓存：最大条数，及占用内存（近似）的上限（字节），超过时淘汰最久未使用的缓存。0 为不限制
+CacheMaxEntries = 200000
+CacheMaxBytes = 512 * 1024 * 1024
+
+# 全局缓存：各命名空间（key首个 . 或 : 之前的部分）的最大条数。如 {'client': 50000, 'history': 5000}
+CacheQuotas = {}
+
+# 全局缓存：输出缓存状态日志的间隔（秒），0 为不输出
+CacheStatsInterval = 600
+
+# 全局缓存：当天失效的缓存（历史数据、名称、通知记录等）在次日0点后分散失效的时间范围（秒），需早于开盘。0 为0点同时失效
+CacheDayJitter = 7200
+
+# 全局缓存的磁盘层（SQLite）路径，为空时不启用。如 'data/cache.db'
+CacheDiskPath = ''
+
+# 全局缓存：写入磁盘层的命名空间（重启后保留当天的历史数据、名称与已发送通知的记录）。
+# 客户端消息的去重（client）以连接为key，重启后无法再命中，不写入
+CacheDiskNamespaces = ['history', 'history_monitor', 'code_name', 'monitor']
+
+# 失效代码（请求失败或不存在）：首次失败后跳过的时间（秒），连续失败时加倍
+BadCodeBackoff = 60
+BadCodeMaxBackoff = 6 * 60 * 60
+
+# 上游模式：空为直连；record 为直连并录制响应；replay 为由本地替身服务回放录制的响应（用于离线压测）
+UpstreamMode = ''
+
+# 录制的响应目录
+FixtureDir = 'data/fixtures'
+
+# 回放：替身服务地址，为空时在进程内启动。如 'http://127.0.0.1:8900'
+ReplayServer = ''
+
+# 回放：每个请求的延迟（秒），及额外的随机抖动上限（秒）
+ReplayLatency = 0
+ReplayJitter = 0
+
+# 回放：注入错误的概率、错误状态码，及随机种子（相同种子可复现相同的延迟与错误序列）
+ReplayErrorRate = 0
+ReplayErrorStatus = 503
+ReplaySeed = 0
+
+# 股票行情推送：启用后订阅关注股票的行情推送（SSE），行情变化时触发监控；定时任务仍作为兜底
+StreamEnabled = False
+
+# 行情推送：检查关注项变化（变化时重新订阅）的间隔（秒）
+StreamSyncInterval = 5
+
+# 行情推送：行情变化后触发监控的最小间隔（秒）
+StreamEvalInterval = 3
+
+# 行情推送：无推送数据的超时时间（秒），超时后重连
+StreamIdleTimeout = 60
+
 # 飞书机器人
 FeiShuRobotUrl = ''
 
@@ -50,6 +170,15 @@ StockHisMonitorCron = [
 
 ]
 
+# 开盘前预热历史数据缓存的任务。当天失效的缓存在0点后分散失效（CacheDayJitter），需在其后、开盘前预热，
+# 否则开盘后首次任务集中请求全部历史数据
+CacheWarmCron = [
+    '0 8 * * mon-fri',
+]
+
+# 预热：相邻两个代码的加载间隔（秒），使上游请求平滑
+CacheWarmPace = 1
+
 # 阈值监控任务广播
 BroadMonitorCron = [
 
@@ -0,0 +1,211 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 20:30
+# FileName: 失效代码的负缓存
+
+"""
+记录请求失败或不存在的代码（退市、停牌、输错等），按指数退避跳过，避免每次任务与查询都请求上游。
+退避期间跳过该代码，到期后重试一次：成功则移除，仍失败则退避时间加倍（不超过 BadCodeMaxBackoff）。
+只记录请求成功但无数据的代码；请求失败（上游故障）时不记录，由上游的熔断与重试处理。
+按数据种类分别记录：quote 当前数据，history 历史数据，一种数据无效时不影响另一种。
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Tuple, Union
+
+import config
+
+
+def get_backoff(failures: int) -> int:
+    """连续失败 failures 次后的退避时间（秒）"""
+    return int(min(float(config.BadCodeBackoff) * 2 ** (failures - 1), float(config.BadCodeMaxBackoff)))
+
+
+QUOTE = 'quote'
+HISTORY = 'history'
+
+
+class BadCodes:
+    """
+    失效代码的记录，key为 (数据种类, 类型, 代码)
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__data: Dict[Tuple[str, str, str], dict] = {}
+
+    def fail(self, money_type, code, reason: str = '', *, kind: str = QUOTE) -> dict:
+        """记录一次失败，退避期间重复记录（如并发的任务）不再加倍"""
+        key = (kind, money_type, str(code))
+        now = time.time()
+        with self.__lock:
+            item = self.__data.get(key)
+            if item is None:
+                item = self.__data[key] = {'failures': 0, 'first_time': now}
+            elif item['retry_at'] > now:
+                return dict(item)
+            item['failures'] += 1
+            item['reason'] = reason
+            item['last_time'] = now
+            item['retry_at'] = now + get_backoff(item['failures'])
+            result = dict(item)
+        logging.info(f'代码请求失败：{kind} {money_type} {code}，{reason}，第{result["failures"]}次，'
+                     f'{result["retry_at"] - now:.0f}秒内跳过')
+        return result
+
+    def recover(self, money_type, code, *, kind: str = QUOTE):
+        key = (kind, money_type, str(code))
+        if key not in self.__data:
+            return
+        with self.__lock:
+            item = self.__data.pop(key, None)
+        if item is not None:
+            logging.info(f'代码已恢复：{kind} {money_type} {code}，此前失败{item["failures"]}次')
+
+    def get(self, money_type, code, *, kind: str = QUOTE) -> Union[dict, None]:
+        """
+        代码的失败记录
+        :return: {failures, reason, first_time, last_time, retry_at, retry_in}；无记录时为None
+        """
+        item = self.__data.get((kind, money_type, str(code)))
+        if item is None:
+            return None
+        item = dict(item)
+        item['retry_in'] = max(0, int(item['retry_at'] - time.time()))
+        return item
+
+    def is_bad(self, money_type, code, *, kind: str = QUOTE) -> bool:
+        """代码在退避期间，应跳过"""
+        item = self.__data.get((kind, money_type, str(code)))
+        return item is not None and item['retry_at'] > time.time()
+
+    def split(self, money_type, codes: List[str], *, kind: str = QUOTE) -> (List[str], List[str]):
+        """
+        :return: (可请求的代码, 退避中跳过的代码)
+        """
+        if not self.__data:
+            return list(codes), []
+        good, bad = [], []
+        for code in codes:
+            (bad if self.is_bad(money_type, code, kind=kind) else good).append(code)
+        return good, bad
+
+    def record(self, money_type, codes: List[str], result: dict, ok: bool, reason: str = '无数据', *,
+               kind: str = QUOTE):
+        """
+        按批量请求的结果记录：返回数据的代码恢复；请求成功但无数据的代码记为失败
+        :param codes: 请求的代码
+        :param result: {code: data}
+        :param ok: 请求是否全部成功；部分失败时无法区分原因，无数据的代码不记录
+        :param reason:
+        :return:
+        """
+        for code in codes:
+            if result.get(code):
+                self.recover(money_type, code, kind=kind)
+            elif ok:
+                self.fail(money_type, code, reason, kind=kind)
+
+    def report(self) -> List[dict]:
+        """
+        所有失败记录，按失败次数倒序；长期未再请求的记录（退避结束超过 BadCodeMaxBackoff）被移除
+        :return: [{kind, money_type, code, failures, reason, first_time, last_time, retry_in}]
+        """
+        now = time.time()
+        with self.__lock:
+            for key in [key for key, item in self.__data.items()
+                        if item['retry_at'] + float(config.BadCodeMaxBackoff) < now]:
+                del self.__data[key]
+            items = [(key, dict(item)) for key, item in self.__data.items()]
+
+        result = []
+        for (kind, money_type, code), item in items:
+            result.append({
+                'kind': kind,
+                'money_type': money_type,
+                'code': code,
+                'failures': item['failures'],
+                'reason': item['reason'],
+                'first_time': int(item['first_time']),
+                'last_time': int(item['last_time']),
+                'retry_in': max(0, int(item['retry_at'] - now)),
+            })
+        return sorted(result, key=lambda item: -item['failures'])
+
+    def clear(self):
+        with self.__lock:
+            self.__data.clear()
+
+
+bad_codes = BadCodes()
+
+
+def fail(money_type, code, reason: str = '', *, kind: str = QUOTE) -> dict:
+    return bad_codes.fail(money_type, code, reason, kind=kind)
+
+
+def recover(money_type, code, *, kind: str = QUOTE):
+    return bad_codes.recover(money_type, code, kind=kind)
+
+
+def get(money_type, code, *, kind: str = QUOTE) -> Union[dict, None]:
+    return bad_codes.get(money_type, code, kind=kind)
+
+
+def is_bad(money_type, code, *, kind: str = QUOTE) -> bool:
+    return bad_codes.is_bad(money_type, code, kind=kind)
+
+
+def split(money_type, codes: List[str], *, kind: str = QUOTE) -> (List[str], List[str]):
+    return bad_codes.split(money_type, codes, kind=kind)
+
+
+def record(money_type, codes: List[str], result: dict, ok: bool, reason: str = '无数据', *, kind: str = QUOTE):
+    return bad_codes.record(money_type, codes, result, ok, reason, kind=kind)
+
+
+def report() -> List[dict]:
+    return bad_codes.report()
+
+
+def clear():
+    return bad_codes.clear()
+
+
+def fetch_current(api, money_type, codes: List[str], *, fields: [] = None) -> (dict, List[str]):
+    """
+    批量获取当前数据：跳过退避中的失效代码，并按结果记录
+    :param api: eastmoney.EastMoney
+    :param money_type:
+    :param codes:
+    :param fields:
+    :return: ({code: data}, 跳过的代码)
+    """
+    codes, skipped = split(money_type, codes)
+    if skipped:
+        logging.info(f'跳过失效代码：{money_type} {skipped}')
+    if not codes:
+        return {}, skipped
+
+    logging.info(f'开始查询估值：{money_type} {codes}')
+    result, ok = api.fetch_current_batch(codes, fields=fields)
+    record(money_type, codes, result, ok)
+    return result, skipped
+
+
+def load_history(money_type, code, load: Callable[[], tuple]) -> Union[dict, None]:
+    """
+    加载单个代码的历史数据并记录：请求成功但无数据时记为失效，请求失败时不记录
+    :param load: load() -> (data, ok)
+    :return: 数据；失败或无数据时为None
+    """
+    res, ok = load()
+    if not ok:
+        return None
+    if not res:
+        fail(money_type, code, '无历史数据', kind=HISTORY)
+        return None
+    recover(money_type, code, kind=HISTORY)
+    return res
@@ -5,6 +5,7 @@
 
 import logging
 import sys
+import time
 from functools import wraps
 
 import config
@@ -53,11 +54,37 @@ def sys_exit(func):
 
 def set_cache_expire_today(key, value):
     """
-    设置当天失效的缓存
+    设置当天失效的缓存。失效时间按key分散在次日0点后的 CacheDayJitter 秒内，避免同时失效后集中请求
     :param key:
     :param value:
     :return:
     """
-    next_date = utils.get_delay_date(delay=1, tz=config.CronZone)
-    today_expire = utils.str2time(next_date, fmt="%Y-%m-%d", tz=config.CronZone) - utils.str2time(tz=config.CronZone)
-    cache.set(key, value, expire=int(today_expire) + 1)  # 增加1秒的缓冲
+    cache.set(key, value, expire=get_today_expire(key))
+
+
+def get_today_expire(key, value=None) -> int:
+    """
+    当天失效的缓存时间（秒），可作为 cache.memoize 的失效策略
+    :param key:
+    :param value: 缓存的值（未使用）
+    :return:
+    """
+    return int(get_day_end() - time.time()) + get_day_jitter(key) + 1  # 增加1秒的缓冲
+
+
+def get_day_jitter(key) -> int:
+    """key在次日0点后的失效延迟（秒），同一key固定"""
+    jitter = int(config.CacheDayJitter)
+    return int(utils.gen_hash(key)[:8], 16) % jitter if jitter > 0 else 0
+
+
+day_end = 0  # 当天结束（次日0点）的时间戳，跨天时重新计算
+
+
+def get_day_end() -> float:
+    """当天结束（次日0点）的时间戳"""
+    global day_end
+    if time.time() >= day_end:
+        next_date = utils.get_delay_date(delay=1, tz=config.CronZone)
+        day_end = utils.str2time(next_date, fmt="%Y-%m-%d", tz=config.CronZone)
+    return day_end
@@ -3,13 +3,157 @@
 # CreateTime: 2023/8/9 10:21
 # FileName: 全局缓存
 
+import collections
+import functools
+import heapq
+import logging
+import os
+import pickle
+import re
+import sqlite3
+import sys
 import threading
 import time
+from typing import Callable, Union
+
+from utils import singleflight, utils
+import config
+
+# 递归估算大小的容器类型（模块中的 set 函数会覆盖内置的 set，需在此之前引用）
+sequence_types = (list, tuple, set, frozenset)
+
+
+def get_namespace(key: str) -> str:
+    """key的命名空间：首个 . 或 : 之前的部分，关注配置文件（*.json）为 focus"""
+    if key.endswith('.json'):
+        return 'focus'
+    return re.split(r'[.:]', key, 1)[0]
+
+
+def sizeof(value, depth: int = 4) -> int:
+    """值占用内存的近似字节数：容器递归 depth 层，numpy数组按数据大小"""
+    nbytes = getattr(value, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes + 112
+    size = sys.getsizeof(value)
+    if depth <= 0:
+        return size
+    if isinstance(value, dict):
+        size += sum(sizeof(k, depth - 1) + sizeof(v, depth - 1) for k, v in value.items())
+    elif isinstance(value, sequence_types):
+        size += sum(sizeof(item, depth - 1) for item in value)
+    return size
+
+
+class DiskStore:
+    """
+    缓存的磁盘层（SQLite）：写穿指定命名空间的缓存，重启后仍可读取。值以pickle序列化，失效时间为空表示不失效
+    """
+
+    purge_every = 1000  # 每写入若干次，删除已失效的缓存
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            utils.mkdir(os.path.dirname(path))
+        self.__lock = threading.Lock()
+        self.__writes = 0
+        self.__conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.__conn.execute('PRAGMA journal_mode=WAL')
+        self.__conn.execute('PRAGMA synchronous=NORMAL')
+        self.__conn.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, expire REAL)')
+
+    def put(self, key: str, value, deadline: float, *, current: Callable[[], bool] = None) -> bool:
+        """
+
+        :param key:
+        :param value:
+        :param deadline: 失效的时间戳，inf 为不失效
+        :param current: 写入前（持有磁盘锁时）判断值是否仍为最新，否则跳过，避免并发写入时旧值覆盖新值
+        :return: 是否写入
+        """
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            logging.warning(f'缓存无法写入磁盘：{key}, {e}')
+            return False
+        expire = deadline if deadline < float('inf') else None
+        with self.__lock:
+            if current is not None and not current():
+                return False
+            self.__conn.execute('INSERT OR REPLACE INTO cache (key, value, expire) VALUES (?, ?, ?)',
+                                (key, blob, expire))
+            self.__writes += 1
+        if self.__writes % self.purge_every == 0:
+            self.purge()
+        return True
+
+    def get(self, key: str):
+        """
+        :return: (value, 失效时间)；不存在或已失效时为None
+        """
+        with self.__lock:
+            row = self.__conn.execute('SELECT value, expire FROM cache WHERE key = ? AND (expire IS NULL OR expire > ?)',
+                                      (key, time.time())).fetchone()
+        return None if row is None else self.__decode(key, *row)
+
+    def load(self) -> list:
+        """
+        :return: 未失效的全部缓存 [(key, value, 失效时间)]
+        """
+        with self.__lock:
+            rows = self.__conn.execute('SELECT key, value, expire FROM cache WHERE expire IS NULL OR expire > ?',
+                                       (time.time(),)).fetchall()
+        result = []
+        for key, blob, expire in rows:
+            item = self.__decode(key, blob, expire)
+            if item is not None:
+                result.append((key, *item))
+        return result
+
+    def delete(self, key: str, *, current: Callable[[], bool] = None) -> bool:
+        """
+
+        :param key:
+        :param current: 删除前（持有磁盘锁时）判断删除是否仍有效，否则跳过，避免删除并发写入的新值
+        :return: 是否删除
+        """
+        with self.__lock:
+            if current is not None and not current():
+                return False
+            self.__conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+        return True
+
+    def purge(self) -> int:
+        """删除已失效的缓存"""
+        with self.__lock:
+            return self.__conn.execute('DELETE FROM cache WHERE expire <= ?', (time.time(),)).rowcount
+
+    def clear(self):
+        with self.__lock:
+            self.__conn.execute('DELETE FROM cache')
+
+    def close(self):
+        with self.__lock:
+            self.__conn.close()
+
+    @classmethod
+    def __decode(cls, key, blob, expire):
+        try:
+            return pickle.loads(blob), float('inf') if expire is None else expire
+        except Exception as e:
+            logging.warning(f'磁盘缓存读取失败：{key}, {e}')
+            return None
 
 
 class Cache:
     """
-    全局缓存，可定时失效
+    全局缓存，可定时失效，按LRU（近似）淘汰。
+    读取不加锁：条目写入后不再修改（命中标记除外），字典的单次读取为原子操作；写入、删除、淘汰在写锁内完成。
+    失效由单个后台线程按最小堆依次清理，读取时也会惰性判断失效；
+    总条数、总字节数（近似）超过上限，或命名空间的条数超过配额时，按CLOCK（二次机会）淘汰：
+    从最早写入的key开始，读取过的key清除命中标记后移至末尾，未读取过的key被淘汰。
+    配置了 CacheDiskPath 时，CacheDiskNamespaces 中的缓存同时写入磁盘层：启动时整体加载，内存中缺失（如被淘汰）时再从磁盘读取。
+    磁盘IO均在写锁外进行；磁盘层中的key记录在内存中，不在磁盘层的key缺失时不读取磁盘
     """
     __lock = threading.Lock()
     instance = None
@@ -23,15 +167,46 @@ class Cache:
         with cls.__lock:
             if not hasattr(cls, 'instance') or cls.instance is None:
                 cls.instance = super(Cache, cls).__new__(cls)
+                cls.instance.__init()
             return cls.instance
 
-    def __init__(self):
-        self.__data = {}
+    def __init(self):
+        self.__data = collections.OrderedDict()  # 按写入（及二次机会）排序，淘汰的候选在前
+        self.__spaces = collections.defaultdict(collections.OrderedDict)  # {命名空间: {key: None}}，与 __data 的顺序一致
+        self.__bytes = 0
+        self.__heap = []  # [(失效时间, key)]，key被覆盖或删除后，堆中的旧记录在清理时跳过
+        self.__write_lock = threading.Lock()
+        self.__wakeup = threading.Condition(self.__write_lock)
+        self.__sweeper = None
+        # {命名空间: {hits, misses, sets, expirations, evictions, disk_loads}}。读取不加锁，读取相关的计数为近似值
+        self.__counters = collections.defaultdict(collections.Counter)
+        self.__space_bytes = collections.Counter()  # {命名空间: 占用内存（近似）}
+
+        self.__disk = DiskStore(config.CacheDiskPath) if config.CacheDiskPath else None
+        self.__disk_keys = {}  # {key: None}，磁盘层中的key（可能包含已失效或已删除的key，读取时移除）
+        if self.__disk is not None:
+            self.__disk.purge()
+            rows = self.__disk.load()
+            with self.__write_lock:
+                for key, value, deadline in rows:
+                    self.__insert(key, value, deadline)
+            self.__disk_keys.update(dict.fromkeys(key for key, *_ in rows))
+            logging.info(f'已从磁盘加载缓存：{len(rows)}条')
 
     @property
     def data(self):
         return self.__data
 
+    @property
+    def bytes(self) -> int:
+        return self.__bytes
+
+    @property
+    def evictions(self) -> collections.Counter:
+        """{命名空间: 淘汰数}"""
+        return collections.Counter({space: counter['evictions'] for space, counter in list(self.__counters.items())
+                                    if counter['evictions']})
+
     def set(self, key: str, value, *, expire: int = None):
         """
 
@@ -40,43 +215,246 @@ class Cache:
         :param expire: 失效时间（秒）
         :return:
         """
-        with Cache.__lock:
-            # TODO: set重复key时，停止原线程
-            self.__data[key] = {
-                'value': value,
-                'expire': time.time() + expire if expire else float('inf')
-            }
-
-            if expire:  # 另起一个删除缓存的线程
-                t = threading.Thread(target=self.__expire, args=(key, expire))
-                t.start()
+        deadline = time.time() + expire if expire else float('inf')
+        with self.__write_lock:
+            item = self.__put(key, value, deadline)
+        self.__write_through(key, item)
         return True
 
+    def __put(self, key: str, value, deadline: float) -> dict:
+        """写入内存（需持有锁），之后由 __write_through 在锁外写入磁盘层"""
+        item = self.__insert(key, value, deadline)
+        self.__counters[item['space']]['sets'] += 1
+        return item
+
+    def __write_through(self, key: str, item: dict):
+        """写入磁盘层（不持有写锁，磁盘IO不阻塞其他写入）；已被覆盖、删除或淘汰的值不再写入"""
+        if self.__persist(item['space']) \
+                and self.__disk.put(key, item['value'], item['expire'], current=lambda: self.__data.get(key) is item):
+            self.__disk_keys[key] = None
+
+    def __insert(self, key: str, value, deadline: float) -> dict:
+        """写入内存（需持有锁）"""
+        space = get_namespace(key)
+        item = {
+            'value': value,
+            'expire': deadline,
+            'size': sizeof(key) + sizeof(value),
+            'space': space,
+            'hit': False,
+        }
+        self.__remove(key)
+        self.__data[key] = item
+        self.__spaces[space][key] = None
+        self.__bytes += item['size']
+        self.__space_bytes[space] += item['size']
+
+        if deadline < float('inf'):
+            self.__schedule(key, deadline)
+        self.__evict(space)
+        return item
+
+    def __persist(self, space: str) -> bool:
+        """命名空间是否写入磁盘层"""
+        return self.__disk is not None and space in (config.CacheDiskNamespaces or [])
+
     def get(self, key: str):
-        with Cache.__lock:
-            if key in self.__data and time.time() < self.__data[key]['expire']:
-                return self.__data[key]['value']
-            return None
+        item = self.__touch(key)
+        return None if item is None else item['value']
 
     def exist(self, key: str):
-        with Cache.__lock:
-            return key in self.__data
+        return self.__touch(key) is not None
 
-    def __del(self, key):
-        with Cache.__lock:
-            if key in self.__data:
-                del self.__data[key]
-                return True
+    def add(self, key: str, value, *, expire: int = None) -> bool:
+        """
+        key不存在（或已失效）时写入，用于去重
+        :return: 是否写入
+        """
+        if self.__touch(key) is not None:  # 含磁盘层
+            return False
+        deadline = time.time() + expire if expire else float('inf')
+        with self.__write_lock:
+            item = self.__data.get(key)
+            if item is not None and time.time() < item['expire']:
+                return False
+            item = self.__put(key, value, deadline)
+        self.__write_through(key, item)
+        return True
+
+    def peek(self, key: str) -> tuple:
+        """
+        :return: (value, 距失效的秒数)；不存在时为 (None, 0)，不失效时秒数为inf
+        """
+        item = self.__touch(key)
+        if item is None:
+            return None, 0
+        return item['value'], item['expire'] - time.time()
+
+    def __touch(self, key: str):
+        """无锁读取key并标记命中，已失效时删除；内存中缺失时读取磁盘层"""
+        item = self.__data.get(key)
+        if item is not None and time.time() >= item['expire']:
+            with self.__write_lock:
+                if self.__data.get(key) is item:  # 未被覆盖
+                    self.__remove(key)
+                    self.__counters[item['space']]['expirations'] += 1
+            item = None
+        if item is None:
+            item = self.__load(key)
+
+        counter = self.__counters[get_namespace(key)]
+        if item is None:
+            counter['misses'] += 1
+            return None
+        counter['hits'] += 1
+        item['hit'] = True
+        return item
 
-        return False
+    def __load(self, key: str):
+        """从磁盘层读取key并写入内存"""
+        if key not in self.__disk_keys or not self.__persist(get_namespace(key)):
+            return None
+        row = self.__disk.get(key)
+        if row is None:
+            self.__disk_keys.pop(key, None)
+            return None
+        with self.__write_lock:
+            item = self.__data.get(key)  # 读取磁盘期间可能已被写入
+            if item is None:
+                item = self.__insert(key, *row)
+                self.__counters[item['space']]['disk_loads'] += 1
+        return item
+
+    def __remove(self, key: str):
+        """删除key（需持有锁）"""
+        item = self.__data.pop(key, None)
+        if item is not None:
+            space = self.__spaces[item['space']]
+            space.pop(key, None)
+            if not space:
+                del self.__spaces[item['space']]
+            self.__bytes -= item['size']
+            self.__space_bytes[item['space']] -= item['size']
+        return item
+
+    def __evict(self, space: str):
+        """按配额与上限淘汰最久未使用的key（需持有锁）"""
+        quotas = config.CacheQuotas if isinstance(config.CacheQuotas, dict) else {}
+        quota = int(quotas.get(space) or 0)
+        while quota and len(self.__spaces[space]) > quota:
+            self.__remove(self.__victim(self.__spaces[space]))
+            self.__counters[space]['evictions'] += 1
 
-    def __expire(self, key: str, expire: int):
-        time.sleep(expire)
-        self.__del(key)
+        max_entries, max_bytes = int(config.CacheMaxEntries), int(config.CacheMaxBytes)
+        while len(self.__data) > 1 and (max_entries and len(self.__data) > max_entries
+                                        or max_bytes and self.__bytes > max_bytes):
+            item = self.__remove(self.__victim(self.__data))
+            self.__counters[item['space']]['evictions'] += 1
+
+    def __victim(self, order: collections.OrderedDict) -> str:
+        """按二次机会选出淘汰的key（需持有锁）"""
+        while True:
+            key = next(iter(order))
+            item = self.__data[key]
+            if not item['hit']:
+                return key
+            item['hit'] = False
+            self.__data.move_to_end(key)
+            self.__spaces[item['space']].move_to_end(key)
+
+    def __del(self, key):
+        with self.__write_lock:
+            removed = self.__remove(key) is not None
+        # 锁外删除磁盘层；删除前已被重新写入的key跳过
+        if self.__persist(get_namespace(key)) and self.__disk.delete(key, current=lambda: key not in self.__data):
+            self.__disk_keys.pop(key, None)
+        return removed
 
     def delete(self, key: str):
         return self.__del(key)
 
+    def clear(self):
+        with self.__write_lock:
+            self.__data.clear()
+            self.__spaces.clear()
+            self.__bytes = 0
+            self.__space_bytes.clear()
+            self.__heap.clear()
+            self.__counters.clear()
+        # 锁外清空磁盘层
+        if self.__disk is not None:
+            self.__disk.clear()
+            self.__disk_keys.clear()
+
+    def __schedule(self, key: str, deadline: float):
+        """登记失效时间（需持有锁）"""
+        # 覆盖、删除留下的旧记录过多时，按当前数据重建堆
+        if len(self.__heap) > 2 * len(self.__data) + 1024:
+            self.__heap = [(item['expire'], k) for k, item in self.__data.items() if item['expire'] < float('inf')]
+            heapq.heapify(self.__heap)
+
+        heapq.heappush(self.__heap, (deadline, key))
+        if self.__sweeper is None:
+            self.__sweeper = threading.Thread(target=self.__sweep, name='cache-sweeper', daemon=True)
+            self.__sweeper.start()
+        elif self.__heap[0][1] == key:  # 最早失效的时间提前了，唤醒清理线程
+            self.__wakeup.notify()
+
+    def __sweep(self):
+        with self.__write_lock:
+            while True:
+                if not self.__heap:
+                    self.__wakeup.wait()
+                    continue
+
+                now = time.time()
+                deadline, key = self.__heap[0]
+                if deadline > now:
+                    self.__wakeup.wait(deadline - now)
+                    continue
+
+                heapq.heappop(self.__heap)
+                item = self.__data.get(key)
+                if item is not None and item['expire'] <= now:
+                    self.__remove(key)
+                    self.__counters[item['space']]['expirations'] += 1
+
+    def stats(self, top: int = 10) -> dict:
+        """
+        缓存状态：总量、各命名空间的条数、内存（近似）、命中率等计数，及占用内存最大的key
+        :param top: 最大key的数量
+        :return:
+        """
+        with self.__write_lock:
+            spaces = {space: len(keys) for space, keys in self.__spaces.items()}
+            largest = heapq.nlargest(top, self.__data.items(), key=lambda kv: kv[1]['size'])
+            largest = [{'key': key, 'bytes': item['size']} for key, item in largest]
+            # 读取时（不加锁）可能新增命名空间，先复制再遍历
+            counters = {space: dict(counter) for space, counter in list(self.__counters.items())}
+            space_bytes = dict(self.__space_bytes)
+
+        namespaces = {}
+        for space in sorted({*spaces, *counters}):
+            counter = counters.get(space, {})
+            hits, misses = counter.get('hits', 0), counter.get('misses', 0)
+            namespaces[space] = {
+                'entries': spaces.get(space, 0),
+                'bytes': space_bytes.get(space, 0),
+                **{name: counter.get(name, 0)
+                   for name in ('hits', 'misses', 'sets', 'expirations', 'evictions', 'disk_loads')},
+                'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+            }
+        return {
+            'entries': len(self.__data),
+            'bytes': self.__bytes,
+            'max_entries': int(config.CacheMaxEntries),
+            'max_bytes': int(config.CacheMaxBytes),
+            'disk': self.__disk is not None,
+            'namespaces': namespaces,
+            'largest': largest,
+            'loaders': {name: group.stats() for name, group in loaders.items()},
+        }
+
 
 cache = None
 
@@ -100,5 +478,140 @@ def exist(key):
     return get_cache().exist(key)
 
 
+def add(key: str, value, *, expire: int = None) -> bool:
+    return get_cache().add(key, value, expire=expire)
+
+
+def peek(key) -> tuple:
+    return get_cache().peek(key)
+
+
 def delete(key):
     return get_cache().delete(key)
+
+
+def clear():
+    return get_cache().clear()
+
+
+def stats(top: int = 10) -> dict:
+    return get_cache().stats(top)
+
+
+def log_stats():
+    """输出一行缓存状态：总量，及各命名空间的条数、内存、命中率、淘汰数"""
+    result = stats(top=0)
+    spaces = []
+    for space, item in result['namespaces'].items():
+        hit_rate = '-' if item['hit_rate'] is None else f'{item["hit_rate"]:.0%}'
+        spaces.append(f'{space} {item["entries"]}条/{item["bytes"] / 1024:.0f}KB/命中{hit_rate}/淘汰{item["evictions"]}')
+    logging.info(f'缓存：{result["entries"]}条, {result["bytes"] / 1024 / 1024:.1f}MB; {", ".join(spaces)}')
+
+
+class Negative:
+    """负缓存：缓存结果为空，读取时视为None"""
+
+    def __repr__(self):
+        return 'Negative'
+
+
+loaders = {}  # {加载函数名: singleflight.Group}
+
+
+def get_expire(policy: Union[int, Callable, None], key: str, value) -> Union[int, None]:
+    """
+    按失效策略计算缓存时间
+    :param policy: 秒数；None 为不失效；或 policy(key, value) -> 秒数（如当天失效、按数据时间）
+    :return:
+    """
+    return policy(key, value) if callable(policy) else policy
+
+
+def put(key: str, value, *, expire: Union[int, Callable] = None, negative: Union[int, Callable] = 0):
+    """
+    按策略写入加载的结果
+    :param key:
+    :param value: 为None时按 negative 写入负缓存
+    :param expire: 失效策略，见 get_expire
+    :param negative: 负缓存的失效策略；0 为不缓存空结果
+    :return:
+    """
+    if value is None:
+        seconds = get_expire(negative, key, None)
+        if seconds:
+            set(key, Negative(), expire=seconds)
+        return
+    set(key, value, expire=get_expire(expire, key, value))
+
+
+def memoize(key: Callable[..., str], *, expire: Union[int, Callable] = None, negative: Union[int, Callable] = 0):
+    """
+    缓存函数结果的装饰器：未命中时加载并按策略写入，相同key的并发加载只执行一次
+    :param key: key(*args, **kwargs) -> 缓存key
+    :param expire: 失效策略，见 get_expire
+    :param negative: 结果为None时的失效策略，期间直接返回None；0 为不缓存
+    :return:
+    """
+
+    def decorator(func):
+        group = loaders[func.__qualname__] = singleflight.Group()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache_key = key(*args, **kwargs)
+            value = get(cache_key)
+            if value is None:
+                def load():
+                    result = get(cache_key)  # 等待加载期间可能已写入
+                    if result is None:
+                        result = func(*args, **kwargs)
+                        put(cache_key, result, expire=expire, negative=negative)
+                    return result
+
+                value = group.do(cache_key, load)
+            return None if isinstance(value, Negative) else value
+
+        wrapper.get_key = key
+        wrapper.invalidate = lambda *args, **kwargs: delete(key(*args, **kwargs))
+        return wrapper
+
+    return decorator
+
+
+def memoize_many(key: Callable[..., str], *, expire: Union[int, Callable] = None,
+                 negative: Union[int, Callable] = 0):
+    """
+    批量加载函数 func(items, *args, **kwargs) -> {item: result} 的缓存装饰器：按item缓存，只加载未命中的item，
+    与其他调用中正在加载的item合并
+    :param key: key(item, *args, **kwargs) -> 缓存key
+    :param expire: 失效策略，见 get_expire
+    :param negative: 结果为None的item的失效策略；0 为不缓存。func未返回的item（如请求失败）不缓存
+    :return: {item: result or None}
+    """
+
+    def decorator(func):
+        group = loaders[func.__qualname__] = singleflight.Group()
+
+        @functools.wraps(func)
+        def wrapper(items, *args, **kwargs):
+            keys = {item: key(item, *args, **kwargs) for item in items}
+            values = {item: get(cache_key) for item, cache_key in keys.items()}
+            miss = {keys[item]: item for item, value in values.items() if value is None}
+            if miss:
+                def load(miss_keys) -> dict:
+                    result = func([miss[cache_key] for cache_key in miss_keys], *args, **kwargs) or {}
+                    loaded = {}
+                    for cache_key in miss_keys:
+                        loaded[cache_key] = result.get(miss[cache_key])
+                        if miss[cache_key] in result:
+                            put(cache_key, loaded[cache_key], expire=expire, negative=negative)
+                    return loaded
+
+                for cache_key, value in group.do_many(list(miss), load).items():
+                    values[miss[cache_key]] = value
+            return {item: None if isinstance(value, Negative) else value for item, value in values.items()}
+
+        wrapper.get_key = key
+        return wrapper
+
+    return decorator
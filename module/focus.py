@@ -8,6 +8,7 @@ import json
 import logging
 import os
 import time
+from typing import Callable, List
 
 from module import bean, cache
 from utils import utils
@@ -409,6 +410,9 @@ class HistoryMonitor:
 root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 folder_path = os.path.join(root_path, 'data')
 
+# 关注项变化的监听者，参数为变化的文件名
+listeners: List[Callable[[str], None]] = []
+
 
 def load(file_name):
     data = cache.get(file_name)
@@ -430,3 +434,9 @@ def save(data, file_name):
     path = os.path.join(folder_path, file_name)
     with open(path, 'w', encoding='utf-8') as f:
         json.dump(data, f, indent=4, ensure_ascii=False, sort_keys=True)
+
+    for listener in listeners:
+        try:
+            listener(file_name)
+        except Exception as e:
+            logging.exception(f'关注项变化的监听处理失败：{e}')
@@ -10,8 +10,8 @@ from typing import Union, List
 import pandas as pd
 import numpy as np
 
-from api import eastmoney
-from module import bean, focus, cache
+from api import columns, eastmoney
+from module import bean, focus, cache, bad_code
 from module.process.worth import StockWorth, FundWorth, StockHistory, FundHistory
 from utils import utils, pools
 import config
@@ -21,12 +21,14 @@ class Monitor:
     """监控"""
 
     @bean.check_money_type(1)
-    def __init__(self, money_type):
+    def __init__(self, money_type, *, quotes: dict = None):
         """
 
         :param money_type: 类型
+        :param quotes: 预先获取的当前数据 {code: data}，命中的代码不再请求
         """
         self.api = eastmoney.EastMoney(money_type)
+        self.quotes = quotes or {}
         self.money_type = money_type
         self.type_ = {
             'stock': '股票',
@@ -36,11 +38,9 @@ class Monitor:
         self.foc = focus.Focus('monitor')
         self.options, _ = self.foc.get(self.money_type)
 
-        self.adapter = {
-            'stock': StockMonitor,
-            'fund': FundMonitor,
-        }[money_type]
+        self.adapter = self.get_adapter(money_type)
 
+        self.skipped: List[str] = []  # 退避中跳过的失效代码
         self.datas = self._load()
         # 对原始数据进行处理
         self.objs = [
@@ -48,29 +48,29 @@ class Monitor:
             for data in self.datas
         ]
 
-    def _load(self) -> list:
-        assert self.options, '无监控项，请添加配置后再来。'
-        codes = set([option['code'] for option in self.options])
+    @classmethod
+    def get_adapter(cls, money_type):
+        return {
+            'stock': StockMonitor,
+            'fund': FundMonitor,
+        }[money_type]
 
-        def one(code) -> Union[dict, None]:
-            logging.info(f'开始查询估值：{self.money_type} [{code}]')
-            data, ok = self.api.fetch_current(code)
-            if ok and data:
-                return data
-            return None
+    @classmethod
+    @bean.check_money_type(1)
+    def get_current_fields(cls, money_type) -> Union[List[str], None]:
+        """所需的当前数据字段，None为全部"""
+        return cls.get_adapter(money_type).current_fields
 
-        # # 单线程
-        # datas = []
-        # for _code in codes:
-        #     _data = one(_code)
-        #     if not _data:
-        #         continue
-        #     datas.append(_data)
+    def _load(self) -> list:
+        assert self.options, '无监控项，请添加配置后再来。'
+        codes = list(dict.fromkeys(option['code'] for option in self.options))
+        fields = self.adapter.current_fields
 
-        # 多线程
-        args_list = [[(_code,)] for _code in codes]
-        result = pools.execute_thread(one, args_list)
-        datas = list(filter(lambda _data: _data, result))
+        result = {code: self.quotes[code] for code in codes if eastmoney.has_fields(self.quotes.get(code), fields)}
+        res, self.skipped = bad_code.fetch_current(self.api, self.money_type,
+                                                   [code for code in codes if code not in result], fields=fields)
+        result.update(res)
+        datas = [result[code] for code in codes if result.get(code)]
 
         return datas
 
@@ -98,6 +98,9 @@ class StockMonitor:
         **StockWorth.relate_fields,
         **option_fields
     }
+    # 请求的当前数据字段
+    current_fields = [StockWorth.get_relate(field)
+                      for field in ('code', 'name', 'current_worth', 'standard_worth', 'point', 'time')]
 
     def __init__(self, data, options):
         self._opening = True
@@ -119,9 +122,11 @@ class StockMonitor:
         if data_time != utils.now_time(fmt='%Y-%m-%d', tz=config.CronZone):
             self._opening = False
 
+        data = dict(data)  # 原始数据可能与其他任务共享（缓存、合并的请求），不可原地修改
         point = 10 ** int(data[self.get_relate('point')])
         for field in ('start_worth', 'standard_worth', 'current_worth'):
-            data[self.get_relate(field)] = data[self.get_relate(field)] / point
+            if self.get_relate(field) in data:
+                data[self.get_relate(field)] = data[self.get_relate(field)] / point
 
         data_df = pd.DataFrame([data])
         data_df.rename(
@@ -218,6 +223,7 @@ class FundMonitor:
         **FundWorth.relate_fields,
         **option_fields
     }
+    current_fields = None  # 接口不支持字段选择
 
     def __init__(self, data, options):
         self._opening = True
@@ -322,12 +328,14 @@ class HistoryMonitor:
     MaxLimit = 30  # 数据量
 
     @bean.check_money_type(1)
-    def __init__(self, money_type):
+    def __init__(self, money_type, *, quotes: dict = None):
         """
 
         :param money_type: 类型
+        :param quotes: 预先获取的当前数据 {code: data}，命中的代码不再请求
         """
         self.api = eastmoney.EastMoney(money_type)
+        self.quotes = quotes or {}
         self.money_type = money_type
         self.type_ = {
             'stock': '股票',
@@ -337,11 +345,9 @@ class HistoryMonitor:
         self.foc = focus.Focus('history_monitor')
         self.options, _ = self.foc.get(self.money_type)
 
-        self.adapter = {
-            'stock': StockHistoryMonitor,
-            'fund': FundHistoryMonitor,
-        }[money_type]
+        self.adapter = self.get_adapter(money_type)
 
+        self.skipped: List[str] = []  # 退避中跳过的失效代码
         self.datas = self._load()
         # 对原始数据进行处理
         self.objs = [
@@ -349,44 +355,63 @@ class HistoryMonitor:
             for option, cur_data, his_data in self.datas
         ]
 
+    @classmethod
+    def get_adapter(cls, money_type):
+        return {
+            'stock': StockHistoryMonitor,
+            'fund': FundHistoryMonitor,
+        }[money_type]
+
+    @classmethod
+    @bean.check_money_type(1)
+    def get_current_fields(cls, money_type) -> Union[List[str], None]:
+        """所需的当前数据字段，None为全部"""
+        return cls.get_adapter(money_type).current_fields
+
+    @classmethod
+    @cache.memoize(lambda cls, money_type, code, api=None:
+                   f'history_monitor.{money_type}.{code}.{HistoryMonitor.MaxLimit}',
+                   expire=bean.get_today_expire)
+    def load_history(cls, money_type, code, api: eastmoney.EastMoney = None) -> Union[dict, None]:
+        """加载单个代码的历史数据，当天缓存；请求失败或无数据时为None（不缓存，无数据时记为失效代码）"""
+        # 比较历史数据时，由于第一条可能是当日最新的数据，因此需要多查一条数据。在处理时会过滤掉当日的数据
+        return bad_code.load_history(
+            money_type, code, lambda: cls.get_adapter(money_type).load(api or eastmoney.EastMoney(money_type), code,
+                                                                      HistoryMonitor.MaxLimit + 1))
+
     def _load(self) -> list:
         """
         加载数据
         :return: [(option配置, 当前数据、历史数据)]
         """
         assert self.options, '无监控项，请添加配置后再来。'
-        codes = list(set([option['code'] for option in self.options]))
-
-        def one(code) -> [Union[dict, None], Union[dict, None]]:
-            # 获取当前最新数据，再结合历史数据，处理时需要过滤掉该日期的数据。
-            # 不可缓存当前最新数据
-            data, ok = self.api.fetch_current(code)
-            if not (ok and data):
-                return None
-
-            key = f'history_monitor.{self.money_type}.{code}.{HistoryMonitor.MaxLimit}'
-            if cache.exist(key):
-                return data, cache.get(key)
-
-            # 比较历史数据时，由于第一条可能是当日最新的数据，因此需要多查一条数据。在处理时会过滤掉当日的数据
-            res, ok = self.adapter.load(self.api, code, HistoryMonitor.MaxLimit + 1)
-            if ok:
-                bean.set_cache_expire_today(key, res)
-            if ok and res:
-                return data, res
-            return None
+        options = {option['code']: option for option in self.options}
+        codes = list(options.keys())
+
+        # 获取当前最新数据，再结合历史数据，处理时需要过滤掉该日期的数据。
+        # 不可缓存当前最新数据
+        fields = self.adapter.current_fields
+        current_datas = {code: self.quotes[code] for code in codes
+                         if eastmoney.has_fields(self.quotes.get(code), fields)}
+        res, self.skipped = bad_code.fetch_current(self.api, self.money_type,
+                                                   [code for code in codes if code not in current_datas],
+                                                   fields=fields)
+        current_datas.update(res)
+        codes, skipped = bad_code.split(self.money_type, [code for code in codes if current_datas.get(code)],
+                                        kind=bad_code.HISTORY)
+        self.skipped.extend(skipped)
+        if not codes:
+            return []
 
-        # # 单线程
-        # datas = []
-        # for _code in codes:
-        #     _data = one(_code)
-        #     datas.append(_data)
+        def one(code) -> Union[dict, None]:
+            return self.load_history(self.money_type, code, self.api)
 
         # 多线程
         args_list = [[(_code,)] for _code in codes]
-        datas = pools.execute_thread(one, args_list)
+        his_datas = pools.execute_thread(one, args_list)
 
-        return [(self.options[index], *datas[index]) for index in range(len(codes)) if datas[index]]
+        return [(options[code], current_datas[code], his_datas[index])
+                for index, code in enumerate(codes) if his_datas[index]]
 
     def get_message(self, is_open=False, **kwargs) -> List:
         all_msg = []
@@ -400,8 +425,11 @@ class HistoryMonitor:
 
 class StockHistoryMonitor:
     relate_fields = {
-        **StockHistory.relate_fields,
+        field: StockHistory.relate_fields[field] for field in ('date', 'end_worth')
     }
+    # 请求的当前数据、历史数据字段
+    current_fields = [StockWorth.get_relate(field) for field in ('code', 'name', 'current_worth', 'point', 'time')]
+    history_fields = [field_conf['field'] for field_conf in relate_fields.values()]
 
     def __init__(self, option: dict, cur_data, his_data: dict):
         self._opening = True
@@ -416,7 +444,7 @@ class StockHistoryMonitor:
     @classmethod
     def load(cls, api, code, limit):
         logging.info(f'开始查询历史数据：stock [{code}]')
-        return api.fetch_history(code, limit=limit)
+        return api.fetch_history(code, limit=limit, columnar=True, fields=cls.history_fields)
 
     @property
     def opening(self):
@@ -435,19 +463,14 @@ class StockHistoryMonitor:
             point = 10 ** int(cur_data[StockMonitor.get_relate('point')])
             current_worth = cur_data[StockMonitor.get_relate('current_worth')] / point
 
-        rename_cols = {field_conf['field']: field for field, field_conf in StockHistoryMonitor.relate_fields.items()
-                       if field_conf['field']}
-
-        data_df = pd.DataFrame(his_data['klines'][::-1])
-        data_df.rename(columns=rename_cols, inplace=True)
-        data_df = data_df.loc[data_df['date'] != date_time, rename_cols.values()]
-        data_df = data_df.fillna(np.nan).reset_index().assign(index=(lambda x: 1 + np.arange(len(x))))
-        data_df = data_df.loc[:(HistoryMonitor.MaxLimit - 1), :]
-        if data_df.empty:
+        # 列式数据，按日期倒序，排除当日
+        cols = {field: his_data['klines'][field_conf['field']][::-1]
+                for field, field_conf in StockHistoryMonitor.relate_fields.items() if field_conf['field']}
+        decimal = f'%.{his_data["decimal"]}f'
+        fmts = {field: {'date': None, 'rate': '%.2f'}.get(field, decimal) for field in cols}
+        data_df = history_monitor_frame(cols, fmts, date_time, current_worth)
+        if data_df is None:
             return None
-        data_df['relative.rate'] = data_df.apply(
-            lambda item: 100 * (current_worth - float(item['end_worth'])) / float(item['end_worth']),
-            axis=1)
 
         return solve_history_monitor_data(data_df, self.option)
 
@@ -474,6 +497,30 @@ class StockHistoryMonitor:
         return all_msg
 
 
+def history_monitor_frame(cols: dict, fmts: dict, date_time: str, current_worth: float) -> Union[pd.DataFrame, None]:
+    """
+    由列式历史数据构造历史监控所需的数据
+    :param cols: {字段: 列}，按日期倒序
+    :param fmts: 各字段输出的格式，见 columns.to_records
+    :param date_time: 当日日期，不参与比较
+    :param current_worth: 当前值
+    :return: col: {index: 索引（从1开始）、date: 日期、end_worth: 收盘值（文本）、relative.rate: 相对涨跌幅、...}
+    """
+    mask = cols['date'] != date_time
+    cols = {field: column[mask][:HistoryMonitor.MaxLimit] for field, column in cols.items()}  # 只需要前 MaxLimit 行
+    end_worth = cols['end_worth']
+    if not len(end_worth):
+        return None
+
+    data_df = pd.DataFrame({
+        'index': np.arange(1, len(end_worth) + 1),
+        **{field: columns.format_column(column, fmts[field]) if fmts[field] else column
+           for field, column in cols.items()},
+    })
+    data_df['relative.rate'] = 100 * (current_worth - end_worth) / end_worth
+    return data_df
+
+
 def solve_history_monitor_data(his_df: pd.DataFrame, options: dict) -> List[dict]:
     """
     处理历史涨跌幅的数据，用于匹配历史监控
@@ -531,8 +578,11 @@ def solve_history_monitor_data(his_df: pd.DataFrame, options: dict) -> List[dict
 
 class FundHistoryMonitor:
     relate_fields = {
-        **FundHistory.relate_fields,
+        field: FundHistory.relate_fields[field] for field in ('date', 'end_worth')
     }
+    current_fields = None  # 接口不支持字段选择
+    # 解析的历史数据字段
+    history_fields = [field_conf['field'] for field_conf in relate_fields.values()]
 
     def __init__(self, option: dict, cur_data: dict, his_data: dict):
         self._opening = True
@@ -548,36 +598,9 @@ class FundHistoryMonitor:
     @classmethod
     def load(cls, api, code, limit):
         logging.info(f'开始查询历史数据：fund [{code}]')
-        start_date = utils.get_delay_date(delay=-limit, tz=config.CronZone)
-        res, ok = api.fetch_history(code, start_date=start_date)
-        max_times = 5
-
-        def supplement(success: bool, last_date, times=0):
-            """
-            补充数据的数量（由于休市，导致数据量不足limit）
-            :param success: 上次的查询是否成功
-            :param last_date: 上次查询的开始日期
-            :param times: 重试次数
-            :return:
-            """
-            # 为避免极端情况导致的死递归，故限制最大递归次数
-            if success and len(res) < limit and times < max_times:
-                next_start_date = utils.get_delay_date(last_date, delay=len(res) - limit)
-                next_res, next_ok = api.fetch_history(code,
-                                                      start_date=next_start_date,
-                                                      end_date=utils.get_delay_date(last_date, delay=-1), )
-                if next_ok:
-                    res.extend(next_res)
-                # 当此次递归的日期内均为休市情况，则next_res为空，需要继续往前递归。所以success只能以next_ok来判断。
-                return supplement(next_ok, next_start_date, times + 1)
-
-        supplement(res and ok, start_date, 0)
-        return res, ok
+        return FundHistory.load_range(api, code, limit, cls.history_fields)
 
     def _resolve_data(self, cur_data, his_data) -> Union[List[dict], None]:
-        rename_cols = {field_conf['field']: field for field, field_conf in FundHistoryMonitor.relate_fields.items()
-                       if field_conf['field']}
-
         # 判断是否开市
         if not his_data:
             self._opening = False
@@ -589,17 +612,14 @@ class FundHistoryMonitor:
                 return
             current_worth = float(cur_data[FundMonitor.get_relate('current_worth')])
 
-        data_df = pd.DataFrame(his_data)
-        data_df.rename(columns=rename_cols, inplace=True)
-
-        data_df = data_df.loc[data_df['date'] != date_time, rename_cols.values()]
-        data_df = data_df.fillna(np.nan).reset_index().assign(index=(lambda x: 1 + np.arange(len(x))))  # 行索引从1开始
-        data_df = data_df.loc[:(HistoryMonitor.MaxLimit - 1), :]  # 只需要前 HistoryMonitor.MaxLimit 行数据
-        if data_df.empty:
+        # 列式数据，已按日期倒序
+        cols = {field: his_data['LSJZList'][field_conf['field']]
+                for field, field_conf in FundHistoryMonitor.relate_fields.items() if field_conf['field']}
+        decimal = f'%.{his_data["decimal"]}f'
+        fmts = {field: {'date': None, 'rate': '%.2f'}.get(field, decimal) for field in cols}
+        data_df = history_monitor_frame(cols, fmts, date_time, current_worth)
+        if data_df is None:
             return None
-        data_df['relative.rate'] = data_df.apply(
-            lambda item: 100 * (current_worth - float(item['end_worth'])) / float(item['end_worth']),
-            axis=1)
 
         return solve_history_monitor_data(data_df, self.option)
 
@@ -3,13 +3,12 @@
 # CreateTime: 2023/7/27 17:47
 # FileName:
 
-from typing import Union
+from typing import List, Union
 
 from api import eastmoney
 from module.process.worth import FundWorth, StockWorth
 from module.process.monitor import FundMonitor, StockMonitor
-from utils import pools
-from module import bean, cache
+from module import bean, cache, bad_code
 
 
 @bean.check_money_type(0)
@@ -32,24 +31,30 @@ def get_codes_name(money_type, codes: Union[str, list]) -> dict:
     :return: {code: name or None}
     """
     codes = codes if isinstance(codes, list) else [codes]
+    names = fetch_codes_name(list(dict.fromkeys(code.strip() for code in codes)), money_type)
+    return {code: names[code.strip()] for code in codes}
 
-    key = 'code_name'
-    if not cache.exist(key):
-        bean.set_cache_expire_today(key, {})
-    codes_name = cache.get(key)
-
-    miss_name_codes = [code.strip() for code in codes if f'{money_type}.{code}' not in codes_name]
-    if miss_name_codes:
-        east_api = eastmoney.EastMoney(money_type)
-        codes_info_data = pools.execute_thread(lambda code: east_api.fetch_current(code),
-                                               [[(code,)] for code in miss_name_codes])
-        name_field = get_relate_field(money_type, 'worth', 'name')
-
-        new_codes_name = {
-            f'{money_type}.{code}': codes_info_data[index][0][name_field['field']]
-            if codes_info_data[index][0] and name_field else None
-            for index, code in enumerate(miss_name_codes)
-        }
-        codes_name.update(new_codes_name)
-
-    return {code: codes_name[f'{money_type}.{code}'] for code in codes}
+
+@cache.memoize_many(lambda code, money_type: f'code_name.{money_type}.{code}',
+                    expire=bean.get_today_expire, negative=bean.get_today_expire)
+def fetch_codes_name(codes: List[str], money_type) -> dict:
+    """
+    查询codes的名称（只查询未缓存的代码），当天缓存。请求成功但未查到名称的代码同样缓存（名称为None），
+    请求失败或退避中跳过的失效代码不缓存
+    :param codes:
+    :param money_type:
+    :return: {code: name or None}
+    """
+    east_api = eastmoney.EastMoney(money_type)
+    name_field = get_relate_field(money_type, 'worth', 'name')
+    if not name_field:
+        return {}
+    # 只需名称（代码总会返回；基金接口不支持字段选择）
+    fields = [name_field['field']] if money_type == 'stock' else None
+    fetch_codes, _ = bad_code.split(money_type, codes)
+    if not fetch_codes:
+        return {}
+    codes_info_data, ok = east_api.fetch_current_batch(fetch_codes, fields=fields)
+    bad_code.record(money_type, fetch_codes, codes_info_data, ok)
+    return {code: (codes_info_data[code].get(name_field['field']) if codes_info_data.get(code) else None)
+            for code in fetch_codes if ok or codes_info_data.get(code)}
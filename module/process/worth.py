@@ -3,31 +3,34 @@
 # CreateTime: 2023/11/21 13:58
 # FileName:
 
-import json
 import logging
+import threading
+import time
 from typing import Union, List
 
-import pandas as pd
-
-from api import eastmoney
-from utils import utils, pools
-from module import bean, focus, cache, process
+from api import columns, eastmoney
+from utils import utils, pools, trade_calendar
+from module import bean, focus, cache, process, bad_code
 import config
 
 
 class Worth:
     """估值"""
 
-    expire = 60  # 缓存时间
+    expire = 60  # 交易中数据的更新周期（秒），即交易中的缓存时间
+    __lock = threading.Lock()
+    refreshing = set()  # 后台刷新中的缓存key
 
     @bean.check_money_type(1)
-    def __init__(self, money_type, *, codes: Union[str, int, tuple, list, set] = None):
+    def __init__(self, money_type, *, codes: Union[str, int, tuple, list, set] = None, quotes: dict = None):
         """
 
         :param money_type: 类型
         :param codes: 代码
+        :param quotes: 预先获取的当前数据 {code: data}，命中的代码不再请求
         """
         logging.info(f'估值查询：{money_type}, {codes}')
+        self.quotes = quotes or {}
         self.api = eastmoney.EastMoney(money_type)
         self.money_type = money_type
         self.codes = codes if isinstance(codes, (tuple, list, set, type(None))) \
@@ -39,11 +42,9 @@ class Worth:
         self.title = f'{self.type_} 估值'
         self.foc = focus.Focus('worth')
 
-        self.adapter = {
-            'stock': StockWorth,
-            'fund': FundWorth,
-        }[money_type]
+        self.adapter = self.get_adapter(money_type)
 
+        self.skipped: List[str] = []  # 退避中跳过的失效代码
         self.datas: List[dict] = self._load()
         # 对原始数据进行处理
         self.objs = [
@@ -67,38 +68,124 @@ class Worth:
 
         return options
 
+    @classmethod
+    def get_adapter(cls, money_type):
+        return {
+            'stock': StockWorth,
+            'fund': FundWorth,
+        }[money_type]
+
+    @classmethod
+    @bean.check_money_type(1)
+    def get_current_fields(cls, money_type) -> Union[List[str], None]:
+        """所需的当前数据字段，None为全部"""
+        return cls.get_adapter(money_type).current_fields
+
+    @classmethod
+    def get_cache_key(cls, money_type, code) -> str:
+        return f'worth.{money_type}.{code}'
+
+    @classmethod
+    def get_expire(cls, money_type, data: dict) -> int:
+        """
+        当前数据的缓存时间（秒），由数据时间与市场状态决定：
+        交易中，缓存至数据的下次更新（数据时间 + expire，不少于 WorthMinExpire）；
+        休市且已是收盘时的数据，缓存至下次开盘。基金收盘后净值未更新（净值日期早于当天）时，每 FundNavInterval 重新获取
+        """
+        now = time.time()
+        data_time = cls.get_adapter(money_type).get_data_time(data)
+        if data_time is None:  # 无数据时间时，按交易中缓存
+            return cls.expire
+
+        state, last_close, next_change = trade_calendar.get_market_state(now)
+        if state == 'closed' and data_time >= last_close - cls.expire:
+            expire = next_change - now
+            close_date = utils.time2str(last_close, fmt='%Y-%m-%d', tz=config.CronZone)
+            if money_type == 'fund' and last_close == trade_calendar.get_sessions(close_date)[-1][1] \
+                    and data.get(FundWorth.nav_date_field) != close_date:
+                expire = min(expire, float(config.FundNavInterval))
+            return int(expire)
+        return int(min(max(data_time + cls.expire - now, float(config.WorthMinExpire)), cls.expire))
+
+    @classmethod
+    def set_cache(cls, money_type, code, data):
+        """缓存当前数据，过期后仍保留 WorthMaxStale 秒，供后台刷新期间返回"""
+        expire = cls.get_expire(money_type, data) + int(config.WorthMaxStale)
+        cache.set(cls.get_cache_key(money_type, code), data, expire=expire)
+
+    @classmethod
+    def get_cache(cls, money_type, code, fields: [] = None) -> (Union[dict, None], bool):
+        """
+        读取缓存的当前数据
+        :return: (数据, 是否需要后台刷新)；无缓存或不含所需字段时数据为None
+        """
+        data, remaining = cache.peek(cls.get_cache_key(money_type, code))
+        if not eastmoney.has_fields(data, fields):
+            return None, False
+        return data, remaining <= float(config.WorthMaxStale) + float(config.WorthRefreshAhead)
+
+    @classmethod
+    def is_fresh(cls, money_type, code) -> bool:
+        """缓存的当前数据未过期（不含过期后仍可返回的时间）"""
+        data, remaining = cache.peek(cls.get_cache_key(money_type, code))
+        return data is not None and remaining > float(config.WorthMaxStale)
+
+    def _refresh(self, codes: List[str], fields: [] = None):
+        """在后台刷新codes的缓存，同一代码同时只有一个刷新"""
+        with Worth.__lock:
+            keys = {self.get_cache_key(self.money_type, code) for code in codes} - Worth.refreshing
+            Worth.refreshing.update(keys)
+        codes = [code for code in codes if self.get_cache_key(self.money_type, code) in keys]
+        if not codes:
+            return
+
+        def refresh():
+            try:
+                res, _ = self.api.fetch_current_batch(codes, fields=fields)
+                for code, data in res.items():
+                    self.set_cache(self.money_type, code, data)
+            except Exception as e:
+                logging.warning(f'估值缓存刷新失败：{self.money_type} {codes}, {e}')
+            finally:
+                with Worth.__lock:
+                    Worth.refreshing.difference_update(keys)
+
+        threading.Thread(target=refresh, name='worth-refresh', daemon=True).start()
+
     def _load(self) -> [dict]:
         """获取最新原始数据"""
         options = self._get_options()
-
-        def one(code) -> Union[dict, None]:
-            key = f'worth.{self.money_type}.{code}'
-            if config.WorthUseCache and cache.exist(key):
-                return cache.get(key)
-
-            logging.info(f'开始查询估值：{self.money_type} [{code}]')
-            res, ok = self.api.fetch_current(code)
-            if config.WorthUseCache and ok:
-                cache.set(key, res, expire=Worth.expire)
-            if ok and res:
-                return res
-            return None
-
-        # # 单线程
-        # result = []
-        # for option in options:
-        #     res = one(option['code'])
-        #     if not res:
-        #         continue
-        #     result.append(res)
-
-        # 多线程
-        args_list = [[(option['code'],)] for option in options]
-        result = pools.execute_thread(one, args_list)
+        codes = [option['code'] for option in options]
+        fields = self.adapter.current_fields
+
+        # 预取的数据与缓存，包含所需字段时即可使用；缓存临近或已过期（不超过 WorthMaxStale）时，先返回并在后台刷新
+        result = {}
+        refresh_codes = []
+        for code in codes:
+            if eastmoney.has_fields(self.quotes.get(code), fields):
+                result[code] = self.quotes[code]
+                if config.WorthUseCache:
+                    self.set_cache(self.money_type, code, result[code])
+            elif config.WorthUseCache:
+                data, refresh = self.get_cache(self.money_type, code, fields)
+                if data is not None:
+                    result[code] = data
+                if refresh:
+                    refresh_codes.append(code)
+        if refresh_codes:
+            self._refresh(refresh_codes, fields)
+
+        # 退避中的失效代码不再请求
+        res, self.skipped = bad_code.fetch_current(self.api, self.money_type,
+                                                   [code for code in codes if code not in result], fields=fields)
+        for code, data in res.items():
+            result[code] = data
+            if config.WorthUseCache:
+                self.set_cache(self.money_type, code, data)
 
         datas = []
-        for index, option in enumerate(options):
-            data = result[index]
+        for option in options:
+            data = result.get(option['code'])
             if not data:
                 continue
             datas.append({
@@ -155,6 +242,8 @@ class StockWorth:
         'profit': {'field': 'profit', 'label': '盈利'},
         'regression': {'field': 'regression', 'label': '成本回归'},
     }
+    # 请求的当前数据字段
+    current_fields = [field_conf['field'] for field_conf in relate_fields.values() if field_conf['field']]
 
     def __init__(self, data: dict):
         self._opening = True  # 是否开市
@@ -168,6 +257,15 @@ class StockWorth:
     def get_relate(cls, field, *, key='field'):
         return cls.relate_fields[field][key] if field in cls.relate_fields else ''
 
+    @classmethod
+    def get_data_time(cls, data: dict) -> Union[float, None]:
+        """数据时间的时间戳；缺失或无效时为None"""
+        data_time = data.get(cls.get_relate('time'))
+        try:
+            return float(data_time) if data_time else None
+        except (TypeError, ValueError):
+            return None
+
     def _resolve_data(self, data, option):
         data_time = utils.time2str(data[self.get_relate('time')], fmt='%Y-%m-%d', tz=config.CronZone)
         if data_time != utils.now_time(fmt='%Y-%m-%d', tz=config.CronZone):
@@ -240,6 +338,8 @@ class FundWorth:
         'profit': {'field': 'profit', 'label': '盈利'},
         'regression': {'field': 'regression', 'label': '成本回归'},
     }
+    current_fields = None  # 接口不支持字段选择
+    nav_date_field = 'jzrq'  # 净值日期
 
     def __init__(self, data: dict):
         self._opening = True  # 是否开市
@@ -253,6 +353,17 @@ class FundWorth:
     def get_relate(cls, field, *, key='field'):
         return cls.relate_fields[field][key] if field in cls.relate_fields else ''
 
+    @classmethod
+    def get_data_time(cls, data: dict) -> Union[float, None]:
+        """估值时间的时间戳；缺失或无效时为None"""
+        data_time = data.get(cls.get_relate('time'))
+        if not data_time:
+            return None
+        try:
+            return utils.str2time(data_time, fmt='%Y-%m-%d %H:%M', tz=config.CronZone)
+        except (TypeError, ValueError):
+            return None
+
     def _resolve_data(self, data, option):
         data_time = data[self.get_relate('time')].split(' ')[0]
         if data_time != utils.now_time(fmt='%Y-%m-%d', tz=config.CronZone):
@@ -322,11 +433,9 @@ class History:
         self.title = f'{self.type_} 历史数据'
         self.foc = focus.Focus('worth')
 
-        self.adapter = {
-            'stock': StockHistory,
-            'fund': FundHistory,
-        }[money_type]
+        self.adapter = self.get_adapter(money_type)
 
+        self.skipped: List[str] = []  # 退避中跳过的失效代码
         self.datas: List[dict] = self._load()
         # 对原始数据进行处理
         self.objs = [
@@ -343,23 +452,38 @@ class History:
 
         return self.codes
 
+    @classmethod
+    def get_adapter(cls, money_type):
+        return {
+            'stock': StockHistory,
+            'fund': FundHistory,
+        }[money_type]
+
+    @classmethod
+    def get_limit(cls, month: int = None) -> int:
+        """近 month 个月内的交易日数，即所需的数据量"""
+        month = int(month or History.DefaultMonth)
+        return trade_calendar.count_trade_days(utils.get_delay_month(-month, tz=config.CronZone))
+
+    @classmethod
+    @cache.memoize(lambda cls, money_type, code, limit, api=None: f'history.{money_type}.{code}.{limit}',
+                   expire=bean.get_today_expire)
+    def load_history(cls, money_type, code, limit: int, api: eastmoney.EastMoney = None) -> Union[dict, None]:
+        """加载单个代码的历史数据，当天缓存；请求失败或无数据时为None（不缓存，无数据时记为失效代码）"""
+        logging.info(f'开始查询历史：{money_type} [{code}]')
+        return bad_code.load_history(
+            money_type, code, lambda: cls.get_adapter(money_type).load(api or eastmoney.EastMoney(money_type), code,
+                                                                      limit))
+
     def _load(self) -> List:
         """加载数据"""
-        codes = self._get_codes()
-        limit = utils.get_delay(utils.now_time(fmt='%Y-%m-%d'), utils.get_delay_month(-self.month))
+        codes, self.skipped = bad_code.split(self.money_type, self._get_codes(), kind=bad_code.HISTORY)
+        if self.skipped:
+            logging.info(f'跳过失效代码：{self.money_type} {self.skipped}')
+        limit = self.get_limit(self.month)
 
         def one(code):
-            key = f'history.{self.money_type}.{code}.{limit}'
-            if cache.exist(key):
-                return cache.get(key)
-
-            logging.info(f'开始查询历史：{self.money_type} [{code}]')
-            res, ok = self.adapter.load(self.api, code, limit)
-            if ok:
-                bean.set_cache_expire_today(key, res)
-            if ok and res:
-                return res
-            return None
+            return self.load_history(self.money_type, code, limit, self.api)
 
         # result = []
         # for code in codes:
@@ -399,6 +523,8 @@ class StockHistory:
         'change': {'field': 'f60', 'label': '涨跌额', 'show': False},
         'standard': {'field': '', 'label': '基准值'}
     }
+    # 请求的历史数据字段
+    history_fields = [option['field'] for option in relate_fields.values() if option['field']]
 
     def __init__(self, code, data: dict):
         self.code = code
@@ -408,23 +534,23 @@ class StockHistory:
     @classmethod
     def load(cls, api, code, limit):
         logging.info(f'开始查询历史数据：stock [{code}]')
-        return api.fetch_history(code, limit=limit)
+        return api.fetch_history(code, limit=limit, columnar=True, fields=cls.history_fields)
 
     def _resolve_data(self, data):
-        if not data or not data['klines']:
+        if not data or not data['klines'] or not len(data['klines']['f51']):
             return
         self.code = data['code']
         self.name = data['name']
         decimal = f'%.{data["decimal"]}f'
 
-        df = pd.DataFrame(data['klines'][::-1])
-        rename_fields = {option['field']: field for field, option in StockHistory.relate_fields.items()
-                         if option['field']}
-        df.rename(rename_fields, axis=1, inplace=True)
-        df['standard'] = df.apply(lambda x: decimal % (float(x['end_worth']) - float(x['change'])), axis=1)
+        # 列式数据，按日期倒序
+        cols = {field: data['klines'][option['field']][::-1] for field, option in StockHistory.relate_fields.items()
+                if option['field']}
+        cols['standard'] = cols['end_worth'] - cols['change']
 
-        df = df.loc[:, [field for field, option in StockHistory.relate_fields.items() if option.get('show', True)]]
-        return json.loads(df.to_json(orient='records'))
+        fmts = {field: {'date': None, 'rate': '%.2f'}.get(field, decimal)
+                for field, option in StockHistory.relate_fields.items() if option.get('show', True)}
+        return columns.to_records(cols, fmts)
 
     def get_data(self):
         return self._data
@@ -443,6 +569,8 @@ class FundHistory:
         'end_worth': {'field': 'DWJZ', 'label': '收盘值'},
         'rate': {'field': 'JZZZL', 'label': '涨跌幅'},
     }
+    # 解析的历史数据字段（接口不支持字段选择）
+    history_fields = [option['field'] for option in relate_fields.values() if option['field']]
 
     def __init__(self, code, data: dict):
         self.code = code
@@ -452,23 +580,45 @@ class FundHistory:
     @classmethod
     def load(cls, api, code, limit):
         logging.info(f'开始查询历史数据：fund [{code}]')
-        return api.fetch_history(code, start_date=utils.get_delay_date(delay=-limit, tz=config.CronZone))
+        return cls.load_range(api, code, limit, cls.history_fields)
+
+    @classmethod
+    def load_range(cls, api, code, limit: int, fields: []) -> (Union[dict, None], bool):
+        """
+        最近 limit 个交易日的历史数据（列式）。按交易日历一次确定日期范围；
+        日历未覆盖的节假日（如未录入的年份）使数据不足时，扩大范围补充请求一次，截取最近的 limit 条。
+        当天的净值收盘后才公布，公布前范围内的当天无数据，此时 limit - 1 条即为完整
+        """
+        start_date, end_date = trade_calendar.get_trade_range(limit)
+        res, ok = api.fetch_history(code, start_date=start_date, columnar=True, fields=fields)
+        dates = res['LSJZList']['FSRQ'] if ok and res else []
+        count = len(dates)
+        expected = limit - int(trade_calendar.is_trade_day(end_date) and not (count and dates[0] == end_date))
+        if not ok or count >= expected:
+            return res, ok
+
+        fallback_start = trade_calendar.get_fallback_start(start_date, expected - count)
+        logging.warning(f'历史数据不足：fund [{code}] {count}/{expected}，补充查询自{fallback_start}')
+        more, more_ok = api.fetch_history(code, start_date=fallback_start, columnar=True, fields=fields)
+        if not more_ok or not more or len(more['LSJZList']['FSRQ']) <= count:
+            return res, ok
+        # 按日期倒序，保留最近的 limit 条
+        more['LSJZList'] = {field: column[:limit] for field, column in more['LSJZList'].items()}
+        return more, True
 
     def _resolve_data(self, data):
-        if not data:
+        if not data or not len(data['LSJZList']['FSRQ']):
             return
 
-        df = pd.DataFrame(data)
-        rename_fields = {option['field']: field for field, option in FundHistory.relate_fields.items()
-                         if option['field']}
-        df.rename(rename_fields, axis=1, inplace=True)
-        # df['start_worth'] = df.apply(lambda x: float(x['end_worth']) / (1 + float(x['rate']) / 100), axis=1)
-        # 匹配相同精度
-        df['start_worth'] = df.apply(lambda x: f'%.{len(x["end_worth"].split(".")[-1])}f' %
-                                               (float(x['end_worth']) / (1 + float(x['rate']) / 100)), axis=1)
+        cols = {field: data['LSJZList'][option['field']] for field, option in FundHistory.relate_fields.items()
+                if option['field']}
+        cols['start_worth'] = cols['end_worth'] / (1 + cols['rate'] / 100)
 
-        df = df.loc[:, [field for field, option in FundHistory.relate_fields.items() if option.get('show', True)]]
-        return json.loads(df.to_json(orient='records'))
+        # 匹配相同精度
+        decimal = f'%.{data["decimal"]}f'
+        fmts = {field: {'date': None, 'rate': '%.2f'}.get(field, decimal)
+                for field, option in FundHistory.relate_fields.items() if option.get('show', True)}
+        return columns.to_records(cols, fmts)
 
     def get_data(self):
         return self._data
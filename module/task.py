@@ -6,12 +6,46 @@
 import asyncio
 import logging
 
-from module.process import worth, monitor
+from api import eastmoney_async, stream
+from module import focus, bad_code
+from module.process import worth, monitor, process
 import sockets
-from utils import send_msg, utils
+from utils import send_msg, utils, trade_calendar
 import config
 
 
+async def prefetch(money_type, task_type, *, fields: list = None) -> dict:
+    """
+    在事件循环上批量获取关注项的当前数据，供处理器直接使用
+    :param money_type: 基金/股票
+    :param task_type: 任务类型，与关注的类型一致
+    :param fields: 处理器所需的字段
+    :return: {code: data}
+    """
+    options, _ = focus.Focus(task_type).get(money_type)
+    codes = [option['code'] for option in options]
+    if task_type == 'worth' and config.WorthUseCache:
+        codes = [code for code in codes if not worth.Worth.is_fresh(money_type, code)]
+    codes, _ = bad_code.split(money_type, codes)
+    if not codes:
+        return {}
+
+    # 优先使用行情推送中的最新数据，仅请求其余代码
+    streamed = stream.get_quotes(codes, fields) if money_type == 'stock' else {}
+    codes = [code for code in codes if code not in streamed]
+    if not codes:
+        return streamed
+
+    try:
+        quotes, ok = await eastmoney_async.AsyncEastMoney(money_type).fetch_current_batch(codes, fields=fields)
+    except Exception as e:
+        # 预取失败时，由处理器自行请求
+        logging.warning(f'预取当前数据失败：{money_type} {task_type}, {e}')
+        return streamed
+    bad_code.record(money_type, codes, quotes, ok)
+    return {**quotes, **streamed}
+
+
 async def send_money(money_type, *, task_type, choke=False, is_broad=False):
     """
 
@@ -49,7 +83,9 @@ async def send_money(money_type, *, task_type, choke=False, is_broad=False):
 
     async def money():
         try:
-            processor = process_task[task_type](money_type)
+            quotes = await prefetch(money_type, task_type,
+                                    fields=process_task[task_type].get_current_fields(money_type))
+            processor = process_task[task_type](money_type, quotes=quotes)
         except AssertionError:
             processor = None
         await send(processor)
@@ -60,5 +96,89 @@ async def send_money(money_type, *, task_type, choke=False, is_broad=False):
         asyncio.create_task(money())
 
 
+async def warm(money_type):
+    """
+    开盘前预热当天的缓存：关注项的名称、历史查询与历史监控的历史数据。
+    逐个代码加载，间隔 CacheWarmPace 秒，使上游请求平滑，而不是由首个定时任务集中请求
+    :param money_type: 基金/股票
+    :return:
+    """
+    if not trade_calendar.is_trade_day(utils.now_time(fmt='%Y-%m-%d', tz=config.CronZone)):
+        return
+    loop = asyncio.get_running_loop()
+    pace = float(config.CacheWarmPace)
+    worth_codes = [option['code'] for option in focus.Focus('worth').get(money_type)[0]]
+    monitor_codes = [option['code'] for option in focus.Focus('history_monitor').get(money_type)[0]]
+    logging.info(f'开始预热缓存：{money_type}, 历史{len(worth_codes)}个, 历史监控{len(monitor_codes)}个')
+
+    codes = list(dict.fromkeys([*worth_codes, *monitor_codes,
+                                *[option['code'] for option in focus.Focus('monitor').get(money_type)[0]]]))
+    if codes:
+        await loop.run_in_executor(None, process.get_codes_name, money_type, codes)
+
+    limit = worth.History.get_limit()
+    jobs = [(worth.History.load_history, (money_type, code, limit)) for code in worth_codes] + \
+           [(monitor.HistoryMonitor.load_history, (money_type, code)) for code in monitor_codes]
+    for func, args in jobs:
+        try:
+            await loop.run_in_executor(None, func, *args)
+        except Exception as e:
+            logging.warning(f'预热缓存失败：{money_type} {args[1]}, {e}')
+        await asyncio.sleep(pace)
+
+
+evaluating = None
+
+
+def on_stream(codes: list):
+    """
+    行情推送的监听：行情变化后（间隔 StreamEvalInterval）以最新行情执行股票的监控，有客户端连接时同时广播
+    :param codes: 本次更新的代码
+    :return:
+    """
+    global evaluating
+    if not codes or (evaluating is not None and not evaluating.done()):
+        return
+
+    async def evaluate():
+        await asyncio.sleep(float(config.StreamEvalInterval))
+        for task_type in ('monitor', 'history_monitor'):
+            await send_money('stock', task_type=task_type, choke=True)
+            await send_money('stock', task_type=task_type, choke=True, is_broad=True)
+
+    evaluating = asyncio.create_task(evaluate())
+
+
+def get_stream_codes() -> list:
+    """行情推送需要订阅的代码：股票的各类关注项"""
+    codes = []
+    for focus_type in ('worth', 'monitor', 'history_monitor'):
+        options, _ = focus.Focus(focus_type).get('stock')
+        codes.extend(str(option['code']) for option in options)
+    return list(dict.fromkeys(codes))
+
+
+def on_focus_change(file_name: str):
+    """关注项变化时，行情推送重新订阅"""
+    stream.resubscribe()
+
+
+async def start_stream():
+    quote_stream = stream.get_stream()
+    quote_stream.get_codes = get_stream_codes
+    if on_stream not in quote_stream.listeners:
+        quote_stream.listeners.append(on_stream)
+    if on_focus_change not in focus.listeners:
+        focus.listeners.append(on_focus_change)
+    quote_stream.start()
+    logging.info('开启股票行情推送订阅...')
+
+
+async def stop_stream():
+    if evaluating is not None:
+        evaluating.cancel()
+    await stream.get_stream().stop()
+
+
 if __name__ == '__main__':
     asyncio.run(send_money('stock', task_type='worth', choke=True))
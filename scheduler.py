@@ -8,8 +8,9 @@ import logging
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 
-from module import task
+from module import cache, task
 import config
 
 # 创建一个异步调度器
@@ -74,11 +75,35 @@ def add_broadcast_job():
                               name=f'{job["title"]} Task {index}')
 
 
+def add_warm_job():
+    for index, cron in enumerate(config.CacheWarmCron):
+        if not cron:
+            continue
+
+        trigger = CronTrigger.from_crontab(cron, config.CronZone)
+        logging.info(f'Add job: Cache Warm, {cron}')
+        for money_type in ('fund', 'stock'):
+            scheduler.add_job(task.warm, args=(money_type,), trigger=trigger,
+                              id=f'cache_warm_{money_type}_{index}', name=f'Cache Warm {money_type} Task {index}')
+
+
+def add_stats_job():
+    interval = int(config.CacheStatsInterval)
+    if interval <= 0:
+        return
+
+    logging.info(f'Add job: Cache Stats, {interval}s')
+    scheduler.add_job(cache.log_stats, trigger=IntervalTrigger(seconds=interval), id='cache_stats',
+                      name='Cache Stats Task')
+
+
 # 启动调度器
 async def start_scheduler():
     logging.info('开启定时任务...')
     add_job()
     add_broadcast_job()
+    add_warm_job()
+    add_stats_job()
     scheduler.start()
 
 
@@ -46,10 +46,8 @@ class Client:
         """
         if key:
             key = f'client:{self.key}:{key}'
-            if cache.exist(key):  # 避免给同一用户发送重复的通知
+            if not cache.add(key, True, expire=bean.get_today_expire(key)):  # 避免给同一用户发送重复的通知
                 return
-            else:
-                bean.set_cache_expire_today(key, True)
 
         logging.info(f'ws[{self.key}] send: {data}')
         await self.websocket.send_json(data)
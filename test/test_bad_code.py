@@ -0,0 +1,80 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 20:30
+# FileName: 失效代码的负缓存的测试
+
+import time
+import unittest
+
+from module import bad_code
+import config
+
+
+class TestBadCode(unittest.TestCase):
+
+    def setUp(self):
+        self.bad_codes = bad_code.BadCodes()
+
+    def test_backoff(self):
+        self.assertEqual(bad_code.get_backoff(1), int(config.BadCodeBackoff))
+        self.assertEqual(bad_code.get_backoff(3), int(config.BadCodeBackoff) * 4)
+        self.assertEqual(bad_code.get_backoff(100), int(config.BadCodeMaxBackoff))
+
+    def test_fail(self):
+        self.bad_codes.fail('stock', '000000', '无数据')
+        self.assertTrue(self.bad_codes.is_bad('stock', '000000'))
+        self.assertFalse(self.bad_codes.is_bad('fund', '000000'))
+        self.assertEqual(self.bad_codes.split('stock', ['600000', '000000']), (['600000'], ['000000']))
+
+        # 退避期间重复记录不加倍
+        item = self.bad_codes.fail('stock', '000000', '无数据')
+        self.assertEqual(item['failures'], 1)
+
+        # 退避到期后仍失败，退避时间加倍
+        self.bad_codes._BadCodes__data[('quote', 'stock', '000000')]['retry_at'] = time.time() - 1
+        self.assertFalse(self.bad_codes.is_bad('stock', '000000'))
+        item = self.bad_codes.fail('stock', '000000', '无数据')
+        self.assertEqual(item['failures'], 2)
+        self.assertAlmostEqual(self.bad_codes.get('stock', '000000')['retry_in'], bad_code.get_backoff(2), delta=1)
+
+        self.bad_codes.recover('stock', '000000')
+        self.assertIsNone(self.bad_codes.get('stock', '000000'))
+        self.assertEqual(self.bad_codes.report(), [])
+
+    def test_record(self):
+        codes = ['600000', '000000', '999999']
+        # 部分请求失败时，无数据的代码不记录
+        self.bad_codes.record('stock', codes, {'600000': {'f43': 1}}, False)
+        self.assertEqual(self.bad_codes.report(), [])
+
+        self.bad_codes.record('stock', codes, {'600000': {'f43': 1}}, True)
+        self.assertEqual([item['code'] for item in self.bad_codes.report()], ['000000', '999999'])
+
+        self.bad_codes.record('stock', ['000000'], {'000000': {'f43': 1}}, True)
+        self.assertEqual([item['code'] for item in self.bad_codes.report()], ['999999'])
+
+    def test_kind(self):
+        # 历史数据无效时不影响当前数据
+        self.bad_codes.fail('stock', '600000', '无历史数据', kind=bad_code.HISTORY)
+        self.assertTrue(self.bad_codes.is_bad('stock', '600000', kind=bad_code.HISTORY))
+        self.assertFalse(self.bad_codes.is_bad('stock', '600000'))
+        self.assertEqual(self.bad_codes.split('stock', ['600000']), (['600000'], []))
+        self.assertEqual([(item['kind'], item['code']) for item in self.bad_codes.report()],
+                         [('history', '600000')])
+
+    def test_load_history(self):
+        bad_code.clear()
+        self.addCleanup(bad_code.clear)
+        # 请求失败时不记录
+        self.assertIsNone(bad_code.load_history('stock', '600000', lambda: (None, False)))
+        self.assertEqual(bad_code.report(), [])
+
+        self.assertIsNone(bad_code.load_history('stock', '600000', lambda: ({}, True)))
+        self.assertTrue(bad_code.is_bad('stock', '600000', kind=bad_code.HISTORY))
+
+        self.assertEqual(bad_code.load_history('stock', '600000', lambda: ({'decimal': 2}, True)), {'decimal': 2})
+        self.assertIsNone(bad_code.get('stock', '600000', kind=bad_code.HISTORY))
+
+
+if __name__ == '__main__':
+    unittest.main()
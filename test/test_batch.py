@@ -0,0 +1,77 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 21:00
+# FileName: 批量行情字段映射的测试
+
+import json
+import unittest
+
+import requests
+
+from api.eastmoney import Stock
+
+
+def make_response(body: str, status: int = 200) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = body.encode()
+    return resp
+
+
+class TestStockBatch(unittest.TestCase):
+
+    def test_fields(self):
+        # 批量字段均对应到单个查询的字段
+        for batch_field, field in Stock.batch_fields.items():
+            with self.subTest(batch_field=batch_field):
+                self.assertIn(field, Stock.detail_fields)
+
+    def test_relate(self):
+        cases = [
+            (['f43', 'f58'], {'f2': 'f43', 'f12': 'f57', 'f14': 'f58'}),
+            (['f57'], {'f12': 'f57'}),
+            (['f49'], {'f12': 'f57'}),  # ulist 不支持的字段
+            (None, Stock.batch_fields),
+        ]
+        for fields, relate in cases:
+            with self.subTest(fields=fields):
+                self.assertEqual(Stock._batch_relate(fields), relate)
+
+    def test_merge(self):
+        relate = Stock._batch_relate(['f43', 'f58', 'f59', 'f86'])
+        cases = [
+            ('dict', {'data': {'total': 2, 'diff': {'0': {'f2': 1023, 'f12': '600000', 'f14': '浦发银行', 'f1': 2,
+                                                         'f124': 1760000000},
+                                                   '1': {'f2': '-', 'f12': 300750, 'f14': '宁德时代', 'f1': 2}}}}),
+            ('list', {'data': {'total': 2, 'diff': [{'f2': 1023, 'f12': '600000', 'f14': '浦发银行', 'f1': 2,
+                                                     'f124': 1760000000},
+                                                    {'f2': '-', 'f12': 300750, 'f14': '宁德时代', 'f1': 2}]}}),
+        ]
+        for name, body in cases:
+            with self.subTest(name=name):
+                rows = [Stock._parse_batch(make_response(json.dumps(body)))]
+                result, ok = Stock._merge_batch(rows, relate)
+                self.assertTrue(ok)
+                self.assertEqual(result['600000'], {'f43': 1023, 'f57': '600000', 'f58': '浦发银行', 'f59': 2,
+                                                    'f86': 1760000000})
+                self.assertEqual(result['300750'], {'f43': '-', 'f57': 300750, 'f58': '宁德时代', 'f59': 2})
+
+    def test_parse(self):
+        cases = [
+            ('null', make_response('{"rc":0,"data":null}'), ([], True)),
+            ('error', make_response('', 502), ([], False)),
+            ('none', None, ([], False)),
+        ]
+        for name, resp, expect in cases:
+            with self.subTest(name=name):
+                self.assertEqual(Stock._parse_batch(resp), expect)
+
+        # 部分请求失败时，已返回的数据保留，整体为失败
+        result, ok = Stock._merge_batch([([{'f12': '600000', 'f2': 1}], True), ([], False)],
+                                        Stock._batch_relate(['f43']))
+        self.assertEqual(result, {'600000': {'f43': 1, 'f57': '600000'}})
+        self.assertFalse(ok)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 18:30
+# FileName: 全局缓存的测试
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from module import cache
+import config
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.limits = config.CacheMaxEntries, config.CacheMaxBytes, config.CacheQuotas
+        cache.clear()
+
+    def tearDown(self):
+        config.CacheMaxEntries, config.CacheMaxBytes, config.CacheQuotas = self.limits
+        cache.clear()
+
+    def test_expire(self):
+        cache.set('a', 1, expire=0.1)
+        cache.set('b', 2)
+        self.assertTrue(cache.exist('a'))
+        time.sleep(0.2)
+        self.assertFalse(cache.exist('a'))
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 2)
+
+    def test_overwrite(self):
+        cache.set('a', 1, expire=0.1)
+        cache.set('a', 2, expire=10)
+        time.sleep(0.2)
+        self.assertEqual(cache.get('a'), 2)
+
+        cache.set('a', 3)
+        self.assertEqual(cache.get('a'), 3)
+
+    def test_sweep(self):
+        threads = threading.active_count()
+        for index in range(1000):
+            cache.set(f'key.{index}', index, expire=0.1)
+        self.assertLessEqual(threading.active_count(), threads + 1)
+        time.sleep(0.3)
+        # 未读取的key由清理线程删除
+        self.assertEqual(len(cache.get_cache().data), 0)
+
+    def test_evict(self):
+        config.CacheMaxEntries = 3
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+        cache.get('a')
+        cache.set('d', 'd')
+        # a 读取过，b 最久未使用
+        self.assertEqual(set(cache.get_cache().data), {'a', 'c', 'd'})
+
+        config.CacheMaxEntries, config.CacheMaxBytes = 0, 10000
+        cache.set('e', b'x' * 9800)
+        self.assertLessEqual(cache.get_cache().bytes, 10000)
+        self.assertIn('e', cache.get_cache().data)
+        self.assertEqual(cache.get_cache().evictions['b'], 1)
+
+    def test_quota(self):
+        config.CacheQuotas = {'client': 2}
+        for index in range(5):
+            cache.set(f'client:{index}:hash', True)
+            cache.set(f'history.stock.{index}.31', [])
+        self.assertEqual([key for key in cache.get_cache().data if key.startswith('client')],
+                         ['client:3:hash', 'client:4:hash'])
+        self.assertEqual(cache.get_cache().evictions, {'client': 3})
+
+    def test_concurrent(self):
+        config.CacheMaxEntries = 100
+        errors = []
+
+        def work(seed):
+            try:
+                for index in range(2000):
+                    key = f'worth.stock.{(seed * index) % 300}'
+                    if index % 5 == 0:
+                        cache.set(key, index, expire=0.01 if index % 3 else None)
+                    else:
+                        cache.get(key)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=work, args=(seed,)) for seed in range(1, 9)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(cache.get_cache().data), 100)
+
+    def test_disk(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = cache.DiskStore(os.path.join(temp_dir, 'cache.db'))
+            store.put('history.stock.600000.31', {'decimal': 2}, time.time() + 10)
+            store.put('code_name', {'stock.600000': '浦发银行'}, float('inf'))
+            store.put('client:a:hash', True, time.time() - 1)
+            self.assertEqual(store.get('history.stock.600000.31')[0], {'decimal': 2})
+            self.assertIsNone(store.get('client:a:hash'))
+            self.assertEqual({key for key, *_ in store.load()}, {'history.stock.600000.31', 'code_name'})
+            self.assertEqual(store.purge(), 1)
+
+            # 值已不是最新（被覆盖、删除）时跳过写入
+            self.assertFalse(store.put('history.stock.000001.31', {'decimal': 2}, float('inf'),
+                                       current=lambda: False))
+            self.assertIsNone(store.get('history.stock.000001.31'))
+            store.close()
+
+    def test_disk_cache(self):
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                mock.patch.object(config, 'CacheDiskPath', os.path.join(temp_dir, 'cache.db')), \
+                mock.patch.object(cache.Cache, 'instance', None):
+            disk_cache = cache.Cache()
+            store = disk_cache._Cache__disk
+            disk_cache.set('history.stock.600000.31', {'decimal': 2}, expire=60)
+            self.assertEqual(store.get('history.stock.600000.31')[0], {'decimal': 2})
+
+            # 不在磁盘层的key缺失时不读取磁盘
+            with mock.patch.object(store, 'get', wraps=store.get) as get:
+                self.assertIsNone(disk_cache.get('history.stock.000001.31'))
+                disk_cache.data.clear()  # 模拟被淘汰
+                self.assertEqual(disk_cache.get('history.stock.600000.31'), {'decimal': 2})
+                self.assertEqual(get.call_count, 1)
+
+            # 删除、清空在写锁外进行，写锁不被磁盘IO占用
+            lock = disk_cache._Cache__write_lock
+            locked = []
+            with mock.patch.object(store, 'delete', side_effect=lambda *args, **kwargs: locked.append(lock.locked())), \
+                    mock.patch.object(store, 'clear', side_effect=lambda: locked.append(lock.locked())):
+                disk_cache.delete('history.stock.600000.31')
+                disk_cache.clear()
+            self.assertEqual(locked, [False, False])
+
+            disk_cache.set('history.stock.600000.31', {'decimal': 2}, expire=60)
+            disk_cache.delete('history.stock.600000.31')
+            self.assertIsNone(store.get('history.stock.600000.31'))
+            store.close()
+
+    def test_stats(self):
+        cache.set('worth.stock.600000', {'f43': 1000}, expire=60)
+        cache.get('worth.stock.600000')
+        cache.get('worth.stock.000001')
+        cache.set('client:a:hash', True, expire=0.01)
+        time.sleep(0.02)
+        cache.exist('client:a:hash')
+
+        stats = cache.stats(top=1)
+        self.assertEqual(stats['entries'], 1)
+        self.assertEqual(stats['namespaces']['worth']['hit_rate'], 0.5)
+        self.assertEqual(stats['namespaces']['client']['expirations'], 1)
+        self.assertEqual(stats['namespaces']['worth']['bytes'], stats['bytes'])
+        self.assertEqual(stats['largest'][0]['key'], 'worth.stock.600000')
+
+    def test_memoize(self):
+        calls = []
+
+        @cache.memoize(lambda code: f'history.stock.{code}', expire=60, negative=60)
+        def load(code):
+            calls.append(code)
+            time.sleep(0.05)
+            return None if code == 'bad' else {'code': code}
+
+        threads = [threading.Thread(target=load, args=('600000',)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(load('600000'), {'code': '600000'})
+        self.assertIsNone(load('bad'))
+        self.assertIsNone(load('bad'))
+        # 并发加载只执行一次，空结果同样缓存
+        self.assertEqual(calls, ['600000', 'bad'])
+
+    def test_memoize_many(self):
+        calls = []
+
+        @cache.memoize_many(lambda code, money_type: f'code_name.{money_type}.{code}', expire=60, negative=60)
+        def load(codes, money_type):
+            calls.append(codes)
+            # bad 不存在（结果为None），failed 请求失败（未返回）
+            return {code: None if code == 'bad' else f'{money_type}{code}' for code in codes if code != 'failed'}
+
+        self.assertEqual(load(['1', 'bad', 'failed'], 'stock'), {'1': 'stock1', 'bad': None, 'failed': None})
+        self.assertEqual(load(['1', '2', 'bad', 'failed'], 'stock'),
+                         {'1': 'stock1', '2': 'stock2', 'bad': None, 'failed': None})
+        # 结果为None的缓存，未返回的不缓存
+        self.assertEqual(calls, [['1', 'bad', 'failed'], ['2', 'failed']])
+
+    def test_add(self):
+        self.assertTrue(cache.add('client:a:hash', True, expire=60))
+        self.assertFalse(cache.add('client:a:hash', True, expire=60))
+
+
+if __name__ == '__main__':
+    unittest.main()
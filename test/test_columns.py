@@ -0,0 +1,38 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 16:00
+# FileName: 列式解析的测试
+
+import math
+import unittest
+
+from api import columns
+
+
+class TestColumns(unittest.TestCase):
+
+    def test_from_lines(self):
+        lines = ['2023-11-01,10.00,1.50', '2023-11-02,10.20,-']
+        data = columns.from_lines(lines, ['date', 'end', 'rate'], {'end': int, 'rate': float}, decimal=2)
+        self.assertEqual(data['date'].tolist(), ['2023-11-01', '2023-11-02'])
+        self.assertEqual(data['end'].tolist(), [1000, 1020])
+        self.assertEqual(data['rate'][0], 1.5)
+        self.assertTrue(math.isnan(data['rate'][1]))
+
+        with self.assertRaises(ValueError):
+            columns.from_lines(['2023-11-01,10.00'], ['date', 'end', 'rate'])
+
+    def test_from_records(self):
+        records = [{'FSRQ': '2023-11-02', 'DWJZ': '1.2340', 'JZZZL': ''},
+                   {'FSRQ': '2023-11-01', 'DWJZ': '1.2300', 'JZZZL': '0.52'}]
+        data = columns.from_records(records, ['FSRQ', 'DWJZ', 'JZZZL'])
+        self.assertEqual(columns.get_decimal(data['DWJZ']), 4)
+
+        rate = columns.convert(data['JZZZL'], float, 0)
+        self.assertEqual(columns.format_column(rate, '%.2f'), [None, '0.52'])
+        self.assertEqual(columns.to_records({'date': data['FSRQ'], 'rate': rate}, {'date': None, 'rate': '%.2f'}),
+                         [{'date': '2023-11-02', 'rate': None}, {'date': '2023-11-01', 'rate': '0.52'}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 16:30
+# FileName: 响应解码的测试
+
+import unittest
+
+import requests
+
+from api import decode
+
+
+def make_response(body: bytes) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = 200
+    resp._content = body
+    return resp
+
+
+class TestDecode(unittest.TestCase):
+
+    def test_jsonp(self):
+        resp = make_response('jsonpgz({"fundcode":"161226","name":"国投白银LOF"});'.encode())
+        self.assertEqual(decode.parse(resp, jsonp=True)['name'], '国投白银LOF')
+        self.assertEqual(decode.parse(make_response(b'var r = [["000001"]];'), jsonp=True), [['000001']])
+
+        with self.assertRaises(decode.DecodeError):
+            decode.parse(make_response(b'jsonpgz();'), jsonp=True)
+
+    def test_path(self):
+        resp = make_response(b'{"rc":0,"data":{"diff":[1,2]}}')
+        self.assertEqual(decode.parse(resp, 'data', 'diff'), [1, 2])
+        self.assertIsNone(decode.parse(make_response(b'{"rc":0,"data":null}'), 'data', 'diff'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 23:30
+# FileName: 基金批量估值的测试
+
+import json
+import threading
+import unittest
+from unittest import mock
+
+import requests
+
+from api import fetch
+from api.eastmoney import Fund
+import config
+
+
+def make_response(body: str, status: int = 200) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = body.encode()
+    return resp
+
+
+def make_row(code: str) -> dict:
+    return {'FCODE': code, 'SHORTNAME': f'基金{code}', 'NAV': '1.2000', 'GSZ': '1.2100', 'GSZZL': '0.83',
+            'GZTIME': '2026-10-16 15:00', 'PDATE': '2026-10-15'}
+
+
+class TestFundBatch(unittest.TestCase):
+
+    def test_fields(self):
+        for batch_field, field in Fund.batch_fields.items():
+            with self.subTest(batch_field=batch_field):
+                self.assertIn(field, set(Fund.detail_fields) | {'jzrq'})
+
+    def test_merge(self):
+        item = {'FCODE': '161226', 'SHORTNAME': '国投白银LOF', 'NAV': '1.2000', 'GSZ': '1.2100', 'GSZZL': '0.83',
+                'GZTIME': '2026-10-16 15:00', 'PDATE': '2026-10-15'}
+        cases = [
+            ('ok', item, {'gsz': '1.2100', 'dwjz': '1.2000', 'gszzl': '0.83', 'fundcode': '161226',
+                          'name': '国投白银LOF', 'gztime': '2026-10-16 15:00', 'jzrq': '2026-10-15'}),
+            ('no estimate', {**item, 'GSZ': '--'}, None),  # 无估值（如QDII）
+            ('no time', {**item, 'GZTIME': ''}, None),
+            ('missing', {key: value for key, value in item.items() if key != 'GSZ'}, None),
+        ]
+        for name, row, expect in cases:
+            with self.subTest(name=name):
+                result, ok = Fund._merge_batch([([row], True)])
+                self.assertTrue(ok)
+                self.assertEqual(result.get('161226'), expect)
+
+    def test_parse(self):
+        cases = [
+            ('ok', make_response('{"ErrCode":0,"Datas":[{"FCODE":"161226"}]}'), ([{'FCODE': '161226'}], True)),
+            ('empty', make_response('{"ErrCode":0,"Datas":null}'), ([], True)),
+            ('err code', make_response('{"ErrCode":1,"Datas":null}'), ([], False)),
+            ('error', make_response('', 502), ([], False)),
+        ]
+        for name, resp, expect in cases:
+            with self.subTest(name=name):
+                self.assertEqual(Fund._parse_batch(resp), expect)
+
+    def test_chunks(self):
+        codes = [f'{index:06d}' for index in range(5)]
+        requests_codes = []
+        lock = threading.Lock()
+
+        def get(url, params=None, **kwargs):
+            chunk = params['Fcodes'].split(',')
+            with lock:
+                requests_codes.append(chunk)
+            if failed in chunk:
+                return make_response('', 502)
+            return make_response(json.dumps({'ErrCode': 0, 'Datas': [make_row(code) for code in chunk]}))
+
+        with mock.patch.object(fetch, 'get', get), mock.patch.object(config, 'FundBatchSize', 2):
+            # 按 FundBatchSize 分批请求
+            failed = None
+            result, ok = Fund().fetch_current_batch(codes)
+            self.assertTrue(ok)
+            self.assertEqual(sorted(requests_codes), [codes[:2], codes[2:4], codes[4:]])
+            self.assertEqual(set(result), set(codes))
+            self.assertEqual(result['000003']['name'], '基金000003')
+
+            # 部分批次失败时，已返回的数据保留，整体为失败
+            failed = '000002'
+            result, ok = Fund().fetch_current_batch(codes)
+            self.assertFalse(ok)
+            self.assertEqual(set(result), {'000000', '000001', '000004'})
+
+        self.assertEqual(Fund().fetch_current_batch([]), ({}, True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 21:10
+# FileName: 基金历史数据分页的测试
+
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+import requests
+
+from api import fetch
+from api.eastmoney import Fund
+from api.eastmoney_async import AsyncFund
+from module.process.worth import FundHistory
+from utils import trade_calendar
+
+TOTAL = 45
+PAGE_SIZE = 10
+
+
+def make_page(page: int, failed_pages: set):
+    if page in failed_pages:
+        return None
+    rows = [{'FSRQ': f'day{index:02d}', 'DWJZ': '1.0000', 'LJJZ': '1.0000', 'JZZZL': '0.00', 'SGZT': '', 'SHZT': ''}
+            for index in range((page - 1) * PAGE_SIZE, min(page * PAGE_SIZE, TOTAL))]
+    resp = requests.Response()
+    resp.status_code = 200
+    resp._content = json.dumps({'ErrCode': 0, 'TotalCount': TOTAL, 'Data': {'LSJZList': rows}}).encode()
+    return resp
+
+
+class TestFundHistory(unittest.TestCase):
+
+    def fetch(self, failed_pages: set):
+        def get(url, params=None, **kwargs):
+            return make_page(params['pageIndex'], failed_pages)
+
+        async def async_get(url, params=None, **kwargs):
+            return get(url, params)
+
+        with mock.patch.object(fetch, 'get', get), mock.patch.object(fetch, 'async_get', async_get):
+            return Fund().fetch_history('161226', page_size=PAGE_SIZE), \
+                asyncio.run(AsyncFund().fetch_history('161226', page_size=PAGE_SIZE))
+
+    def test_pages(self):
+        for result, ok in self.fetch(set()):
+            self.assertTrue(ok)
+            self.assertEqual([row['FSRQ'] for row in result], [f'day{index:02d}' for index in range(TOTAL)])
+
+    def test_failed_page(self):
+        # 中间或首页失败时整体失败，不返回缺页的序列
+        for failed_pages in ({3}, {1}, {5}):
+            with self.subTest(failed_pages=failed_pages):
+                for result in self.fetch(failed_pages):
+                    self.assertEqual(result, (None, False))
+
+
+class FakeApi:
+    """按请求的开始日期返回不同数量的数据：首次的范围不足，补充的范围足够"""
+
+    def __init__(self, counts: list, latest: str = None):
+        self.counts = counts
+        self.latest = latest  # 最新一条数据的日期
+        self.start_dates = []
+
+    def fetch_history(self, code, *, start_date=None, columnar=False, fields=None):
+        count = self.counts[len(self.start_dates)]
+        self.start_dates.append(start_date)
+        if count is None:
+            return None, False
+        dates = [f'day{index:02d}' for index in range(count)]
+        if self.latest and dates:
+            dates[0] = self.latest
+        return {'decimal': 4, 'LSJZList': {'FSRQ': dates, 'DWJZ': [1.0] * count}}, True
+
+
+class TestFundHistoryRange(unittest.TestCase):
+
+    def setUp(self):
+        # 固定为非交易日（周六），范围内不含未公布净值的当天
+        self.today = '2026-10-17'
+        patcher = mock.patch.object(trade_calendar.utils, 'now_time', lambda *args, **kwargs: self.today)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_enough(self):
+        api = FakeApi([5])
+        data, ok = FundHistory.load_range(api, '161226', 5, ['FSRQ', 'DWJZ'])
+        self.assertTrue(ok)
+        self.assertEqual(len(data['LSJZList']['FSRQ']), 5)
+        self.assertEqual(len(api.start_dates), 1)
+
+    def test_fallback(self):
+        # 日历未覆盖的节假日使数据不足时，补充请求一次并截取最近的 limit 条
+        api = FakeApi([3, 12])
+        data, ok = FundHistory.load_range(api, '161226', 5, ['FSRQ', 'DWJZ'])
+        self.assertTrue(ok)
+        self.assertEqual(data['LSJZList']['FSRQ'], ['day00', 'day01', 'day02', 'day03', 'day04'])
+        self.assertEqual(len(data['LSJZList']['DWJZ']), 5)
+        self.assertLess(api.start_dates[1], api.start_dates[0])
+
+        # 补充请求失败时，返回原数据
+        data, ok = FundHistory.load_range(FakeApi([3, None]), '161226', 5, ['FSRQ', 'DWJZ'])
+        self.assertTrue(ok)
+        self.assertEqual(len(data['LSJZList']['FSRQ']), 3)
+
+        self.assertEqual(FundHistory.load_range(FakeApi([None]), '161226', 5, ['FSRQ']), (None, False))
+
+    def test_unpublished_today(self):
+        # 交易日当天的净值公布前，范围内的当天无数据，少一条不补充请求
+        self.today = '2026-10-16'
+        api = FakeApi([30], latest='2026-10-15')
+        data, ok = FundHistory.load_range(api, '161226', 31, ['FSRQ', 'DWJZ'])
+        self.assertTrue(ok)
+        self.assertEqual(len(data['LSJZList']['FSRQ']), 30)
+        self.assertEqual(len(api.start_dates), 1)
+
+        # 当天净值已公布时，仍需 limit 条
+        api = FakeApi([30, 40], latest='2026-10-16')
+        data, ok = FundHistory.load_range(api, '161226', 31, ['FSRQ', 'DWJZ'])
+        self.assertEqual(len(data['LSJZList']['FSRQ']), 31)
+        self.assertEqual(len(api.start_dates), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 21:30
+# FileName: 上游保护的测试
+
+import asyncio
+import unittest
+from unittest import mock
+
+from api import fetch, guard
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_reserve(self):
+        bucket = guard.TokenBucket(rate=10, burst=2)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        # 令牌用尽后，按补充速率排队等待
+        self.assertAlmostEqual(bucket.reserve(), 0.1, delta=0.01)
+        self.assertAlmostEqual(bucket.reserve(), 0.2, delta=0.01)
+        self.assertEqual(bucket.stats()['requests'], 4)
+        self.assertAlmostEqual(bucket.stats()['wait_max'], 0.2, delta=0.01)
+
+    def test_unlimited(self):
+        bucket = guard.TokenBucket(rate=0, burst=0)
+        self.assertEqual([bucket.reserve() for _ in range(100)], [0] * 100)
+
+
+class TestRetryBudget(unittest.TestCase):
+
+    def test_budget(self):
+        budget = guard.RetryBudget(ratio=0.5, capacity=2)
+        self.assertTrue(budget.withdraw())
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+        # 每个请求存入 ratio，两个请求换一次重试
+        budget.deposit()
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+
+        # 额度不超过 capacity
+        for _ in range(100):
+            budget.deposit()
+        self.assertEqual(budget.stats()['tokens'], 2)
+        self.assertEqual(budget.stats(), {'tokens': 2, 'retries': 3, 'denied': 2})
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def open(self, breaker: guard.CircuitBreaker):
+        for _ in range(breaker.threshold):
+            self.assertTrue(breaker.allow())
+            breaker.failure()
+        self.assertEqual(breaker.state, guard.CircuitBreaker.OPEN)
+
+    def test_open(self):
+        breaker = guard.CircuitBreaker('test', failures=3, cooldown=60)
+        breaker.failure()
+        breaker.success()  # 成功后重新计数
+        breaker.failure()
+        breaker.failure()
+        self.assertEqual(breaker.state, guard.CircuitBreaker.CLOSED)
+        breaker.failure()
+        self.assertEqual(breaker.state, guard.CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.stats()['rejected'], 1)
+
+    def test_half_open(self):
+        breaker = guard.CircuitBreaker('test', failures=2, cooldown=60)
+        self.open(breaker)
+        breaker.opened_at -= 60
+
+        # 冷却后只放行一个探测
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, guard.CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow())
+
+        # 探测失败重新打开
+        breaker.failure()
+        self.assertEqual(breaker.state, guard.CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+        # 探测成功恢复
+        breaker.opened_at -= 60
+        self.assertTrue(breaker.allow())
+        breaker.success()
+        self.assertEqual(breaker.state, guard.CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.opened_times, 2)
+
+    def test_release(self):
+        breaker = guard.CircuitBreaker('test', failures=1, cooldown=0.05)
+        self.open(breaker)
+        breaker.opened_at -= 1
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+        # 探测未得到结果时释放，可再次探测
+        breaker.release()
+        self.assertEqual(breaker.state, guard.CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+
+        # 未释放的探测超过冷却时间后重新放行
+        self.assertFalse(breaker.allow())
+        with mock.patch.object(guard.time, 'monotonic', return_value=guard.time.monotonic() + 1):
+            self.assertTrue(breaker.allow())
+
+    def test_cancelled_probe(self):
+        url = 'http://probe.test/api'
+        breaker = guard.get_breaker(url)
+        self.open(breaker)
+        breaker.opened_at -= breaker.cooldown
+
+        class Client:
+            async def get(self, *args, **kwargs):
+                await asyncio.sleep(60)
+
+        async def noop():
+            pass
+
+        transport = fetch.AsyncTransport()
+
+        async def run():
+            with mock.patch.object(transport, '_ensure', noop), \
+                    mock.patch.object(transport, 'client', Client()), \
+                    mock.patch.object(transport, 'semaphore', asyncio.Semaphore(1)):
+                task = asyncio.create_task(transport.get(url))
+                await asyncio.sleep(0.05)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+
+        asyncio.run(run())
+        # 被取消的探测已释放，熔断不会一直停留在半开
+        self.assertEqual(breaker.state, guard.CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        breaker.success()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 21:00
+# FileName: 代码与secid索引的测试
+
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+
+from api import eastmoney, fetch, quote_id
+
+
+def make_response(body: str, status: int = 200) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = body.encode()
+    return resp
+
+
+class TestInfer(unittest.TestCase):
+
+    def test_infer(self):
+        cases = [
+            ('600000', '1.600000'),  # 沪市主板
+            ('688981', '1.688981'),  # 科创板
+            ('510300', '1.510300'),  # 沪市ETF
+            ('900901', '1.900901'),  # 沪市B股
+            ('113050', '1.113050'),  # 沪市可转债
+            ('000001', '0.000001'),  # 深市主板
+            ('300750', '0.300750'),  # 创业板
+            ('123100', '0.123100'),  # 深市可转债
+            ('159915', '0.159915'),  # 深市ETF
+            ('161226', '0.161226'),  # 深市LOF
+            ('200002', '0.200002'),  # 深市B股
+            ('430047', '0.430047'),  # 北交所
+            ('830799', '0.830799'),  # 北交所
+            ('920002', '0.920002'),  # 北交所
+            (' 600000 ', '1.600000'),
+            ('60000', None),
+            ('6000000', None),
+            ('ABC123', None),
+            ('700000', None),
+        ]
+        for code, secid in cases:
+            with self.subTest(code=code):
+                self.assertEqual(quote_id.infer(code), secid)
+
+
+class TestIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.patcher = mock.patch.object(quote_id, 'folder_path', self.folder.name)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.folder.cleanup()
+
+    def test_persist(self):
+        index = quote_id.QuoteIdIndex()
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.lookup('600000'), '1.600000')  # 规则推断
+        self.assertIsNone(index.lookup('ABC123'))
+
+        index.set('ABC123', '')  # 空的secid不写入
+        index.set('000001', '1.000001')  # 指数与个股同代码，以索引为准
+        index.update({'600000': '1.600000'})
+        self.assertEqual(index.lookup('000001'), '1.000001')
+
+        # 重新加载
+        index = quote_id.QuoteIdIndex()
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.lookup('000001'), '1.000001')
+        self.assertGreater(index.update_time, 0)
+        self.assertEqual(index.stats()['warm']['total'], 0)
+
+    def test_suggest(self):
+        stock = eastmoney.Stock()
+        responses = {
+            'ABC123': make_response(json.dumps({'QuotationCodeTable': {'Data': []}})),
+            'XYZ999': None,  # 请求失败
+            'DEF456': make_response(json.dumps({'QuotationCodeTable': {'Data': [{'QuoteID': '1.DEF456'}]}})),
+        }
+
+        def get(url, params=None, **kwargs):
+            return responses[params['input']]
+
+        with mock.patch.object(quote_id, 'index', quote_id.QuoteIdIndex()), mock.patch.object(fetch, 'get', get):
+            cases = [
+                ('ABC123', ('', True)),
+                ('XYZ999', ('', False)),
+                ('DEF456', ('1.DEF456', True)),
+                ('600000', ('1.600000', True)),
+            ]
+            for code, expect in cases:
+                with self.subTest(code=code):
+                    self.assertEqual(stock.fetch_quote_id(code), expect)
+            self.assertEqual(quote_id.get_index().lookup('DEF456'), '1.DEF456')
+
+            # secid查询失败时，批量查询整体视为失败
+            self.assertEqual(stock.fetch_current_batch(['ABC123']), ({}, True))
+            self.assertEqual(stock.fetch_current_batch(['ABC123', 'XYZ999']), ({}, False))
+
+
+if __name__ == '__main__':
+    unittest.main()
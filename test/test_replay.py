@@ -0,0 +1,91 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 17:00
+# FileName: 录制与回放的测试
+
+import asyncio
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import httpx
+import requests
+
+from api import fetch, replay
+import config
+
+
+class TestReplay(unittest.TestCase):
+
+    def setUp(self):
+        self.fixture_dir = config.FixtureDir
+        self.temp_dir = tempfile.TemporaryDirectory()
+        config.FixtureDir = self.temp_dir.name
+
+    def tearDown(self):
+        config.FixtureDir = self.fixture_dir
+        self.temp_dir.cleanup()
+
+    def test_fixture_key(self):
+        key = replay.fixture_key('https://push2.eastmoney.com/api/qt/stock/get?fltt=1',
+                                 {'secid': '1.600000', '_': 1700000000000, 'fields': None})
+        self.assertEqual(key, 'push2.eastmoney.com/api/qt/stock/get?fltt=1&secid=1.600000')
+
+    def test_replay(self):
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.headers['content-type'] = 'application/javascript'
+        resp._content = 'jsonpgz({"name":"国投白银LOF"});'.encode()
+        replay.record('http://fundgz.1234567.com.cn/js/161226.js', {'rt': 1}, resp)
+
+        def run(seed):
+            server = replay.StandInServer(error_rate=0.5, seed=seed)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            try:
+                url = f'{server.url}/fundgz.1234567.com.cn/js/161226.js?rt=1'
+                responses = [requests.get(url) for _ in range(10)]
+                self.assertEqual(server.stats['errors'], len([r for r in responses if r.status_code == 503]))
+                return [(r.status_code, r.content) for r in responses]
+            finally:
+                server.shutdown()
+                server.server_close()
+
+        result = run(1)
+        self.assertEqual({status for status, _ in result}, {200, 503})
+        self.assertIn((200, resp.content), result)
+        # 相同种子，注入的错误序列相同
+        self.assertEqual(result, run(1))
+
+    def test_async_record(self):
+        # 协程版的录制在线程池中写文件，不阻塞事件循环
+        threads = []
+
+        def record(url, params, resp):
+            threads.append(threading.current_thread())
+
+        class Client:
+            async def get(self, url, **kwargs):
+                return httpx.Response(200, content=b'{}', request=httpx.Request('GET', url))
+
+        async def noop():
+            pass
+
+        transport = fetch.AsyncTransport()
+
+        async def run():
+            with mock.patch.object(transport, '_ensure', noop), \
+                    mock.patch.object(transport, 'client', Client()), \
+                    mock.patch.object(transport, 'semaphore', asyncio.Semaphore(1)):
+                resp = await transport.get('http://record.test/api', {'code': 1})
+            self.assertEqual(resp.status_code, 200)
+
+        with mock.patch.object(replay, 'get_mode', return_value='record'), \
+                mock.patch.object(replay, 'record', record):
+            asyncio.run(run())
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 15:30
+# FileName: 请求合并的测试
+
+import threading
+import time
+import unittest
+
+from utils import singleflight, pools
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_do(self):
+        group = singleflight.Group()
+        executions = []
+
+        def fn():
+            executions.append(1)
+            time.sleep(0.2)
+            return {'value': 1}
+
+        barrier = threading.Barrier(4)
+
+        def one():
+            barrier.wait()
+            return group.do('key', fn)
+
+        result = pools.execute_thread(one, times=4)
+        self.assertEqual(len(executions), 1)
+        self.assertEqual(result, [{'value': 1}] * 4)
+        self.assertEqual(group.stats()['saved'], 3)
+
+    def test_do_many(self):
+        group = singleflight.Group()
+        requested = []
+
+        def fn(keys):
+            requested.append(sorted(keys))
+            time.sleep(0.2)
+            return {key: key.upper() for key in keys}
+
+        started = threading.Event()
+
+        def first():
+            started.set()
+            return group.do_many(['a', 'b'], fn)
+
+        thread = threading.Thread(target=first)
+        thread.start()
+        started.wait()
+        time.sleep(0.05)
+        result = group.do_many(['b', 'c'], fn)
+        thread.join()
+
+        # b 已在执行中，第二次只请求 c
+        self.assertEqual(requested, [['a', 'b'], ['c']])
+        self.assertEqual(result, {'b': 'B', 'c': 'C'})
+
+    def test_snapshot(self):
+        group = singleflight.Group()
+        started, published = threading.Event(), threading.Event()
+
+        def fn():
+            started.set()
+            time.sleep(0.1)
+            return {'value': 1}
+
+        def owner():
+            result = group.do('key', fn)
+            result['value'] = 0  # 执行方原地修改结果（如价格换算）
+            published.set()
+
+        thread = threading.Thread(target=owner)
+        thread.start()
+        started.wait()
+        result = group.do('key', fn)
+        thread.join()
+
+        # 等待方拿到执行方修改前的结果
+        self.assertTrue(published.is_set())
+        self.assertEqual(result, {'value': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 23:00
+# FileName: 股票列表并发分页的测试
+
+import json
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from api import fetch
+from api.eastmoney import Stock
+
+PAGE_SIZE = 10
+
+
+class FakeList:
+    """按代码排序的股票列表，后面的页先返回，使完成顺序与页码相反"""
+
+    def __init__(self, total: int, failed_pages: set = ()):
+        self.total = total
+        self.failed_pages = failed_pages
+        self.requests = []
+        self.__lock = threading.Lock()
+
+    def get(self, url, params=None, **kwargs):
+        page = params['pn']
+        with self.__lock:
+            self.requests.append(params)
+        time.sleep(0.01 * max(0, 6 - page))
+        if page in self.failed_pages:
+            return None
+
+        if self.total:
+            rows = [{'f12': f'{index:06d}', 'f13': index % 2, 'f14': f'股票{index}'}
+                    for index in range((page - 1) * PAGE_SIZE, min(page * PAGE_SIZE, self.total))]
+            data = {'total': self.total, 'diff': rows}
+        else:
+            data = None
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = json.dumps({'rc': 0, 'data': data}).encode()
+        return resp
+
+
+class TestStockList(unittest.TestCase):
+
+    def fetch_all(self, upstream: FakeList):
+        with mock.patch.object(fetch, 'get', upstream.get), mock.patch.object(Stock, 'list_page_size', PAGE_SIZE):
+            return Stock().fetch_all()
+
+    def test_pages(self):
+        # 首页获取总数，其余页按总数请求
+        for total, pages in ((45, [1, 2, 3, 4, 5]), (10, [1]), (11, [1, 2]), (0, [1])):
+            with self.subTest(total=total):
+                upstream = FakeList(total)
+                result, ok = self.fetch_all(upstream)
+                self.assertTrue(ok)
+                self.assertEqual(len(result), total)
+                self.assertEqual(sorted(params['pn'] for params in upstream.requests), pages)
+
+    def test_order(self):
+        upstream = FakeList(45)
+        result, ok = self.fetch_all(upstream)
+        # 各页按完成顺序到达，结果仍按页码（代码）排序
+        self.assertEqual([row['code'] for row in result], [f'{index:06d}' for index in range(45)])
+        self.assertEqual(result[1], {'code': '000001', 'f13': 1, 'name': '股票1'})
+        # 按代码排序，保证并发分页时各页稳定
+        for params in upstream.requests:
+            self.assertEqual((params['fid'], params['po']), ('f12', 0))
+
+    def test_failed_page(self):
+        for failed_pages in ({3}, {1}):
+            with self.subTest(failed_pages=failed_pages):
+                self.assertEqual(self.fetch_all(FakeList(45, failed_pages)), (None, False))
+
+        # 首页失败时不再请求其余页
+        upstream = FakeList(45, {1})
+        self.fetch_all(upstream)
+        self.assertEqual(len(upstream.requests), 1)
+
+        # 逐行产出时，缺页抛出异常而不是静默跳过
+        upstream = FakeList(45, {3})
+        with mock.patch.object(fetch, 'get', upstream.get), mock.patch.object(Stock, 'list_page_size', PAGE_SIZE):
+            with self.assertRaises(ConnectionError):
+                list(Stock().iter_all())
+
+
+if __name__ == '__main__':
+    unittest.main()
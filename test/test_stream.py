@@ -0,0 +1,152 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 18:00
+# FileName: 行情推送订阅的测试
+
+import asyncio
+import json
+import random
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+from urllib.parse import parse_qs, urlsplit
+
+from api import stream
+from module import focus, task
+
+
+class TickHandler(BaseHTTPRequestHandler):
+    """替身推送：请求参数与 ulist SSE 一致，先推送全量快照，之后每隔 interval 推送一个随机代码的增量"""
+
+    def do_GET(self):
+        server = self.server
+        secids = parse_qs(urlsplit(self.path).query).get('secids', [''])[0].split(',')
+        codes = [secid.split('.')[-1] for secid in secids if secid]
+        server.count('subscribes')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        try:
+            self.emit({str(index): server.snapshot(code) for index, code in enumerate(codes)}, len(codes))
+            while not server.stopped.wait(server.interval):
+                index, tick = server.tick(codes)
+                self.emit({str(index): tick})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def emit(self, diff: dict, total: int = None):
+        data = {'diff': diff} if total is None else {'total': total, 'diff': diff}
+        self.wfile.write(f'data: {json.dumps({"rc": 0, "data": data})}\n\n'.encode())
+        self.wfile.flush()
+        self.server.count('events')
+
+    def log_message(self, *args):
+        pass
+
+
+class TickStandInServer(ThreadingHTTPServer):
+    """
+    本地的行情推送替身服务，按固定种子生成合成的行情
+    """
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), *, interval: float = 0.05, seed: int = 0):
+        super().__init__(address, TickHandler)
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.__lock = threading.Lock()
+        self.__random = random.Random(seed)
+        self.__prices = {}
+        self.stats = {'subscribes': 0, 'events': 0}
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/api/qt/ulist/sse'
+
+    def snapshot(self, code: str) -> dict:
+        with self.__lock:
+            price = self.__prices.setdefault(code, 1000 + self.__random.randint(0, 9000))
+        return {'f1': 2, 'f2': price, 'f12': code, 'f14': f'股票{code}', 'f17': price, 'f18': price,
+                'f124': int(time.time())}
+
+    def tick(self, codes: List[str]) -> (int, dict):
+        with self.__lock:
+            index = self.__random.randrange(len(codes))
+            code = codes[index]
+            price = self.__prices[code] = max(1, self.__prices[code] + self.__random.randint(-20, 20))
+        return index, {'f2': price, 'f124': int(time.time())}
+
+    def count(self, name: str):
+        with self.__lock:
+            self.stats[name] += 1
+
+    def shutdown(self):
+        self.stopped.set()
+        super().shutdown()
+
+
+class TestStream(unittest.TestCase):
+
+    def setUp(self):
+        self.server = TickStandInServer(interval=0.02, seed=1)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_stream(self):
+        focus_codes = ['600000', '000001']
+        quote_stream = stream.QuoteStream(url=self.server.url, get_codes=lambda: list(focus_codes))
+        quote_stream.adapter.get_quote_id = lambda code: f'1.{code}'
+        updated = []
+        quote_stream.listeners.append(updated.extend)
+
+        async def wait(condition):
+            for _ in range(200):
+                if condition():
+                    return
+                await asyncio.sleep(0.02)
+            self.fail('timeout')
+
+        async def run():
+            quote_stream.start()
+            await wait(lambda: quote_stream.events > 5)
+            quotes = quote_stream.get_quotes(focus_codes, ['f43', 'f57', 'f58'])
+            self.assertEqual(set(quotes), set(focus_codes))
+            self.assertEqual(quotes['600000']['f58'], '股票600000')
+            self.assertEqual(set(updated), set(focus_codes))
+
+            # 关注项变化后重新订阅
+            focus_codes.append('300750')
+            quote_stream.resubscribe()
+            await wait(lambda: '300750' in quote_stream.get_quotes(focus_codes))
+            self.assertEqual(self.server.stats['subscribes'], 2)
+            self.assertEqual(set(quote_stream.codes), set(focus_codes))
+
+            await quote_stream.stop()
+            self.assertEqual(quote_stream.get_quotes(focus_codes), {})
+
+        asyncio.run(run())
+
+
+class TestFocusChange(unittest.TestCase):
+
+    def test_resubscribe(self):
+        # 关注项保存后通知监听者，由调度任务触发推送重新订阅
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                mock.patch.object(focus, 'folder_path', temp_dir), \
+                mock.patch.object(focus, 'listeners', [task.on_focus_change]), \
+                mock.patch.object(stream, 'resubscribe') as resubscribe:
+            focus.save({'stock': []}, 'test.json')
+        resubscribe.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
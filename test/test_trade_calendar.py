@@ -0,0 +1,59 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 13:30
+# FileName: 交易日历的测试
+
+import unittest
+
+from utils import trade_calendar, utils
+
+
+class TestTradeCalendar(unittest.TestCase):
+
+    def test_is_trade_day(self):
+        self.assertTrue(trade_calendar.is_trade_day('2026-10-16'))
+        self.assertFalse(trade_calendar.is_trade_day('2026-10-17'))  # 周六
+        self.assertFalse(trade_calendar.is_trade_day('2026-10-05'))  # 国庆
+
+    def test_get_trade_day(self):
+        # 非交易日以之前最近的交易日为准
+        self.assertEqual(trade_calendar.get_trade_day('2026-10-04'), '2026-09-30')
+        self.assertEqual(trade_calendar.get_trade_day('2026-10-08', delay=-1), '2026-09-30')
+        self.assertEqual(trade_calendar.get_trade_day('2026-09-30', delay=1), '2026-10-08')
+
+    def test_get_trade_range(self):
+        start_date, end_date = trade_calendar.get_trade_range(31, '2026-10-16')
+        self.assertEqual(end_date, '2026-10-16')
+        self.assertEqual(trade_calendar.count_trade_days(start_date, end_date), 31)
+
+    def test_uncovered_year(self):
+        # 节假日表未覆盖的年份仅按周末判断：春节按交易日计，需由补充查询修正数据量
+        self.assertNotIn(2027, trade_calendar.holidays)
+        self.assertTrue(trade_calendar.is_trade_day('2027-02-08'))
+        self.assertFalse(trade_calendar.is_trade_day('2027-02-06'))
+        start_date, _ = trade_calendar.get_trade_range(20, '2027-02-26')
+        self.assertEqual(start_date, '2027-02-01')
+
+        # 补充的范围不依赖节假日表，足以覆盖缺少的交易日及最长的休市
+        fallback_start = trade_calendar.get_fallback_start(start_date, 8)
+        self.assertEqual(fallback_start, '2027-01-06')
+        self.assertGreaterEqual(utils.get_delay(start_date, fallback_start), 8 + trade_calendar.holiday_margin)
+
+    def test_get_market_state(self):
+        def state(t):
+            result, last_close, next_change = trade_calendar.get_market_state(
+                utils.str2time(t, fmt='%Y-%m-%d %H:%M'))
+            return result, utils.time2str(last_close, fmt='%Y-%m-%d %H:%M'), \
+                utils.time2str(next_change, fmt='%Y-%m-%d %H:%M')
+
+        self.assertEqual(state('2026-10-16 10:00')[::2], ('open', '2026-10-16 11:30'))
+        self.assertEqual(state('2026-10-16 12:00'), ('closed', '2026-10-16 11:30', '2026-10-16 13:00'))
+        # 周五收盘后，至下周一开盘
+        self.assertEqual(state('2026-10-16 16:00'), ('closed', '2026-10-16 15:00', '2026-10-19 09:30'))
+        self.assertEqual(state('2026-10-19 08:00'), ('closed', '2026-10-16 15:00', '2026-10-19 09:30'))
+        # 国庆假期
+        self.assertEqual(state('2026-10-01 10:00'), ('closed', '2026-09-30 15:00', '2026-10-08 09:30'))
+
+
+if __name__ == '__main__':
+    unittest.main()
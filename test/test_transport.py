@@ -0,0 +1,31 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 23:45
+# FileName: 共享连接池的测试
+
+import unittest
+from unittest import mock
+
+from api import fetch
+import config
+
+
+class TestWarmUp(unittest.TestCase):
+
+    def test_warm_up(self):
+        transport = fetch.Transport()
+        pool_size = {'a.test': 2, 'b.test': 0}
+        with mock.patch.object(config, 'HttpHostPoolSize', pool_size), \
+                mock.patch.object(transport, 'head') as head:
+            # 每个host预建的连接数不超过其连接池大小
+            transport.warm_up(['http://a.test/', 'http://b.test/'], size=3)
+            self.assertEqual(sorted(call.args[0] for call in head.call_args_list), ['http://a.test/'] * 2)
+
+            # 无可预建的连接时直接返回
+            head.reset_mock()
+            transport.warm_up(['http://b.test/'], size=3)
+            head.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
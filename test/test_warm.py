@@ -0,0 +1,82 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 22:30
+# FileName: 当天缓存的失效与预热的测试
+
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+from module import bean, task
+from module.process import worth, monitor
+from utils import utils
+import config
+
+
+class TestDayExpire(unittest.TestCase):
+
+    def test_jitter(self):
+        keys = [f'history.stock.{index:06d}.31' for index in range(200)]
+        jitters = [bean.get_day_jitter(key) for key in keys]
+        # 同一key固定，不同key分散在 CacheDayJitter 内
+        self.assertEqual(jitters, [bean.get_day_jitter(key) for key in keys])
+        self.assertTrue(all(0 <= jitter < int(config.CacheDayJitter) for jitter in jitters))
+        self.assertGreater(len(set(jitters)), 100)
+
+        with mock.patch.object(config, 'CacheDayJitter', 0):
+            self.assertEqual(bean.get_day_jitter(keys[0]), 0)
+
+    def test_today_expire(self):
+        key = 'history.stock.600000.31'
+        midnight = utils.str2time(utils.get_delay_date(delay=1, tz=config.CronZone), fmt='%Y-%m-%d',
+                                  tz=config.CronZone)
+        deadline = time.time() + bean.get_today_expire(key)
+        # 在次日0点后失效，延迟为该key的 jitter
+        self.assertGreater(deadline, midnight)
+        self.assertAlmostEqual(deadline, midnight + bean.get_day_jitter(key) + 1, delta=2)
+
+
+class FakeFocus:
+    codes = {
+        'worth': ['600000', '000001'],
+        'monitor': ['300750', '600000'],
+        'history_monitor': ['000001', '601318'],
+    }
+
+    def __init__(self, mode: str):
+        self.mode = mode
+
+    def get(self, money_type):
+        return [{'code': code} for code in self.codes[self.mode]], True
+
+
+class TestWarm(unittest.TestCase):
+
+    def warm(self, is_trade_day: bool):
+        with mock.patch.object(task.focus, 'Focus', FakeFocus), \
+                mock.patch.object(task.trade_calendar, 'is_trade_day', return_value=is_trade_day), \
+                mock.patch.object(config, 'CacheWarmPace', 0), \
+                mock.patch.object(worth.History, 'get_limit', return_value=22), \
+                mock.patch.object(task.process, 'get_codes_name') as get_codes_name, \
+                mock.patch.object(worth.History, 'load_history') as load_history, \
+                mock.patch.object(monitor.HistoryMonitor, 'load_history') as load_monitor_history:
+            asyncio.run(task.warm('stock'))
+        return get_codes_name, load_history, load_monitor_history
+
+    def test_warm(self):
+        get_codes_name, load_history, load_monitor_history = self.warm(True)
+        # 名称：各类关注项（去重）；历史：历史查询与历史监控的关注项
+        get_codes_name.assert_called_once_with('stock', ['600000', '000001', '601318', '300750'])
+        self.assertEqual(load_history.call_args_list,
+                         [mock.call('stock', '600000', 22), mock.call('stock', '000001', 22)])
+        self.assertEqual(load_monitor_history.call_args_list,
+                         [mock.call('stock', '000001'), mock.call('stock', '601318')])
+
+    def test_holiday(self):
+        for func in self.warm(False):
+            func.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
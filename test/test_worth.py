@@ -0,0 +1,214 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 22:00
+# FileName: 估值缓存的测试
+
+import threading
+import time
+import unittest
+from unittest import mock
+
+from api import eastmoney
+from module import cache, bad_code
+from module.process import worth, monitor
+from utils import utils
+import config
+
+CODE = '600000'
+
+
+def make_quote(price: int) -> dict:
+    return {'f57': CODE, 'f58': '浦发银行', 'f46': 1000, 'f60': 1000, 'f43': price, 'f86': int(time.time()),
+            'f59': 2}
+
+
+class FakeApi:
+    """批量请求在 gate 打开前阻塞，记录请求次数"""
+
+    def __init__(self, price: int):
+        self.price = price
+        self.calls = 0
+        self.gate = threading.Event()
+        self.gate.set()
+        self.__lock = threading.Lock()
+
+    def fetch_current_batch(self, codes, *, fields=None):
+        with self.__lock:
+            self.calls += 1
+        self.gate.wait(5)
+        return {code: make_quote(self.price) for code in codes}, True
+
+
+class WorthCase(unittest.TestCase):
+
+    def setUp(self):
+        cache.clear()
+        bad_code.clear()
+        self.key = worth.Worth.get_cache_key('stock', CODE)
+        self.api = FakeApi(1100)
+        patcher = mock.patch.object(eastmoney, 'EastMoney', lambda money_type: self.api)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        cache.clear()
+
+    def load(self) -> int:
+        """查询估值，返回当前值"""
+        return worth.Worth('stock', codes=[CODE]).datas[0]['data']['f43']
+
+    def wait_refreshed(self):
+        for _ in range(100):
+            if not worth.Worth.refreshing:
+                return
+            time.sleep(0.02)
+        self.fail('timeout')
+
+
+class TestWorthCache(WorthCase):
+
+    def test_fresh(self):
+        cache.set(self.key, make_quote(1000), expire=int(config.WorthMaxStale) + int(config.WorthRefreshAhead) + 60)
+        self.assertTrue(worth.Worth.is_fresh('stock', CODE))
+        self.assertEqual(self.load(), 1000)
+        self.assertEqual(self.api.calls, 0)
+        self.assertEqual(worth.Worth.refreshing, set())
+
+    def test_stale(self):
+        # 已过期但未超过 WorthMaxStale：立即返回缓存，并发查询只触发一次后台刷新
+        cache.set(self.key, make_quote(1000), expire=int(config.WorthMaxStale) // 2)
+        self.assertFalse(worth.Worth.is_fresh('stock', CODE))
+        self.api.gate.clear()
+
+        prices = []
+        threads = [threading.Thread(target=lambda: prices.append(self.load())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(2)
+        # 刷新阻塞期间，查询均已返回缓存
+        self.assertEqual(prices, [1000] * 8)
+        self.assertEqual(worth.Worth.refreshing, {self.key})
+
+        self.api.gate.set()
+        self.wait_refreshed()
+        self.assertEqual(self.api.calls, 1)
+        self.assertEqual(cache.get(self.key)['f43'], 1100)
+        self.assertTrue(worth.Worth.is_fresh('stock', CODE))
+
+    def test_expired(self):
+        # 超过 WorthMaxStale 后缓存已失效，同步请求
+        cache.set(self.key, make_quote(1000), expire=0.05)
+        time.sleep(0.1)
+        self.assertEqual(self.load(), 1100)
+        self.assertEqual(self.api.calls, 1)
+        self.assertEqual(worth.Worth.refreshing, set())
+        self.assertEqual(cache.get(self.key)['f43'], 1100)
+
+
+class TestCurrentFields(unittest.TestCase):
+
+    def test_projection(self):
+        cases = [
+            (worth.Worth, ['f57', 'f58', 'f46', 'f60', 'f43', 'f86', 'f59']),
+            (monitor.Monitor, ['f57', 'f58', 'f43', 'f60', 'f59', 'f86']),
+            (monitor.HistoryMonitor, ['f57', 'f58', 'f43', 'f59', 'f86']),
+        ]
+        for processor, fields in cases:
+            with self.subTest(processor=processor.__name__):
+                self.assertEqual(processor.get_current_fields('stock'), fields)
+                self.assertTrue(set(fields) <= set(eastmoney.Stock.detail_fields))
+                # 基金接口不支持字段选择
+                self.assertIsNone(processor.get_current_fields('fund'))
+
+    def test_has_fields(self):
+        cases = [
+            (None, ['f43'], False),
+            ({}, None, False),
+            ({'f43': 1}, None, True),
+            ({'f43': 1, 'f57': CODE}, ['f43'], True),
+            ({'f43': 1}, ['f43', 'f46'], False),
+        ]
+        for data, fields, result in cases:
+            with self.subTest(data=data, fields=fields):
+                self.assertEqual(eastmoney.has_fields(data, fields), result)
+
+
+class TestFieldsReuse(WorthCase):
+    """缓存与预取的数据包含所需字段时复用，字段不足时重新请求"""
+
+    def test_cache(self):
+        expire = int(config.WorthMaxStale) + int(config.WorthRefreshAhead) + 60
+        narrow = {field: value for field, value in make_quote(1000).items()
+                  if field in monitor.Monitor.get_current_fields('stock')}
+        cache.set(self.key, narrow, expire=expire)
+        self.assertEqual(self.load(), 1100)
+        self.assertEqual(self.api.calls, 1)
+
+        # 重新请求的数据已写入缓存，再次查询时复用
+        self.assertEqual(self.load(), 1100)
+        self.assertEqual(self.api.calls, 1)
+
+    def test_quotes(self):
+        quote = {**make_quote(1000), 'f44': 1020}
+        self.assertEqual(worth.Worth('stock', codes=[CODE], quotes={CODE: quote}).datas[0]['data']['f43'], 1000)
+        self.assertEqual(self.api.calls, 0)
+
+        cache.clear()
+        del quote['f46']
+        self.assertEqual(worth.Worth('stock', codes=[CODE], quotes={CODE: quote}).datas[0]['data']['f43'], 1100)
+        self.assertEqual(self.api.calls, 1)
+
+
+class TestWorthExpire(unittest.TestCase):
+
+    def expire(self, money_type, data: dict, now: str) -> int:
+        now = utils.str2time(now, fmt='%Y-%m-%d %H:%M', tz=config.CronZone)
+        with mock.patch.object(worth, 'time', mock.Mock(time=lambda: now)):
+            return worth.Worth.get_expire(money_type, data)
+
+    @staticmethod
+    def stock(data_time: str) -> dict:
+        return {'f86': int(utils.str2time(data_time, fmt='%Y-%m-%d %H:%M:%S', tz=config.CronZone))}
+
+    def test_trading(self):
+        # 交易中缓存至数据的下次更新，不少于 WorthMinExpire
+        self.assertEqual(self.expire('stock', self.stock('2026-10-16 09:59:40'), '2026-10-16 10:00'), 40)
+        self.assertEqual(self.expire('stock', self.stock('2026-10-16 09:59:05'), '2026-10-16 10:00'),
+                         int(config.WorthMinExpire))
+        self.assertEqual(self.expire('fund', {'gztime': '2026-10-16 09:59'}, '2026-10-16 10:00'),
+                         int(config.WorthMinExpire))
+
+    @staticmethod
+    def seconds(start: str, end: str) -> int:
+        return int(utils.str2time(end, fmt='%Y-%m-%d %H:%M', tz=config.CronZone)
+                   - utils.str2time(start, fmt='%Y-%m-%d %H:%M', tz=config.CronZone))
+
+    def test_closed(self):
+        # 收盘后与节假日，缓存至下次开盘
+        cases = [
+            ('2026-10-16 15:00:00', '2026-10-16 16:00', '2026-10-19 09:30'),  # 周五收盘后
+            ('2026-10-16 11:29:58', '2026-10-16 12:00', '2026-10-16 13:00'),  # 午间休市
+            ('2026-09-30 15:00:00', '2026-10-01 10:00', '2026-10-08 09:30'),  # 国庆
+        ]
+        for data_time, now, next_open in cases:
+            with self.subTest(now=now):
+                self.assertEqual(self.expire('stock', self.stock(data_time), now), self.seconds(now, next_open))
+
+        # 基金收盘后净值未更新时，每 FundNavInterval 重新获取
+        data = {'gztime': '2026-10-16 15:00', 'jzrq': '2026-10-15'}
+        self.assertEqual(self.expire('fund', data, '2026-10-16 16:00'), int(config.FundNavInterval))
+        data['jzrq'] = '2026-10-16'
+        self.assertEqual(self.expire('fund', data, '2026-10-16 16:00'),
+                         self.seconds('2026-10-16 16:00', '2026-10-19 09:30'))
+
+    def test_invalid_time(self):
+        # 数据时间缺失或无效时，按交易中缓存
+        for money_type, data in (('stock', {}), ('stock', {'f86': '-'}), ('fund', {'gztime': ''}),
+                                 ('fund', {'gztime': '--'})):
+            with self.subTest(money_type=money_type, data=data):
+                self.assertEqual(self.expire(money_type, data, '2026-10-16 16:00'), worth.Worth.expire)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -48,3 +48,29 @@ def execute_thread(callback, args_list: List = None, *, times: int = 0, maxsize:
         # 获取任务的结果
         result = [future.result() for future in futures]
     return result
+
+
+def iter_thread(callback, args_list: List, *, maxsize: int = THREAD_POOL_SIZE):
+    """
+    多线程，按完成顺序逐个产出结果
+    :param callback: 单线程的执行方法
+    :param args_list: 单线程的参数组成的数组，格式同 execute_thread
+    :param maxsize: 线程池数量
+    :return: 生成器，产出 (args_list中的索引, 结果)
+    """
+    if not args_list:
+        return
+
+    def get_params(params):
+        args = params[0] if isinstance(params[0], (tuple, list)) else []
+        kwargs = params[-1] if isinstance(params[-1], dict) else {}
+        return args, kwargs
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(args_list), maxsize)) as executor:
+        futures = {}
+        for index, params in enumerate(args_list):
+            item_args, item_kwargs = get_params(params)
+            futures[executor.submit(callback, *item_args, **item_kwargs)] = index
+
+        for future in concurrent.futures.as_completed(futures):
+            yield futures[future], future.result()
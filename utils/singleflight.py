@@ -0,0 +1,96 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 15:00
+# FileName: 相同请求合并（singleflight）
+
+import copy
+import threading
+from typing import Callable, Hashable, Iterable
+
+
+class _Call:
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None  # 结果的快照，与执行方返回的结果相互独立
+        self.error = None
+        self.waiters = 0
+
+
+class Group:
+    """
+    相同key的并发调用只执行一次，其余调用等待并共享结果（等待方拿到结果的深拷贝，避免相互修改）
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__calls = {}
+        self.calls = 0  # 总调用数
+        self.executions = 0  # 实际执行数
+        self.saved = 0  # 合并掉的调用数
+
+    def do(self, key: Hashable, fn: Callable):
+        """
+        执行 fn，key相同的并发调用共享同一次执行
+        :param key:
+        :param fn: 无参函数
+        :return: fn的结果
+        """
+        return self.do_many([key], lambda keys: {keys[0]: fn()})[key]
+
+    def do_many(self, keys: Iterable[Hashable], fn: Callable) -> dict:
+        """
+        批量执行：已在执行中的key等待其结果，其余key合并为一次 fn 调用
+        :param keys:
+        :param fn: fn(keys) -> {key: result}
+        :return: {key: result}，fn未返回的key为None
+        """
+        owned, waiting = {}, {}
+        with self.__lock:
+            for key in dict.fromkeys(keys):
+                self.calls += 1
+                call = self.__calls.get(key)
+                if call is None:
+                    call = _Call()
+                    self.__calls[key] = call
+                    owned[key] = call
+                else:
+                    self.saved += 1
+                    call.waiters += 1
+                    waiting[key] = call
+            if owned:
+                self.executions += 1
+
+        result = {}
+        if owned:
+            error = None
+            try:
+                result = fn(list(owned.keys())) or {}
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                with self.__lock:
+                    for key in owned:
+                        self.__calls.pop(key, None)
+                # 移除后不再有新的等待方；在返回给执行方之前为等待方保存快照，执行方之后修改结果不影响等待方
+                for key, call in owned.items():
+                    call.error = error
+                    if call.waiters and error is None:
+                        call.result = copy.deepcopy(result.get(key))
+                    call.event.set()
+
+        for key, call in waiting.items():
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            result[key] = copy.deepcopy(call.result)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            'calls': self.calls,
+            'executions': self.executions,
+            'saved': self.saved,
+            'in_flight': len(self.__calls),
+        }
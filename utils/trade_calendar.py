@@ -0,0 +1,171 @@
+#!-*- coding:utf-8 -*-
+# python3.7
+# CreateTime: 2026/10/18 13:00
+# FileName: 交易日历（沪深）
+
+import datetime
+import functools
+import logging
+import time
+
+import config
+from utils import utils
+
+# 沪深交易所的节假日休市（仅列出工作日），周末默认休市
+holidays = {
+    2023: ['2023-01-02', '2023-01-23', '2023-01-24', '2023-01-25', '2023-01-26', '2023-01-27',
+           '2023-04-05', '2023-05-01', '2023-05-02', '2023-05-03', '2023-06-22', '2023-06-23',
+           '2023-09-29', '2023-10-02', '2023-10-03', '2023-10-04', '2023-10-05', '2023-10-06'],
+    2024: ['2024-01-01', '2024-02-09', '2024-02-12', '2024-02-13', '2024-02-14', '2024-02-15',
+           '2024-02-16', '2024-04-04', '2024-04-05', '2024-05-01', '2024-05-02', '2024-05-03',
+           '2024-06-10', '2024-09-16', '2024-09-17', '2024-10-01', '2024-10-02', '2024-10-03',
+           '2024-10-04', '2024-10-07'],
+    2025: ['2025-01-01', '2025-01-28', '2025-01-29', '2025-01-30', '2025-01-31', '2025-02-03',
+           '2025-02-04', '2025-04-04', '2025-05-01', '2025-05-02', '2025-05-05', '2025-06-02',
+           '2025-10-01', '2025-10-02', '2025-10-03', '2025-10-06', '2025-10-07', '2025-10-08'],
+    2026: ['2026-01-01', '2026-01-02', '2026-02-16', '2026-02-17', '2026-02-18', '2026-02-19',
+           '2026-02-20', '2026-02-23', '2026-04-06', '2026-05-01', '2026-05-04', '2026-05-05',
+           '2026-06-19', '2026-09-25', '2026-10-01', '2026-10-02', '2026-10-05', '2026-10-06',
+           '2026-10-07'],
+}
+
+fmt = '%Y-%m-%d'
+
+# 最长的节假日休市（自然日，如春节、国庆）
+holiday_margin = 14
+
+# 交易时段（沪深，CronZone 时区）
+sessions = [('09:30', '11:30'), ('13:00', '15:00')]
+
+
+@functools.lru_cache(maxsize=None)
+def get_holidays() -> frozenset:
+    """内置节假日 + 配置中的 TradeHolidays"""
+    extra = config.TradeHolidays if isinstance(config.TradeHolidays, (list, tuple)) else []
+    return frozenset([day for days in holidays.values() for day in days] + [str(day) for day in extra])
+
+
+@functools.lru_cache(maxsize=16)
+def _warn_uncovered(year: int):
+    logging.warning(f'交易日历未包含{year}年的节假日，仅按周末判断')
+
+
+@functools.lru_cache(maxsize=4096)
+def is_trade_day(date_str: str) -> bool:
+    """
+    是否为交易日
+    :param date_str: %Y-%m-%d
+    :return:
+    """
+    date = datetime.datetime.strptime(date_str, fmt)
+    if date.weekday() >= 5:
+        return False
+    if date.year not in holidays:
+        _warn_uncovered(date.year)
+    return date_str not in get_holidays()
+
+
+def get_trade_day(date_str: str = None, *, delay: int = 0) -> str:
+    """
+    获取指定日期的几个交易日前或后的交易日
+    :param date_str: 日期，默认为当前日期。非交易日时，以其之前最近的交易日为准
+    :param delay: 间隔的交易日数。正数为往后，负数为往前
+    :return:
+    """
+    date_str = date_str or utils.now_time(fmt=fmt, tz=config.CronZone)
+    while not is_trade_day(date_str):
+        date_str = utils.get_delay_date(date_str, delay=-1)
+
+    step = 1 if delay > 0 else -1
+    for _ in range(abs(delay)):
+        date_str = utils.get_delay_date(date_str, delay=step)
+        while not is_trade_day(date_str):
+            date_str = utils.get_delay_date(date_str, delay=step)
+    return date_str
+
+
+def get_trade_range(days: int, end_date: str = None) -> (str, str):
+    """
+    截止到 end_date（含）的最近 days 个交易日的日期范围
+    :param days: 交易日数
+    :param end_date: 截止日期，默认为当前日期
+    :return: (开始日期, 截止日期)
+    """
+    end_date = end_date or utils.now_time(fmt=fmt, tz=config.CronZone)
+    return get_trade_day(end_date, delay=-(max(days, 1) - 1)), end_date
+
+
+def get_fallback_start(start_date: str, days: int) -> str:
+    """
+    日历未覆盖的节假日导致数据不足时，补充 days 个交易日所需的开始日期：
+    不依赖节假日表，按每周5个交易日估算，并预留最长节假日的余量
+    :param start_date: 原开始日期
+    :param days: 缺少的交易日数
+    :return:
+    """
+    return utils.get_delay_date(start_date, delay=-(days * 7 // 5 + 1 + holiday_margin))
+
+
+def count_trade_days(start_date: str, end_date: str = None) -> int:
+    """
+    两日期之间（含首尾）的交易日数
+    :param start_date:
+    :param end_date: 默认为当前日期
+    :return:
+    """
+    end_date = end_date or utils.now_time(fmt=fmt, tz=config.CronZone)
+    count = 0
+    date_str = start_date
+    while date_str <= end_date:
+        count += is_trade_day(date_str)
+        date_str = utils.get_delay_date(date_str, delay=1)
+    return count
+
+
+@functools.lru_cache(maxsize=64)
+def get_sessions(date_str: str) -> tuple:
+    """
+    指定日期的交易时段（按天缓存）
+    :param date_str: %Y-%m-%d
+    :return: ((开始时间戳, 结束时间戳), ...)；非交易日为空
+    """
+    if not is_trade_day(date_str):
+        return ()
+    return tuple(
+        (utils.str2time(f'{date_str} {start}', fmt='%Y-%m-%d %H:%M', tz=config.CronZone),
+         utils.str2time(f'{date_str} {end}', fmt='%Y-%m-%d %H:%M', tz=config.CronZone))
+        for start, end in sessions
+    )
+
+
+def get_market_state(t: float = None) -> (str, float, float):
+    """
+    指定时刻的市场状态
+    :param t: 时间戳，默认为当前时间
+    :return: (状态, 最近一次收盘（含午间休市）的时间戳, 状态下次变化的时间戳)。
+        状态：open 交易中，变化时间为本时段收盘；closed 休市（含午间），变化时间为下次开盘
+    """
+    t = time.time() if t is None else t
+    date_str = utils.time2str(t, fmt=fmt, tz=config.CronZone)
+
+    last_close = 0
+    for start, end in get_sessions(date_str):
+        if start <= t < end:
+            return 'open', last_close, end
+        if t < start:
+            return 'closed', last_close or get_last_close(date_str), start
+        last_close = end
+
+    # 当天已收盘或非交易日，找之后的首个交易时段
+    next_date = date_str
+    while True:
+        next_date = utils.get_delay_date(next_date, delay=1)
+        next_sessions = get_sessions(next_date)
+        if next_sessions:
+            return 'closed', last_close or get_last_close(date_str), next_sessions[0][0]
+
+
+@functools.lru_cache(maxsize=64)
+def get_last_close(date_str: str) -> float:
+    """指定日期之前（不含）最近一个交易日的收盘时间戳（按天缓存）"""
+    return get_sessions(get_trade_day(utils.get_delay_date(date_str, delay=-1)))[-1][1]